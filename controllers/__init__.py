@@ -8,11 +8,16 @@
 # TODO:
 # Make documentation
 
+from .field_controller_base import *
+from .field_sampler import *
+from .field_calibration import *
+from .field_controller_closed_loop import *
 from .field_controller import *
 from .field_controller_driven import *
 from .field_controller_driven_2 import *
 from .field_controller_puc import *
 from .field_controller_SM import *
+from .lockin_controller_base import *
 from .lockin_controller import *
 from .lockin_mag_controller import *
 from .vna_controller import *
@@ -0,0 +1,136 @@
+# coding=utf-8
+
+# Author: Diego González Chávez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# Current to field calibration tables of the magnets
+#
+# TODO:
+# Make documentation
+
+import time
+import numpy
+
+__all__ = ['FieldCalibration']
+
+
+def _interp(x, xp, fp):
+    '''numpy.interp with linear extrapolation'''
+    y = numpy.interp(x, xp, fp)
+    if len(xp) < 2:
+        return y
+    slope_ini = (fp[1] - fp[0]) / (xp[1] - xp[0])
+    slope_end = (fp[-1] - fp[-2]) / (xp[-1] - xp[-2])
+    y = numpy.where(x < xp[0], fp[0] + (x - xp[0]) * slope_ini, y)
+    y = numpy.where(x > xp[-1], fp[-1] + (x - xp[-1]) * slope_end, y)
+    if numpy.ndim(y) == 0:
+        return float(y)
+    return y
+
+
+class FieldCalibration(object):
+    '''
+    Current to field lookup tables of a magnet
+
+    Usage :
+        cal = FieldCalibration('Helmholtz')
+        cal.Measure(set_current, LS475_read_field, max_current=5)
+        cal.save('Helmholtz')  # Helmholtz.cal.npz
+        ...
+        cal = FieldCalibration()
+        cal.load('Helmholtz.cal.npz')
+        FC.calibration = cal
+
+    The ascending (direction = 1) and descending (direction = -1)
+    branches are kept separately, direction = 0 uses their mean.
+    field and current accept scalars or arrays.
+    '''
+
+    def __init__(self, name=''):
+        self.name = name
+        self.info = ''
+        self.currents = {1: numpy.zeros(0), -1: numpy.zeros(0)}
+        self.fields = {1: numpy.zeros(0), -1: numpy.zeros(0)}
+
+    def setBranch(self, direction, currents, fields):
+        '''Sets the table of the ascending (1) or descending (-1) branch'''
+        currents = numpy.asarray(currents, dtype=float)
+        fields = numpy.asarray(fields, dtype=float)
+        order = numpy.argsort(currents)
+        self.currents[int(numpy.sign(direction))] = currents[order]
+        self.fields[int(numpy.sign(direction))] = fields[order]
+
+    def Measure(self, set_current, read_field, max_current,
+                n_points=101, delay=0.5):
+        '''
+        Measures both branches of the calibration
+
+        Usage :
+            Measure(set_current, read_field, max_current)
+
+        set_current : Function that sets the output current
+        read_field : Function returning the field (a LakeShore 475 probe)
+            example: lambda: LS475.field
+        The current is cycled 0 -> -max -> +max -> -max -> 0
+        in steps of 2*max_current/(n_points-1) with delay (s) per step.
+        '''
+        currents = numpy.linspace(-max_current, max_current, n_points)
+        step = currents[1] - currents[0]
+        # Go to the start of the loop
+        for c in numpy.arange(0, -max_current, -step):
+            set_current(c)
+            time.sleep(delay)
+        for direction, branch in [(1, currents), (-1, currents[::-1])]:
+            fields = []
+            for c in branch:
+                set_current(c)
+                time.sleep(delay)
+                fields.append(read_field())
+            self.setBranch(direction, branch, fields)
+        for c in numpy.arange(-max_current, step / 2, step):
+            set_current(c)
+            time.sleep(delay)
+        set_current(0)
+        self.info = 'Measured : %s' % time.asctime()
+
+    def _branches(self, direction):
+        if direction == 0:
+            return [1, -1]
+        return [int(numpy.sign(direction))]
+
+    def field(self, current, direction=0):
+        '''Field produced by current in the given branch'''
+        return numpy.mean([_interp(current, self.currents[d], self.fields[d])
+                           for d in self._branches(direction)], axis=0)
+
+    def current(self, field, direction=0):
+        '''Current needed to produce field in the given branch'''
+        result = []
+        for d in self._branches(direction):
+            sign = numpy.sign(self.fields[d][-1] - self.fields[d][0])
+            fields = sign * self.fields[d]
+            # Strictly monotonic table (noise at saturation)
+            keep = numpy.r_[True, fields[1:] >
+                            numpy.maximum.accumulate(fields)[:-1]]
+            result.append(_interp(sign * numpy.asarray(field),
+                                  fields[keep], self.currents[d][keep]))
+        return numpy.mean(result, axis=0)
+
+    @property
+    def remanence(self):
+        '''Fields at zero current of the ascending and descending branches'''
+        return self.field(0, 1), self.field(0, -1)
+
+    def save(self, file_name):
+        numpy.savez(file_name + '.cal',
+                    name=self.name, info=self.info,
+                    currents_up=self.currents[1], fields_up=self.fields[1],
+                    currents_down=self.currents[-1],
+                    fields_down=self.fields[-1])
+
+    def load(self, file_name):
+        data = numpy.load(file_name)
+        self.name = str(data['name'])
+        self.info = str(data['info'])
+        self.setBranch(1, data['currents_up'], data['fields_up'])
+        self.setBranch(-1, data['currents_down'], data['fields_down'])
@@ -10,11 +10,13 @@
 
 import time
 import numpy
+from .field_controller_base import FieldControllerBase
+from .field_controller_base import FieldRampCancelled
 
 __all__ = ['FieldController']
 
 
-class FieldController(object):
+class FieldController(FieldControllerBase):
     '''
     Magnetic field controller
     
@@ -27,6 +29,9 @@ class FieldController(object):
         self.HperOut = 16.952  # Oe por I de la salida (aprox)
         self.MaxHRate = 30.0  # Rate H maximo en Oe/s
         self.InToH = 16.952  # Oe por valor de entrada medidos (Oe/A)
+        # Ramps in the Kepco LIST mode (timed by the Kepco)
+        self.UseList = hasattr(Kepco_instrument, 'SetCurrentList')
+        self.ListDwell = 0.005  # Min time (s) per ramp point
 
         self.Kepco.CurrentMode()
         self.Kepco.voltage = 20.0
@@ -57,28 +62,62 @@ class FieldController(object):
         '''
         vIn = self.Kepco.current
         if Unit == 'Oe':
-            return self.InToH * vIn
+            return self._outputToField(vIn)
         elif Unit == 'A/m':
-            return self.InToH * vIn * 1.0E3 / (4 * numpy.pi)
+            return self._outputToField(vIn) * 1.0E3 / (4 * numpy.pi)
+
+    def readField(self):
+        '''Field from the measured output current (also in LIST mode)'''
+        return self._outputToField(self.Kepco.MeasuredCurrent)
 
     def setField(self, Fld, Alg='Fast'):
         '''Set magnetic field'''
         # TODO self.log('Setting field : %.1f Oe ... ' % Fld, EOL = '')
-        InstTime = 0.01  # Tiempo (en s) aprox en establecer y leer el GPIB
-
-        targetIn = Fld / self.InToH
-        actualIn = self.Kepco.current
-        vInErr = numpy.abs(targetIn - actualIn)
-
-        dVOut = (targetIn - actualIn)  # valor que debe variar la salida
-        # Rampa variando dVolt
-
-        vRate = self.MaxHRate / self.InToH  # Taza de variacion en Vin/s
         vIni = self.Kepco.current
+        targetIn = self._targetOutput(Fld, vIni)
+        vRate = self.MaxHRate / self.InToH  # Taza de variacion en Vin/s
+        self.Ramp(vIni, targetIn, vRate)
+        # TODO self.log('Done.', [125,125,125])
+
+    def Ramp(self, vIni, vFin, vRate):
+        '''
+        Ramps the Kepco current from vIni to vFin at vRate (A/s)
+        '''
+        tRamp = numpy.abs(vFin - vIni) / vRate  # Tiempo de la rampa
+        if self.UseList and tRamp > 0:
+            self.ListRamp(vIni, vFin, tRamp)
+        else:
+            self.SoftwareRamp(vIni, vFin, tRamp)
 
-        vFin = vIni + dVOut
+    def ListRamp(self, vIni, vFin, tRamp):
+        '''
+        Ramp uploaded to the Kepco LIST memory and timed by the Kepco
+        '''
+        nPoints = int(numpy.clip(numpy.ceil(tRamp / self.ListDwell),
+                                 1, self.Kepco.list_max_points))
+        dt = tRamp / nPoints
+        vPoints = numpy.linspace(vIni, vFin, nPoints + 1)[1:]
+        self.vPoints = vPoints
+        self.Kepco.SetCurrentList(vPoints, dt)
+        self.Kepco.RunList()
+        t0 = time.time()
+        try:
+            while time.time() - t0 < tRamp:
+                self._rampProgress((time.time() - t0) / tRamp)
+                time.sleep(numpy.clip(tRamp - (time.time() - t0), 0, 0.05))
+        except FieldRampCancelled:
+            # Hold the actual output
+            self.Kepco.StopList(self.Kepco.MeasuredCurrent)
+            raise
+        self.Kepco.waitOPC(timeout=tRamp + 10)
+        self.Kepco.StopList(vFin)
+
+    def SoftwareRamp(self, vIni, vFin, tRamp):
+        '''
+        Ramp made of sequential current writes
+        '''
+        InstTime = 0.01  # Tiempo (en s) aprox en establecer y leer el GPIB
         nPoints = 400
-        tRamp = vInErr / vRate  # Tiempo que deberia tomar la rampa
         if tRamp - InstTime * nPoints > 0:
             # Delay entre los puntos de la rampa
             dt = (tRamp - InstTime) / nPoints
@@ -87,21 +126,15 @@ class FieldController(object):
             nPoints = numpy.round(tRamp / InstTime) + 5
         vPoints = numpy.linspace(vIni, vFin, int(nPoints))
         self.vPoints = vPoints
-        for v in vPoints:
+        for i, v in enumerate(vPoints):
+            self._rampProgress(i / len(vPoints))
             self.Kepco.current = v
             time.sleep(dt)
-        # time.sleep(0.5)
-        # TODO self.log('Done.', [125,125,125])
 
     def TurnOff(self):
         # TODO self.log('Turning field off ... ', EOL = '')
         vIni = self.Kepco.current
-        vPoints = numpy.linspace(vIni, 0, 100)
-        dt = numpy.abs(vIni) * self.HperOut / (self.MaxHRate * 100.0)
-
-        for v in vPoints:
-            self.Kepco.current = v
-            time.sleep(dt)
+        self.Ramp(vIni, 0, self.MaxHRate / self.HperOut)
         # self.log('Done.', [125,125,125])
 
     def BEEP(self, t_sleep=0.1):
@@ -10,11 +10,12 @@
 
 import time
 import numpy
+from .field_controller_base import FieldControllerBase
 
 __all__ = ['FieldController_SM']
 
 
-class FieldController_SM(object):
+class FieldController_SM(FieldControllerBase):
     '''
     Magnetic field controller
     
@@ -54,9 +55,9 @@ class FieldController_SM(object):
         '''
         vIn = self.SM.source_value
         if Unit == 'Oe':
-            return self.InToH * vIn
+            return self._outputToField(vIn)
         elif Unit == 'A/m':
-            return self.InToH * vIn * 1.0E3 / (4 * numpy.pi)
+            return self._outputToField(vIn) * 1.0E3 / (4 * numpy.pi)
 
     def setField(self, Fld, Alg='Fast'):
         self.SM.output = 'ON'
@@ -64,8 +65,8 @@ class FieldController_SM(object):
         # TODO self.log('Setting field : %.1f Oe ... ' % Fld, EOL = '')
         InstTime = 0.01  # Tiempo (en s) aprox en establecer y leer el GPIB
 
-        targetIn = Fld / self.InToH
         actualIn = self.SM.source_value
+        targetIn = self._targetOutput(Fld, actualIn)
         vInErr = numpy.abs(targetIn - actualIn)
 
         dVOut = (targetIn - actualIn)  # valor que debe variar la salida
@@ -85,7 +86,8 @@ class FieldController_SM(object):
             nPoints = numpy.round(tRamp / InstTime) + 5
         vPoints = numpy.linspace(vIni, vFin, nPoints)
         self.vPoints = vPoints
-        for v in vPoints:
+        for i, v in enumerate(vPoints):
+            self._rampProgress(i / len(vPoints))
             self.SM.source_value = v
             time.sleep(dt)
         # time.sleep(0.5)
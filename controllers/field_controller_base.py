@@ -0,0 +1,173 @@
+# coding=utf-8
+
+# Author: Diego González Chávez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# Base class for the magnetic field controllers
+# Asynchronous field ramps
+#
+# TODO:
+# Make documentation
+
+import threading
+import concurrent.futures
+import numpy
+from .field_sampler import FieldSampler
+
+__all__ = ['FieldControllerBase', 'FieldRamp', 'FieldRampCancelled']
+
+# Ramp executed by each thread
+_ramp_state = threading.local()
+
+
+class FieldRampCancelled(Exception):
+    '''The field ramp was cancelled'''
+    pass
+
+
+class FieldRamp(object):
+    '''
+    Field ramp running in the background (see setFieldAsync)
+
+    Usage :
+        ramp = FC.setFieldAsync(100)
+        ...  # Other work while the field is ramping
+        ramp.wait()
+
+    ramp.progress : Completed fraction of the ramp (0 to 1)
+    ramp.cancel() : Stops the ramp at the actual field
+    The ramp can also be awaited in a coroutine: await ramp
+    '''
+
+    def __init__(self, field):
+        self.field = field
+        self.progress = 0.0
+        self._cancel = threading.Event()
+        self._future = None
+
+    def done(self):
+        return self._future.done()
+
+    def running(self):
+        return self._future.running()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        '''Request the ramp to stop'''
+        self._cancel.set()
+        self._future.cancel()
+
+    def wait(self, timeout=None):
+        '''Wait until the ramp ends, errors in the ramp are raised here'''
+        try:
+            return self._future.result(timeout)
+        except concurrent.futures.CancelledError:
+            raise FieldRampCancelled('Field ramp to %s cancelled' %
+                                     self.field)
+
+    def add_done_callback(self, function):
+        '''function(ramp) is called when the ramp ends'''
+        self._future.add_done_callback(lambda future: function(self))
+
+    def __await__(self):
+        import asyncio
+        return asyncio.wrap_future(self._future).__await__()
+
+
+class FieldControllerBase(object):
+    '''
+    Base class for the magnetic field controllers
+
+    Subclasses implement setField and call _rampProgress(fraction)
+    inside their ramp loops, so the asynchronous ramps can report
+    progress and be cancelled.
+    readField can be overridden with a faster reading of the actual
+    field, it is used to tag the data measured during field sweeps.
+    If calibration is set, the outputs and fields are converted with its
+    tables for the actual sweep direction instead of InToH.
+    '''
+
+    _ramp_executor = None
+    calibration = None  # FieldCalibration of the magnet (None : InToH)
+    _direction = 1  # Direction of the last field change
+
+    def _fieldToOutput(self, Fld, direction=0):
+        '''Output needed for the field Fld (calibration or InToH)'''
+        if self.calibration is None:
+            return Fld / self.InToH
+        return self.calibration.current(Fld, direction)
+
+    def _outputToField(self, vOut):
+        '''Field produced by the output vOut (calibration or InToH)'''
+        if self.calibration is None:
+            return self.InToH * vOut
+        return self.calibration.field(vOut, self._direction)
+
+    def _targetOutput(self, Fld, vIni):
+        '''
+        Output for the field Fld starting from the output vIni
+        Updates the direction of the last field change (hysteresis)
+        '''
+        direction = numpy.sign(Fld - self._outputToField(vIni))
+        if direction != 0:
+            self._direction = direction
+        return self._fieldToOutput(Fld, self._direction)
+
+    def setFieldAsync(self, Fld, *args, **kwargs):
+        '''
+        Starts setField in a background thread
+
+        Usage :
+            ramp = setFieldAsync(Fld)
+            ramp.wait()
+        Returns a FieldRamp
+        Ramps requested before the end of the previous one are queued.
+        '''
+        if self._ramp_executor is None:
+            self._ramp_executor = concurrent.futures.ThreadPoolExecutor(
+                1, thread_name_prefix='Field ramp')
+        ramp = FieldRamp(Fld)
+        ramp._future = self._ramp_executor.submit(self._runRamp, ramp,
+                                                  Fld, args, kwargs)
+        return ramp
+
+    def readField(self):
+        '''Actual field, read without settling delays'''
+        return self.getField()
+
+    def getFieldSampler(self, period=0.01):
+        '''
+        Returns a FieldSampler reading this controller
+
+        Usage :
+            with FC.getFieldSampler() as sampler:
+                ramp = FC.setFieldAsync(Fld)
+                ... acquisition ...
+            h = sampler.fieldAt(t)
+        '''
+        return FieldSampler(self.readField, period)
+
+    def _runRamp(self, ramp, Fld, args, kwargs):
+        if ramp.cancelled():
+            raise FieldRampCancelled('Field ramp to %s cancelled' % Fld)
+        _ramp_state.ramp = ramp
+        try:
+            self.setField(Fld, *args, **kwargs)
+            ramp.progress = 1.0
+        finally:
+            _ramp_state.ramp = None
+
+    def _rampProgress(self, fraction):
+        '''
+        Report the ramp progress (0 to 1)
+        Raises FieldRampCancelled if the asynchronous ramp was cancelled
+        '''
+        ramp = getattr(_ramp_state, 'ramp', None)
+        if ramp is None:
+            return
+        ramp.progress = min(max(fraction, 0.0), 1.0)
+        if ramp.cancelled():
+            raise FieldRampCancelled('Field ramp to %s cancelled' %
+                                     ramp.field)
@@ -0,0 +1,223 @@
+# coding=utf-8
+
+# Author: Diego González Chávez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# Closed loop field control with a learned current to field model
+# Base of the controllers with a field sensor (Hall probe)
+#
+# TODO:
+# Make documentation
+
+import time
+import json
+import numpy
+from .field_controller_base import FieldControllerBase
+
+__all__ = ['FieldModel', 'ClosedLoopFieldController']
+
+
+class FieldModel(object):
+    '''
+    Current to field transfer curve learned from measurements
+
+    Usage :
+        model = FieldModel(HperOut)
+        model.addSample(current, field, direction)
+        current = model.current(field, direction)
+
+    The ascending (direction = 1) and descending (direction = -1)
+    branches are kept separately to follow the hysteresis of the core,
+    the remanence is included in the measured fields.
+    resolution : Current bin of the stored samples (newest sample wins)
+    '''
+
+    def __init__(self, HperOut, resolution=None):
+        self.HperOut = HperOut  # Initial slope (Oe/A)
+        if resolution is None:
+            resolution = 1.0 / abs(HperOut)  # ~1 Oe
+        self.resolution = resolution
+        self.branches = {1: {}, -1: {}}
+
+    def clear(self):
+        self.branches = {1: {}, -1: {}}
+
+    def addSample(self, current, field, direction):
+        if direction == 0:
+            return
+        key = int(numpy.round(current / self.resolution))
+        self.branches[int(numpy.sign(direction))][key] = (current, field)
+
+    def _samples(self, direction, both=True):
+        points = list(self.branches[int(numpy.sign(direction))].values())
+        if len(points) < 2 and both:
+            # Not enough data, use both branches
+            points = (list(self.branches[1].values()) +
+                      list(self.branches[-1].values()))
+        if not points:
+            return numpy.zeros(0), numpy.zeros(0)
+        Is, Hs = numpy.array(sorted(points)).T
+        return Is, Hs
+
+    def slope(self, direction):
+        '''Mean dH/dI of the branch'''
+        Is, Hs = self._samples(direction, both=False)
+        if len(Is) < 2 or numpy.ptp(Is) * abs(self.HperOut) < 10:
+            return self.HperOut
+        slope = numpy.polyfit(Is, Hs, 1)[0]
+        if numpy.sign(slope) != numpy.sign(self.HperOut):
+            return self.HperOut
+        return slope
+
+    def current(self, field, direction):
+        '''Current predicted for field, approaching in direction'''
+        Is, Hs = self._samples(direction)
+        if len(Is) == 0:
+            return field / self.HperOut
+        slope = self.slope(direction)
+        if len(Is) == 1:
+            return Is[0] + (field - Hs[0]) / slope
+        # The field must grow with the current
+        order = numpy.argsort(Hs * numpy.sign(slope))
+        Hs, Is = Hs[order], Is[order]
+        if field < Hs.min():
+            i = Hs.argmin()
+            return Is[i] + (field - Hs[i]) / slope
+        if field > Hs.max():
+            i = Hs.argmax()
+            return Is[i] + (field - Hs[i]) / slope
+        return numpy.interp(field * numpy.sign(slope),
+                            Hs * numpy.sign(slope), Is)
+
+    def save(self, file_name):
+        data = {'HperOut': self.HperOut,
+                'resolution': self.resolution,
+                'up': list(self.branches[1].values()),
+                'down': list(self.branches[-1].values())}
+        with open(file_name, 'w') as f:
+            json.dump(data, f)
+
+    def load(self, file_name):
+        with open(file_name) as f:
+            data = json.load(f)
+        self.HperOut = data['HperOut']
+        self.resolution = data['resolution']
+        self.clear()
+        for I, H in data['up']:
+            self.addSample(I, H, 1)
+        for I, H in data['down']:
+            self.addSample(I, H, -1)
+
+
+class ClosedLoopFieldController(FieldControllerBase):
+    '''
+    Base of the field controllers with a field sensor
+
+    setField jumps to the current predicted by the learned FieldModel
+    and finishes with a short PI correction, falling back to the
+    step by step approach (StepField) if it does not converge.
+
+    Subclasses implement getField(delay), _getOutput(), _setOutput(I)
+    and StepField(Fld, Tol, FldStep)
+    The calibration (if set) is used until the model learns the branch.
+
+    SettleLog : List with the statistics of each setField
+    '''
+
+    Kp = 0.3  # Proportional gain of the correction
+    Ki = 0.7  # Integral gain of the correction
+    MaxCorrections = 10
+    SettleDelay = 0.2  # Delay (s) before each field reading
+
+    def __init__(self):
+        self.Model = FieldModel(self.HperOut)
+        self.Predictive = True
+        self.SettleLog = []
+        self._direction = 1
+
+    def setField(self, Fld, Tol=0.5, FldStep=1.0):
+        '''Set magnetic field'''
+        if self.Predictive and self.PredictiveSetField(Fld, Tol):
+            return
+        self.StepField(Fld, Tol, FldStep)
+
+    def PredictiveSetField(self, Fld, Tol=0.5):
+        '''
+        Jump to the predicted current and correct the error
+        Returns True if the field is within Tol
+        '''
+        t0 = time.time()
+        H0 = self.getField(delay=0)
+        I = self._getOutput()
+        self.Model.addSample(I, H0, self._direction)
+        direction = numpy.sign(Fld - H0)
+        if direction == 0:
+            direction = self._direction
+
+        def progress(H):
+            if Fld != H0:
+                self._rampProgress((H - H0) / (Fld - H0))
+            return H
+
+        if (self.calibration is not None and
+                len(self.Model.branches[int(direction)]) < 2):
+            # Nothing learned yet in this branch
+            I = self.calibration.current(Fld, direction)
+        else:
+            I = self.Model.current(Fld, direction)
+        self._setOutput(I)
+        self._direction = direction
+        tJump = time.time()
+
+        e_prev = None
+        for n in range(self.MaxCorrections + 1):
+            H = progress(self.getField(delay=self.SettleDelay))
+            self.Model.addSample(I, H, self._direction)
+            e = Fld - H
+            if n == 0:
+                jump_error = e
+            if abs(e) <= Tol or n == self.MaxCorrections:
+                break
+            slope = self.Model.slope(self._direction)
+            dI = self.Ki * e / slope
+            if e_prev is not None:
+                dI += self.Kp * (e - e_prev) / slope
+            if numpy.sign(dI) != numpy.sign(e / slope):
+                # Never move against the error (hysteresis branch jumps)
+                dI = self.Ki * e / slope
+            e_prev = e
+            I += dI
+            if dI != 0:
+                self._direction = numpy.sign(dI)
+            self._setOutput(I)
+
+        self.SettleLog.append({'field': Fld,
+                               'jump_error': jump_error,
+                               'error': e,
+                               'corrections': n,
+                               'settle_time': time.time() - tJump,
+                               'total_time': time.time() - t0,
+                               'converged': abs(e) <= Tol})
+        return abs(e) <= Tol
+
+    def SettleStatistics(self):
+        '''
+        Summary of the SettleLog
+
+        Returns a dict with the number of setField calls, the mean,
+        median and max settle times, the mean number of corrections,
+        the mean absolute jump error and the converged fraction.
+        '''
+        if not self.SettleLog:
+            return {'n': 0}
+        log = self.SettleLog
+        times = numpy.array([s['settle_time'] for s in log])
+        return {'n': len(log),
+                'settle_time_mean': times.mean(),
+                'settle_time_median': numpy.median(times),
+                'settle_time_max': times.max(),
+                'corrections_mean': numpy.mean([s['corrections']
+                                                for s in log]),
+                'jump_error_mean': numpy.mean([abs(s['jump_error'])
+                                               for s in log]),
+                'converged': numpy.mean([s['converged'] for s in log])}
@@ -10,11 +10,12 @@
 
 import time
 import numpy
+from .field_controller_closed_loop import ClosedLoopFieldController
 
 __all__ = ['FieldControllerDriven']
 
 
-class FieldControllerDriven(object):
+class FieldControllerDriven(ClosedLoopFieldController):
     '''
     Magnetic field controller
 
@@ -35,6 +36,7 @@ class FieldControllerDriven(object):
         self.Kepco.SetRange('Full')
         self.delay_mult = 1
         self.field_mult = 1
+        super().__init__()
 
     def __del__(self):
         pass
@@ -67,17 +69,42 @@ class FieldControllerDriven(object):
         elif Unit == 'A/m':
             return self.InToH * vIn * 1.0E3 / (4 * numpy.pi)
 
-    def setField(self, Fld, Tol=0.5, FldStep=1.0):
-        '''Set magnetic field'''
+    def readField(self):
+        '''Hall probe field without the settling delay'''
+        return self.InToH * self.VoltMeter.voltage
+
+    def _getOutput(self):
+        return self.Kepco.current
+
+    def _setOutput(self, cOut):
+        '''Ramps the Kepco current to cOut at MaxHRate'''
+        cIni = self.Kepco.current
+        tRamp = numpy.abs(cOut - cIni) * self.HperOut / self.MaxHRate
+        nPoints = int(numpy.clip(tRamp / 0.05, 1, 400))
+        cPoints = numpy.linspace(cIni, cOut, nPoints + 1)[1:]
+        for k, c in enumerate(cPoints):
+            self._rampProgress(k / nPoints)
+            self.Kepco.current = c
+            time.sleep(tRamp / nPoints)
+
+    def StepField(self, Fld, Tol=0.5, FldStep=1.0):
+        '''Set magnetic field, step by step'''
         # TODO self.log('Setting field : %.1f Oe ... ' % Fld, EOL = '')
-        sng = numpy.sign(Fld - self.getField())
+        H0 = self.getField()
+        sng = numpy.sign(Fld - H0)
+
+        def progress(H):
+            if Fld != H0:
+                self._rampProgress((H - H0) / (Fld - H0))
+            return H
 
         t0 = time.time()
         self.getField(delay=0)
         setCurrent = self.Kepco.current
         LoopTime = time.time() - t0
 
-        while (sng * (Fld - self.getField(delay=0)) > 15*self.field_mult):
+        while (sng * (Fld - progress(self.getField(delay=0))) >
+               15*self.field_mult):
             setCurrent += sng * 2.0*FldStep/self.HperOut
             self.Kepco.current = setCurrent
             time.sleep(numpy.max([FldStep/self.MaxHRate - LoopTime, 0]))
@@ -87,7 +114,7 @@ class FieldControllerDriven(object):
         setCurrent = self.Kepco.current
         LoopTime = time.time() - t0
 
-        while (sng * (Fld - self.getField(delay=0.2)) > Tol):
+        while (sng * (Fld - progress(self.getField(delay=0.2))) > Tol):
             setCurrent += sng * FldStep/self.HperOut
             self.Kepco.current = setCurrent
             time.sleep(numpy.max([FldStep/self.MaxHRate - LoopTime, 0]))
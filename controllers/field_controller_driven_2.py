@@ -10,11 +10,12 @@
 
 import time
 import numpy
+from .field_controller_closed_loop import ClosedLoopFieldController
 
 __all__ = ['FieldController_LS643']
 
 
-class FieldController_LS643(object):
+class FieldController_LS643(ClosedLoopFieldController):
     '''
     Magnetic field controller
 
@@ -31,6 +32,7 @@ class FieldController_LS643(object):
 
         self.delay_mult = 1 #field delay multiplyer
         self.field_mult = 1 #field aproach multiplyer
+        super().__init__()
 
     def __del__(self):
         pass
@@ -51,17 +53,41 @@ class FieldController_LS643(object):
         return self.InToH * vIn
 
 
-    def setField(self, Fld, Tol = 0.5, FldStep = 1.0):
+    def readField(self):
+        """Hall probe field without the settling delay"""
+        return self.InToH * self.VoltMeter.voltage
+
+    def _getOutput(self):
+        return self.PowerSource.setpoint
+
+    def _setOutput(self, cOut):
+        '''Sets the source current and waits its ramp'''
+        cIni = self.PowerSource.setpoint
+        self.PowerSource.setpoint = cOut
+        time.sleep(0.1)
+        while not(self.PowerSource.ramp_done):
+            if cOut != cIni:
+                cNow = self.PowerSource.measured_current
+                self._rampProgress((cNow - cIni) / (cOut - cIni))
+            time.sleep(0.1)
+
+    def StepField(self, Fld, Tol = 0.5, FldStep = 1.0):
         """
-        Set Magnetic Field
+        Set Magnetic Field, step by step
         """
-        sng = numpy.sign(Fld - self.getField())
+        H0 = self.getField()
+        sng = numpy.sign(Fld - H0)
+
+        def progress(H):
+            if Fld != H0:
+                self._rampProgress((H - H0) / (Fld - H0))
+            return H
       
-        while ( sng * (Fld - self.getField(delay = 0)) > 20 * self.field_mult):
+        while ( sng * (Fld - progress(self.getField(delay = 0))) > 20 * self.field_mult):
             self.PowerSource.setpoint = self.PowerSource.measured_current + sng * 20/self.HperOut
             self.PowerSource.WaitRamp()
 
-        while ( sng * (Fld - self.getField(delay = 0.2)) > Tol ):
+        while ( sng * (Fld - progress(self.getField(delay = 0.2))) > Tol ):
             self.PowerSource.setpoint = self.PowerSource.measured_current + sng * FldStep/self.HperOut
             self.PowerSource.WaitRamp()
 
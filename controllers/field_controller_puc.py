@@ -10,11 +10,12 @@
 
 import time
 import numpy
+from .field_controller_base import FieldControllerBase
 
 __all__ = ['FieldControllerPUC']
 
 
-class FieldControllerPUC(object):
+class FieldControllerPUC(FieldControllerBase):
 
 #    Controlador de Campo Magnetico
 
@@ -64,9 +65,9 @@ class FieldControllerPUC(object):
         vIn = self.PowerSupply.current * self._sign
         
         if Unit == 'Oe':
-            return self.InToH * vIn
+            return self._outputToField(vIn)
         elif Unit == 'A/m':
-            return self.InToH * vIn * 1.0E3 / (4 * numpy.pi) 
+            return self._outputToField(vIn) * 1.0E3 / (4 * numpy.pi) 
 
 
     def setField(self, Fld, Alg = 'Fast'):
@@ -81,10 +82,8 @@ class FieldControllerPUC(object):
             self._polarity = Fld
             time.sleep(0.1)
             self.PowerSupply.outStatus = 'ON'
-        Fld = numpy.abs(Fld)
-            
-        targetIn = Fld / self.InToH     
         actualIn = self.PowerSupply.current
+        targetIn = numpy.abs(self._targetOutput(Fld, actualIn * self._sign))
         vInErr = numpy.abs(targetIn - actualIn)
 
 
@@ -103,7 +102,8 @@ class FieldControllerPUC(object):
             dt = 0
             nPoints = numpy.round(tRamp / InstTime) + 5
         vPoints = numpy.linspace(vIni, vFin, nPoints)
-        for v in vPoints:
+        for i, v in enumerate(vPoints):
+            self._rampProgress(i / len(vPoints))
             self.PowerSupply.current = v
             time.sleep(dt)
         time.sleep(0.5)
@@ -0,0 +1,133 @@
+# coding=utf-8
+
+# Author: Diego González Chávez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# Background sampler of the magnetic field
+# Used to tag the data measured during continuous field sweeps
+#
+# TODO:
+# Make documentation
+
+import time
+import threading
+import numpy
+
+__all__ = ['FieldSampler']
+
+
+class FieldSampler(object):
+    '''
+    Records timestamped field values in a background thread
+
+    Usage :
+        sampler = FieldSampler(FC.readField)
+        sampler = FieldSampler(lambda: LS475.field)
+        with sampler:
+            ... acquisition ...
+            t = time.time()
+        h = sampler.fieldAt(t)
+
+    read_field : Function returning the actual field
+    period : Time (s) between readings (0 : as fast as possible)
+
+    The time of each reading is the middle of the query.
+    fieldAt interpolates the recorded fields at any acquisition time.
+    '''
+
+    def __init__(self, read_field, period=0.01):
+        self.read_field = read_field
+        self.period = period
+        self.error = None
+        self.thread = None
+        self._times = []
+        self._fields = []
+        self._new_sample = threading.Condition()
+        self._stop = threading.Event()
+
+    def start(self):
+        self._times = []
+        self._fields = []
+        self.error = None
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run,
+                                       name='Field sampler',
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                t0 = time.time()
+                field = self.read_field()
+                t1 = time.time()
+                with self._new_sample:
+                    self._times.append((t0 + t1) / 2)
+                    self._fields.append(field)
+                    self._new_sample.notify_all()
+                self._stop.wait(max(self.period - (time.time() - t0), 0))
+        except Exception as E:
+            self.error = E
+        finally:
+            with self._new_sample:
+                self._new_sample.notify_all()
+
+    @property
+    def times(self):
+        with self._new_sample:
+            return numpy.array(self._times)
+
+    @property
+    def fields(self):
+        with self._new_sample:
+            return numpy.array(self._fields)
+
+    def fieldAt(self, t, timeout=5):
+        '''
+        Field interpolated at the time(s) t
+
+        Usage :
+            fieldAt(t)
+            fieldAt([t0, t1, ...])
+        Waits (up to timeout) for a reading after t while the sampler runs.
+        '''
+        t = numpy.asarray(t, dtype=float)
+        if t.size == 0:
+            return numpy.zeros_like(t)
+        t_max = t.max()
+        with self._new_sample:
+            self._new_sample.wait_for(
+                lambda: ((self._times and self._times[-1] >= t_max) or
+                         not self.running),
+                timeout)
+            times = numpy.array(self._times)
+            fields = numpy.array(self._fields)
+        if len(times) == 0:
+            return t * numpy.nan
+        return numpy.interp(t, times, fields)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.stop()
+        else:
+            try:
+                self.stop()
+            except Exception:
+                pass
+        return False
@@ -0,0 +1,124 @@
+# coding=utf-8
+
+# Author: Diego González Chávez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# Base class for the LockIn controllers
+# Sampling with settle times from the filter settings
+#
+# TODO:
+# Make documentation
+
+import time
+import numpy
+
+__all__ = ['LockInControllerBase']
+
+
+class LockInControllerBase(object):
+    '''
+    Base class for the LockIn controllers
+
+    The time constant and filter slope are read through the lock-in
+    driver, which keeps them in its settings cache.
+    '''
+
+    # Settle time (to 99%) in TCs for each filter slope (dB/octave)
+    _settle_TCs = {0: 1, 6: 5, 12: 7, 18: 9, 24: 10}
+
+    def __init__(self, LockIn_instrument):
+        self.LockIn = LockIn_instrument
+        self.emu_per_V = 1
+        # Bulk sampling with the lock-in data buffer
+        self.UseBuffer = hasattr(LockIn_instrument, 'AcquireBuffer')
+
+    def __del__(self):
+        pass
+
+    def _meanPhase(self, n, measDelay):
+        '''
+        Mean signal phase of n readings every measDelay (s)
+        With snapshot X and Y are read together and vector averaged
+        '''
+        if not hasattr(self.LockIn, 'snapshot'):
+            ph = 0
+            for i in range(n):
+                time.sleep(measDelay)
+                ph += self.LockIn.Phase
+            return ph / n
+        xy = numpy.zeros((n, 2))
+        for i in range(n):
+            time.sleep(measDelay)
+            xy[i] = self.LockIn.snapshot('X', 'Y')
+        X, Y = xy.mean(axis=0)
+        return numpy.rad2deg(numpy.arctan2(Y, X))
+
+    def getRefPhase(self):
+        return self.LockIn.getRefPhase()
+
+    def _getSamples(self, n, measDelay=0, channel='X'):
+        '''
+        n readings of channel ('X' or 'Magnitude') every measDelay (s)
+        Uses the lock-in data buffer if available (one transfer)
+        '''
+        if n <= 0:
+            return numpy.zeros(0)
+        if self.UseBuffer:
+            rate = 512.0 if measDelay <= 0 else 1.0 / measDelay
+            return self.LockIn.AcquireBuffer(n, rate, channel)
+        vsIn = numpy.zeros(n)
+        for i in range(n):
+            time.sleep(measDelay)
+            vsIn[i] = getattr(self.LockIn, channel)
+        return vsIn
+
+    def updateFilter(self):
+        '''
+        Reads again the lock-in time constant and filter slope
+        Call it after changing them from the front panel
+        '''
+        if hasattr(self.LockIn, 'invalidateCache'):
+            self.LockIn.invalidateCache()
+        return self.FilterSettings
+
+    @property
+    def FilterSettings(self):
+        '''(TC, slope in dB/octave) of the lock-in'''
+        if hasattr(self.LockIn, 'getFilterSlope'):
+            slope = self.LockIn.getFilterSlope()
+        else:
+            slope = 24
+        return (self.LockIn.TC, slope)
+
+    @property
+    def SettleTime(self):
+        '''Time (s) for the output to settle after a step'''
+        TC, slope = self.FilterSettings
+        return TC * self._settle_TCs[slope]
+
+    def _delays(self, iniDelay, measDelay):
+        '''Replaces the 'Auto' delays by the settle time and the TC'''
+        if iniDelay == 'Auto':
+            iniDelay = self.SettleTime
+        if measDelay == 'Auto':
+            measDelay = self.FilterSettings[0]
+        return iniDelay, measDelay
+
+    def _sampleMean(self, n, measDelay, channel, semMax=None, nMin=5):
+        '''
+        Takes up to n samples, stops when the standard error of the mean
+        is below semMax (semMax = None : n samples)
+        '''
+        if semMax is None:
+            return self._getSamples(n, measDelay, channel)
+        vsIn = self._getSamples(min(nMin, n), measDelay, channel)
+        while len(vsIn) < n:
+            sigma = vsIn.std(ddof=1)
+            if sigma / numpy.sqrt(len(vsIn)) <= semMax:
+                break
+            # Samples needed to reach semMax
+            n_new = int(numpy.ceil((sigma / semMax)**2)) - len(vsIn)
+            n_new = int(numpy.clip(n_new, 1, n - len(vsIn)))
+            vsIn = numpy.append(vsIn,
+                                self._getSamples(n_new, measDelay, channel))
+        return vsIn
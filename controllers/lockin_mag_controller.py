@@ -10,22 +10,16 @@
 
 import time
 import numpy
+from .lockin_controller_base import LockInControllerBase
 
 __all__ = ['LockIn_Mag_Controller']
 
 
-class LockIn_Mag_Controller(object):
+class LockIn_Mag_Controller(LockInControllerBase):
     '''
     LockIn controler for magnetometers
     '''
 
-    def __init__(self, LockIn_instrument):
-        self.LockIn = LockIn_instrument
-        self.emu_per_V = 1
-
-    def __del__(self):
-        pass
-
     def confDriver(self, OscFrec=200, OscAmp=0.2):
         self.LockIn.setOscilatorAmp(OscAmp)
         self.LockIn.setOscilatorFreq(OscFrec)
@@ -39,30 +33,31 @@ class LockIn_Mag_Controller(object):
         TCtemp = self.LockIn.TC
         self.LockIn.TC = 1
         time.sleep(t_sleep)
-        ph = 0
-        for i in range(10):
-            time.sleep(t_sleep/10)
-            ph += self.LockIn.Phase
-        ph = ph / 10.0
+        ph = self._meanPhase(10, t_sleep/10)
         self.LockIn.setRefPhase(self.LockIn.getRefPhase() + ph)
         self.LockIn.TC = TCtemp
         time.sleep(t_sleep/4)
 
-    def getRefPhase(self):
-        return self.LockIn.getRefPhase()
-
     def getMagnetization(self,
-                         n=20, iniDelay=1, measDelay=0,
-                         stat=False, tol=0.05, maxIts=50):
+                         n=20, iniDelay='Auto', measDelay='Auto',
+                         stat=False, tol=0.05, maxIts=50,
+                         semTol=1E-3, nMin=5):
+        '''
+        n : Max number of samples
+        iniDelay : Settling delay (s), 'Auto' : from the TC and slope
+        measDelay : Delay (s) between samples, 'Auto' : TC
+        semTol : Stops when the standard error of the mean is below
+                 semTol * SEN (None : always n samples)
+        '''
         # TODO self.log('Measuring Magnetization ... ', EOL = '')
-        vsIn = numpy.zeros(n)
+        sen = numpy.abs(self.LockIn.SEN)
+        semMax = None if semTol is None else sen * semTol
+        iniDelay, measDelay = self._delays(iniDelay, measDelay)
         time.sleep(iniDelay)
-        for i in range(n):
-            time.sleep(measDelay)
-            vsIn[i] = self.LockIn.X
+        vsIn = self._sampleMean(n, measDelay, 'X', semMax, nMin)
         vIn = vsIn.mean()
         sigma = vsIn.std()
-        maxSigma = numpy.abs(self.LockIn.SEN * tol)
+        maxSigma = sen * tol
 
         if stat:
             its = 0
@@ -70,19 +65,27 @@ class LockIn_Mag_Controller(object):
                 its += 1
                 err = (vsIn - vIn)**2
                 vsIn = vsIn[err < sigma**2]
-                while len(vsIn) < n:
-                    time.sleep(measDelay)
-                    vsIn = numpy.append(vsIn, self.LockIn.X)
+                vsIn = numpy.append(vsIn, self._getSamples(n - len(vsIn),
+                                                           measDelay, 'X'))
                 vIn = vsIn.mean()
                 sigma = vsIn.std()
         return numpy.array([vIn, sigma]) * self.emu_per_V
 
     def getAmplitude(self,
-                     n=20, iniDelay=1, measDelay=0):
-        vsIn = numpy.zeros(n)
+                     n=20, iniDelay='Auto', measDelay='Auto',
+                     semTol=1E-3, nMin=5):
+        '''
+        n : Max number of samples
+        iniDelay : Settling delay (s), 'Auto' : from the TC and slope
+        measDelay : Delay (s) between samples, 'Auto' : TC
+        semTol : Stops when the standard error of the mean is below
+                 semTol * SEN (None : always n samples)
+        '''
+        semMax = None
+        if semTol is not None:
+            semMax = numpy.abs(self.LockIn.SEN * semTol)
+        iniDelay, measDelay = self._delays(iniDelay, measDelay)
         time.sleep(iniDelay)
-        for i in range(n):
-            time.sleep(measDelay)
-            vsIn[i] = self.LockIn.Magnitude
+        vsIn = self._sampleMean(n, measDelay, 'Magnitude', semMax, nMin)
         vIn = vsIn.mean()
         return vIn
@@ -23,11 +23,10 @@ class ZControler_PUC(object):
         return self.LockIn.setOscilatorFreq(freq)
         
     def getFXY(self, n = 5, iniDelay = 0.1, measDelay = 0):
-        vsIn = numpy.zeros((n,2))
+        # Simultaneous X, Y and frequency in one query
+        vsIn = numpy.zeros((n,3))
         time.sleep(iniDelay)
         for i in range(n):
             time.sleep(measDelay)
-            vsIn[i] = [self.LockIn.X, self.LockIn.Y]
-        vIn = vsIn.mean(axis=0)
-        freq = self.LockIn.Freq
-        return numpy.array([freq, vIn[0], vIn[1]])
+            vsIn[i] = self.LockIn.snapshot('Freq', 'X', 'Y')
+        return vsIn.mean(axis=0)
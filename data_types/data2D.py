@@ -17,6 +17,10 @@ class Data2D(object):
     '''Data container for tabular data
         By default only two columns are used
         these can be accesed using X and Y properties
+
+        The points are stored in a buffer that doubles its capacity
+        when full, dat, X and Y are views of the filled rows
+        (they do not follow the buffer after it grows).
     '''
 
     def __init__(self):
@@ -26,15 +30,28 @@ class Data2D(object):
         self.str_fmt = '%.6E'
         self.reset()
 
-    def reset(self, n=2):
-        self.dat = numpy.array([numpy.zeros((n)) * numpy.NaN])
+    def reset(self, n=2, capacity=256):
+        self._buffer = numpy.zeros((capacity, n)) * numpy.NaN
+        self._n = 0
 
     def addPoint(self, *values):
-        pt = numpy.array(list(values))
-        if not numpy.any(numpy.isfinite(self.dat)):
-            self.dat[0] = pt
-        else:
-            self.dat = numpy.append(self.dat, [pt], axis=0)
+        if self._n == len(self._buffer):
+            new_buffer = numpy.zeros((2 * len(self._buffer),
+                                      self._buffer.shape[1])) * numpy.NaN
+            new_buffer[:self._n] = self._buffer
+            self._buffer = new_buffer
+        self._buffer[self._n] = values
+        self._n += 1
+
+    @property
+    def dat(self):
+        # Before the first point a single NaN row (plots, save)
+        return self._buffer[:max(self._n, 1)]
+
+    @dat.setter
+    def dat(self, values):
+        self._buffer = numpy.array(values, dtype=float, ndmin=2)
+        self._n = len(self._buffer)
 
     def save(self, fileName):
         if self.header is None:
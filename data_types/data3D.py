@@ -26,6 +26,8 @@ class Data3D(object):
     Z[ny] = Z(y) values with y = y[ny]
 
     Saved files keeps the same column row structure
+    file_name.npy : Z array
+    file_name.meta.npz : x, y and header
     '''
 
     def __init__(self):
@@ -38,17 +40,28 @@ class Data3D(object):
         self.y = numpy.atleast_1d(0) * numpy.NaN
         self.dataArray = numpy.atleast_2d(0) * numpy.NaN
         self.Z = self.dataArray
+        self.file_name = None
         self._Ny = -1
         self._Nx = -1
 
-    def initialize(self, xs, ys, dtype=float):
+    def initialize(self, xs, ys, dtype=float, file_name=None):
         '''
         Sets the dataArray to the shape of the list xs and ys
         and stores the xs and ys lists
+
+        file_name : The dataArray is memory mapped to file_name.npy,
+                    each added row or column is written to disk
         '''
         self.x = numpy.atleast_1d(xs)
         self.y = numpy.atleast_1d(ys)
-        self.dataArray = numpy.zeros((len(self.y), len(self.x)), dtype=dtype)
+        shape = (len(self.y), len(self.x))
+        self.file_name = file_name
+        if file_name is None:
+            self.dataArray = numpy.zeros(shape, dtype=dtype)
+        else:
+            self.dataArray = numpy.lib.format.open_memmap(
+                file_name + '.npy', mode='w+', dtype=dtype, shape=shape)
+            self._saveMeta(file_name)
         self.Z = self.dataArray
         self._Ny = -1
         self._Nx = -1
@@ -56,9 +69,49 @@ class Data3D(object):
     def addRow(self, DataR):
         self._Ny = self._Ny + 1
         self.dataArray[self._Ny] = DataR
+        self.flush()
 
     def addColumn(self, DataC):
         self._Nx = self._Nx + 1
         self.dataArray[:, self._Nx] = DataC
+        self.flush()
+
+    def flush(self):
+        '''Writes the memory mapped dataArray to disk'''
+        if isinstance(self.dataArray, numpy.memmap):
+            self.dataArray.flush()
+
+    def _saveMeta(self, file_name):
+        header = '' if self.header is None else self.header
+        numpy.savez(file_name + '.meta', x=self.x, y=self.y, header=header)
+
+    def save(self, file_name=None):
+        '''
+        Save file_name.npy and file_name.meta.npz
+        file_name = None : The memory mapped file
+        '''
+        if file_name is None:
+            file_name = self.file_name
+        if file_name is None:
+            raise ValueError('file_name is required, the dataArray is '
+                             'not memory mapped to a file')
+        if file_name == self.file_name:
+            self.flush()
+        else:
+            numpy.save(file_name + '.npy', self.dataArray)
+        self._saveMeta(file_name)
 
-    # TODO implement saves
+    def load(self, file_name, mmap_mode='r'):
+        '''
+        Load file_name.npy (memory mapped by default)
+        and file_name.meta.npz
+        '''
+        with numpy.load(file_name + '.meta.npz') as meta:
+            self.x = meta['x']
+            self.y = meta['y']
+            self.header = str(meta['header']) or None
+        self.dataArray = numpy.load(file_name + '.npy', mmap_mode=mmap_mode)
+        self.Z = self.dataArray
+        self.file_name = file_name if mmap_mode is not None else None
+        self._Ny = -1
+        self._Nx = -1
@@ -17,17 +17,31 @@ class DataND(object):
     '''
     Data container for Z(x) data type.
     where Z an array 
+
+    Saved files :
+    file_name.npy : Z array
+    file_name.meta.npz : x and header
     '''
 
     def __init__(self):
         self.header = None
         self.fmt = 'npy'
+        self.file_name = None
 
-    def initialize(self, x, shape, dtype=float):
+    def initialize(self, x, shape, dtype=float, file_name=None):
         '''
+        file_name : The dataArray is memory mapped to file_name.npy,
+                    each added data is written to disk
         '''
         self.x = numpy.atleast_1d(x)
-        self.dataArray = numpy.zeros([len(self.x), *shape], dtype=dtype)
+        shape = (len(self.x), *shape)
+        self.file_name = file_name
+        if file_name is None:
+            self.dataArray = numpy.zeros(shape, dtype=dtype)
+        else:
+            self.dataArray = numpy.lib.format.open_memmap(
+                file_name + '.npy', mode='w+', dtype=dtype, shape=shape)
+            self._saveMeta(file_name)
         self._N = -1
 
     def addData(self, Data, i='Last'):
@@ -35,5 +49,41 @@ class DataND(object):
             self._N = self._N + 1
             i = self._N
         self.dataArray[i] = Data
+        self.flush()
+
+    def flush(self):
+        '''Writes the memory mapped dataArray to disk'''
+        if isinstance(self.dataArray, numpy.memmap):
+            self.dataArray.flush()
+
+    def _saveMeta(self, file_name):
+        header = '' if self.header is None else self.header
+        numpy.savez(file_name + '.meta', x=self.x, header=header)
 
-    # TODO implement saves
+    def save(self, file_name=None):
+        '''
+        Save file_name.npy and file_name.meta.npz
+        file_name = None : The memory mapped file
+        '''
+        if file_name is None:
+            file_name = self.file_name
+        if file_name is None:
+            raise ValueError('file_name is required, the dataArray is '
+                             'not memory mapped to a file')
+        if file_name == self.file_name:
+            self.flush()
+        else:
+            numpy.save(file_name + '.npy', self.dataArray)
+        self._saveMeta(file_name)
+
+    def load(self, file_name, mmap_mode='r'):
+        '''
+        Load file_name.npy (memory mapped by default)
+        and file_name.meta.npz
+        '''
+        with numpy.load(file_name + '.meta.npz') as meta:
+            self.x = meta['x']
+            self.header = str(meta['header']) or None
+        self.dataArray = numpy.load(file_name + '.npy', mmap_mode=mmap_mode)
+        self.file_name = file_name if mmap_mode is not None else None
+        self._N = -1
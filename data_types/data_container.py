@@ -10,6 +10,8 @@
 
 import numpy
 import time
+import os
+import json
 
 __all__ = ['DataContainer']
 
@@ -17,12 +19,28 @@ __all__ = ['DataContainer']
 class DataContainer(object):
     '''
     Data container
+
+    Incremental storage for long measurements:
+        rows_done = Data.openStorage(file_name, resume)
+        Data.allocate('S11', (n_fields, n_freqs), complex)
+        for i in range(rows_done, n_fields):
+            Data['S11'][i] = ...
+            Data.flushRow(i)
+        Data.save(file_name)
+
+    The storage is a directory (file_name + file_id + '.d') with one
+    .npy file per key and a manifest.json. The allocated arrays are
+    memory mapped, flushRow writes them to disk with the other keys
+    and records the last complete row, so a stopped or crashed run
+    keeps everything measured and can be resumed.
     '''
 
     def __init__(self, **kwargs):
         self.info = ''
         self.file_id = ''
         self._data = {**kwargs}
+        self._storage = None
+        self._manifest = None
 
     def __setitem__(self, key, value):
         self._data[key] = value
@@ -36,10 +54,200 @@ class DataContainer(object):
     def keys(self):
         return self._data.keys()
 
+    def openStorage(self, file_name, resume=False):
+        '''
+        Starts the incremental storage in file_name + file_id + '.d'
+        resume : Continue a previous run, the arrays are reopened by
+                 allocate and the missing keys (references) are loaded
+        Returns the number of complete rows (0 if not resume)
+        file_name = None : Only closes the previous storage
+        Without resume the files of a previous run are deleted
+        '''
+        self.closeStorage(complete=False)
+        self._releaseMemmaps()
+        if file_name is None:
+            return 0
+        self._storage = file_name + self.file_id + '.d'
+        manifest_file = os.path.join(self._storage, 'manifest.json')
+        if resume and os.path.isfile(manifest_file):
+            with open(manifest_file) as f:
+                self._manifest = json.load(f)
+            memmaps = self._manifest.get('memmaps', [])
+            for key, key_file in self._manifest['files'].items():
+                if key in memmaps or key in self._data:
+                    continue
+                value = numpy.load(os.path.join(self._storage, key_file))
+                self._data[key] = value[()] if value.ndim == 0 else value
+        else:
+            os.makedirs(self._storage, exist_ok=True)
+            for old_file in os.listdir(self._storage):
+                if (old_file.endswith(('.npy', '.tmp')) or
+                        old_file == 'manifest.json'):
+                    os.remove(os.path.join(self._storage, old_file))
+            self._manifest = {'files': {}, 'rows_done': 0,
+                              'complete': False}
+        return self._manifest['rows_done']
+
+    @property
+    def rows_done(self):
+        if self._manifest is None:
+            return 0
+        return self._manifest['rows_done']
+
+    def _keyFile(self, key):
+        files = self._manifest['files']
+        if key not in files:
+            files[key] = '%03d.npy' % len(files)
+        return os.path.join(self._storage, files[key])
+
+    def allocate(self, key, shape, dtype=float, fill=0):
+        '''
+        Creates the array key
+        Memory mapped to the storage if it is open, the array of a
+        resumed run is reused if it has the same shape and dtype.
+        '''
+        if self._storage is None:
+            self._data[key] = numpy.zeros(shape, dtype=dtype) + fill
+            return self._data[key]
+        shape = tuple(int(n) for n in numpy.atleast_1d(shape))
+        resumed = key in self._manifest['files']
+        file_name = self._keyFile(key)
+        if resumed:
+            array = numpy.lib.format.open_memmap(file_name, mode='r+')
+            if array.shape != shape or array.dtype != numpy.dtype(dtype):
+                raise ValueError('%s : stored array %s %s does not match '
+                                 '%s %s' % (key, array.shape, array.dtype,
+                                            shape, numpy.dtype(dtype)))
+        else:
+            array = numpy.lib.format.open_memmap(file_name, mode='w+',
+                                                 dtype=dtype, shape=shape)
+            array[...] = fill
+        self._manifest.setdefault('memmaps', [])
+        if key not in self._manifest['memmaps']:
+            self._manifest['memmaps'].append(key)
+        self._data[key] = array
+        return array
+
+    def flushRow(self, i=None):
+        '''
+        Writes the data to the storage (if open)
+        i : Last complete row of the allocated arrays
+        '''
+        if self._storage is None:
+            return
+        for key, value in self._data.items():
+            if isinstance(value, numpy.memmap):
+                value.flush()
+            else:
+                tmp_file = os.path.join(self._storage, 'tmp.npy')
+                numpy.save(tmp_file, numpy.asarray(value))
+                os.replace(tmp_file, self._keyFile(key))
+        if i is not None:
+            self._manifest['rows_done'] = i + 1
+        self._manifest['info'] = str(self.info)
+        self._manifest['DateTime'] = time.asctime(time.localtime())
+        tmp_file = os.path.join(self._storage, 'manifest.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(self._manifest, f, indent=1)
+        os.replace(tmp_file, os.path.join(self._storage, 'manifest.json'))
+
+    def closeStorage(self, complete=True):
+        '''
+        Closes the storage
+        complete : Writes the remaining data and marks the run as complete,
+                   if False the storage keeps the last flushed row
+        '''
+        if self._storage is None:
+            return
+        if complete:
+            self._manifest['complete'] = True
+            self.flushRow()
+        self._storage = None
+        self._manifest = None
+        self._releaseMemmaps()
+
+    def _releaseMemmaps(self):
+        '''
+        Replaces the memory mapped arrays by in memory copies
+        The files are released (they can not be truncated or
+        replaced while mapped on Windows)
+        '''
+        for key, value in self._data.items():
+            if isinstance(value, numpy.memmap):
+                self._data[key] = numpy.array(value)
+
+    def saveStorage(self, file_name):
+        '''
+        Save as an uncompressed storage directory (see openStorage)
+        The arrays can be memory mapped by load
+        '''
+        self.openStorage(file_name)
+        self.closeStorage()
+
+    @classmethod
+    def open(cls, file_name):
+        '''
+        Opens the data file_name + '.d' (memory mapped) or '.npz'
+        The arrays are read from the file when accessed
+        Returns the data, Info and DateTime
+        '''
+        if os.path.isdir(file_name + '.d'):
+            data = cls()
+            manifest = data.load(file_name + '.d', mmap_mode='r')
+            return data, str(data.info), manifest.get('DateTime', '')
+        data = numpy.load(file_name + '.npz')
+        DateTime = str(data['DateTime']) if 'DateTime' in data.files else ''
+        return data, str(data['Info']), DateTime
+
+    def load(self, file_name, mmap_mode=None):
+        '''
+        Loads a .npz file or a storage directory (.d)
+        mmap_mode : numpy.load mmap_mode for the storage arrays
+
+        The rows not measured in an incomplete (stopped) run
+        are set to NaN in the allocated arrays
+        '''
+        if os.path.isdir(file_name):
+            with open(os.path.join(file_name, 'manifest.json')) as f:
+                manifest = json.load(f)
+            self.info = manifest.get('info', '')
+            complete = manifest.get('complete', True)
+            rows_done = manifest.get('rows_done', 0)
+            memmaps = manifest.get('memmaps', [])
+            if not complete:
+                print('DataContainer *warning* : %s is an incomplete run, '
+                      'only %d rows were measured' % (file_name, rows_done))
+            for key, key_file in manifest['files'].items():
+                mode = mmap_mode
+                mask = (not complete and key in memmaps)
+                if mask and mode == 'r':
+                    # Copy on write, the file is not modified
+                    mode = 'c'
+                value = numpy.load(os.path.join(file_name, key_file),
+                                   mmap_mode=mode)
+                if mask and value.dtype.kind in 'fc':
+                    value[rows_done:] = numpy.nan
+                if value.ndim == 0:
+                    value = value[()]
+                self._data[key] = value
+            return manifest
+        with numpy.load(file_name) as npz:
+            for key in npz.files:
+                if key == 'Info':
+                    self.info = str(npz[key])
+                elif key != 'DateTime':
+                    self._data[key] = npz[key]
+
     def save(self, file_name):
         '''
-        Save a .npy file
+        Save a .npz file
+        If the incremental storage of file_name is open
+        it is completed instead
         '''
+        if self._storage == file_name + self.file_id + '.d':
+            self.closeStorage()
+            return
+        self.closeStorage(complete=False)
         numpy.savez_compressed(file_name + self.file_id,
                                Info=self.info,
                                DateTime=time.asctime(time.localtime()),
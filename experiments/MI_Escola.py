@@ -58,13 +58,27 @@ class MI(object):
         return self.IAC.getRData(new = True)
 
     def _SaveData(self, file_name):
+        '''
+        Saves the raw impedance in
+        file_name.MI_Raw_Z .npy + .meta.npz (see Data3D)
+        and the reference, fields and frequencies in
+        file_name.MI_Raw.npz (see LoadData)
+        '''
+        self.Z_Data.header = self.Info
+        self.Z_Data.save(file_name + '.MI_Raw_Z')
         numpy.savez_compressed(file_name + '.MI_Raw',
-                               Z=numpy.nan_to_num(self.Z_Data.dataArray),
                                Ref=self.Ref,
                                h=self.Z_Data.x,
                                f=self.Z_Data.y,
                                Info=self.Info)
 
+    def LoadData(self, file_name):
+        '''Loads the data saved by _SaveData, raw map memory mapped'''
+        self.Z_Data.load(file_name + '.MI_Raw_Z')
+        with numpy.load(file_name + '.MI_Raw.npz') as raw:
+            self.Ref = raw['Ref']
+            self.Info = str(raw['Info'])
+
     def SaveRef(self, file_name):
         self.Ref = self._MeasureSpectra()
         numpy.savez_compressed(file_name + '.MI_Ref',
@@ -98,7 +112,13 @@ class MI(object):
         freqs = self.IAC.frequencies
 
         # Initialize data objects
-        self.Z_Data.initialize(fields, freqs, dtype=complex)
+        # The raw Z parameters are written to disk field by field
+        self.Z_Data.header = self.Info
+        if file_name is None:
+            self.Z_Data.initialize(fields, freqs, dtype=complex)
+        else:
+            self.Z_Data.initialize(fields, freqs, dtype=complex,
+                                   file_name=file_name + '.MI_Raw_Z')
         self.DataPlot.initialize(fields, freqs)
 
         # Loop for each field
@@ -127,8 +127,10 @@ class MxH(object):
         # Loop for each field
         for i, h in enumerate(fields):
             self.FC.setField(h)
-            while abs(h - self.FC.getField()) > 50:
-                self.FC.setField(h)
+            if self.FC.calibration is None:
+                # Without calibration the field target is not accurate
+                while abs(h - self.FC.getField()) > 50:
+                    self.FC.setField(h)
             #time.sleep(0.5)
             m, sm = self.VC.getMagnetization(n=n_pts, iniDelay=iniDelay, 
                                              measDelay=measDelay)
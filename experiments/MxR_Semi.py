@@ -6,6 +6,7 @@ import os
 import magdynlab.instruments
 import magdynlab.controllers
 import magdynlab.data_types
+from magdynlab.experiments.pipeline import Pipeline
 import threading_decorators as ThD
 import matplotlib.pyplot as plt
 
@@ -88,19 +89,28 @@ class RxH(object):
             data_shape = ( len(fields), len(m_data[key]) )
             self.Data[key] = numpy.zeros(data_shape)
 
-        # Loop for each field
-        for i, h in enumerate(fields):
+        def process(item):
+            i, m_data = item
+            self.Data['R'][i] = self.PlotFunct(m_data)
 
-            self.FC.setField(h)
+        # Fit and plot (and png file) workers,
+        # the loop only talks to the instruments
+        pipe = Pipeline()
+        pipe.addStage(process)
+        pipe.addStage(lambda item: Plot_RxH(self.Data), conflate=True)
 
-            m_data = self.SCA.getResultDictionary(new=True, delete=True)
-            for key in m_data.keys():
-                self.Data[key][i,:] = m_data[key]
+        # Loop for each field
+        with pipe:
+            for i, h in enumerate(fields):
 
-            self.Data['R'][i] = self.PlotFunct(m_data)
-            Plot_RxH(self.Data)
+                self.FC.setField(h)
+
+                m_data = self.SCA.getResultDictionary(new=True, delete=True)
+                for key in m_data.keys():
+                    self.Data[key][i,:] = m_data[key]
+                pipe.put((i, m_data))
 
-            ThD.check_stop()
+                ThD.check_stop()
 
         if file_name is not None:
             self.Data.save(file_name)
@@ -7,31 +7,19 @@ import os
 import magdynlab.instruments
 import magdynlab.controllers
 import magdynlab.data_types
+from magdynlab.experiments.pipeline import Pipeline
+from magdynlab.experiments.live_plot import LiveColorMap
 import threading_decorators as ThD
 import matplotlib.pyplot as plt
 
-@ThD.gui_safe
-def Plot_ColorMap(Data):
-    f = plt.figure('PNA-FMR', (5, 4))
+_ColorMap_Plot = LiveColorMap('PNA-FMR', 'Field (Oe)', 'Freq (GHz)',
+                              y_scale=1E-9)
 
-    extent = numpy.array([Data['h'].min(),
-                          Data['h'].max(),
-                          Data['f'].min()/1E9,
-                          Data['f'].max()/1E9])
 
-    if not(f.axes):
-        plt.subplot()
-    ax = f.axes[0]
-    ax.clear()
-    ax.imshow(Data['ColorMap'].T,
-              aspect='auto',
-              origin='lower',
-              extent=extent)
-
-    ax.set_xlabel('Field (Oe)')
-    ax.set_ylabel('Freq (GHz)')
-    f.tight_layout()
-    f.canvas.draw()
+@ThD.gui_safe
+def Plot_ColorMap(Data, i=None, reverse=False):
+    _ColorMap_Plot.update(Data['h'], Data['f'], Data['ColorMap'],
+                          i, reverse)
 
 
 @ThD.gui_safe
@@ -126,7 +114,7 @@ class PNA_FMR_1P(object):
     def MeasureRef(self):
         self.Data['S11_Ref'] = self.VNAC.getSData(0, True)
 
-    def PlotColorMap(self, i=None):
+    def ProcessColorMap(self, i=None):
         Pabs_ref = 1 - numpy.abs(self.Data['S11_Ref'])**2
 
         if i is not None:
@@ -140,27 +128,47 @@ class PNA_FMR_1P(object):
             self.Data['ColorMap'] = Pabs - Pabs_ref[None,:]
             if self.Data['h'][0] > self.Data['h'][-1]:
                 self.Data['ColorMap'] = Pabs[::-1] - Pabs_ref[None,:]
-        Plot_ColorMap(self.Data)
 
-    @ThD.as_thread
-    def Measure(self, fields, file_name, hold_time=0.0):
+    def PlotColorMap(self, i=None):
+        self.ProcessColorMap(i)
+        reverse = self.Data['h'][0] > self.Data['h'][-1]
+        Plot_ColorMap(self.Data, i, reverse)
 
+    @ThD.as_thread
+    def Measure(self, fields, file_name, hold_time=0.0, resume=False):
+        '''
+        resume : Continue the stopped run saved in file_name
+                 from its last complete field
+        '''
         Data = self.Data
 
+        # Raw data written to disk field by field
+        rows_done = Data.openStorage(file_name, resume)
         Data['h'] = fields
         Data['f'] = self.VNAC.frequencies
         data_shape = (len(Data['h']), len(Data['f']))
-        Data['S11'] = numpy.zeros(data_shape, dtype=complex)
-        Data['ColorMap'] = numpy.zeros(data_shape, dtype=float) + numpy.nan
+        Data.allocate('S11', data_shape, complex, numpy.nan)
+        Data.allocate('ColorMap', data_shape, float, numpy.nan)
         Data.info = self.Info
         
+        # ColorMap and plot workers, the loop only talks to the instruments
+        pipe = Pipeline()
+        pipe.addStage(self.ProcessColorMap)
+        reverse = fields[0] > fields[-1]
+        pipe.addStage(lambda i: Plot_ColorMap(Data, i, reverse),
+                      conflate=True)
+
         # Loop for each field
-        for i, h in enumerate(fields):
-            self.FC.setField(h)
-            time.sleep(hold_time)
-            Data['S11'][i] = self.VNAC.getSData(0, True)
-            self.PlotColorMap(i)
-            ThD.check_stop()
+        with pipe:
+            for i in range(rows_done):
+                pipe.put(i)
+            for i, h in enumerate(fields[rows_done:], rows_done):
+                self.FC.setField(h)
+                time.sleep(hold_time)
+                self.VNAC.getSData(0, True, out=Data['S11'][i])
+                Data.flushRow(i)
+                pipe.put(i)
+                ThD.check_stop()
 
         if file_name is not None:
             Data.save(file_name)
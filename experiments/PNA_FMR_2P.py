@@ -6,6 +6,7 @@ import os
 import magdynlab.instruments
 import magdynlab.controllers
 import magdynlab.data_types
+from magdynlab.experiments.pipeline import Pipeline
 import threading_decorators as ThD
 import matplotlib.pyplot as plt
 
@@ -101,7 +102,7 @@ class VNA_FMR_2P(object):
     def SetTraces(self):
         self.VNAC.set_traces_SParameters_2P()
 
-    def PlotColorMap(self, i=None):
+    def ProcessColorMap(self, i=None):
         Pabs_ref = 1 \
                    - numpy.abs(self.Data['S11_Ref'])**2 \
                    - numpy.abs(self.Data['S21_Ref'])**2
@@ -121,24 +122,31 @@ class VNA_FMR_2P(object):
             self.ColorMapData['ColorMap'] = Pabs - Pabs_ref[None,:]
             if self.Data['h'][0] > self.Data['h'][-1]:
                 self.ColorMapData['ColorMap'] = Pabs[::-1] - Pabs_ref[None,:]
+
+    def PlotColorMap(self, i=None):
+        self.ProcessColorMap(i)
         Plot_ColorMap(self.ColorMapData)
 
     def MeasureRef(self):
-        self.Data['S11_Ref'] = self.VNAC.getSData(0, True)
-        self.Data['S21_Ref'] = self.VNAC.getSData(1, False)
-        self.Data['S22_Ref'] = self.VNAC.getSData(2, False)
-        self.Data['S12_Ref'] = self.VNAC.getSData(3, False)
+        S11, S21, S22, S12 = self.VNAC.getAllSData(True)
+        self.Data['S11_Ref'] = S11
+        self.Data['S21_Ref'] = S21
+        self.Data['S22_Ref'] = S22
+        self.Data['S12_Ref'] = S12
 
     @ThD.as_thread
-    def Measure(self, fields, file_name, hold_time=0.0):
-
+    def Measure(self, fields, file_name, hold_time=0.0, resume=False):
+        '''
+        resume : Continue the stopped run saved in file_name
+                 from its last complete field
+        '''
+        # Raw data written to disk field by field
+        rows_done = self.Data.openStorage(file_name, resume)
         self.Data['h'] = fields
         self.Data['f'] = self.VNAC.frequencies
         data_shape = (len(self.Data['h']), len(self.Data['f']))
-        self.Data['S11'] = numpy.zeros(data_shape, dtype=complex)
-        self.Data['S21'] = numpy.zeros(data_shape, dtype=complex)
-        self.Data['S22'] = numpy.zeros(data_shape, dtype=complex)
-        self.Data['S12'] = numpy.zeros(data_shape, dtype=complex)
+        for S in ['S11', 'S21', 'S22', 'S12']:
+            self.Data.allocate(S, data_shape, complex, numpy.nan)
         self.Data.info = self.Info
         
         self.ColorMapData['h'] = self.Data['h']
@@ -146,17 +154,31 @@ class VNA_FMR_2P(object):
         self.ColorMapData['ColorMap'] = numpy.zeros(data_shape, dtype=float)
         self.ColorMapData['ColorMap'] += numpy.nan
         self.ColorMapData.info = self.Info
-        
+
+        # S11, S21, S22, S12 buffer (same order as the VNA traces)
+        SData = numpy.zeros((4, len(self.Data['f'])), dtype=complex)
+
+        # ColorMap and plot workers, the loop only talks to the instruments
+        pipe = Pipeline()
+        pipe.addStage(self.ProcessColorMap)
+        pipe.addStage(lambda i: Plot_ColorMap(self.ColorMapData),
+                      conflate=True)
+
         # Loop for each field
-        for i, h in enumerate(fields):
-            self.FC.setField(h)
-            time.sleep(hold_time)
-            self.Data['S11'][i] = self.VNAC.getSData(0, True)
-            self.Data['S21'][i] = self.VNAC.getSData(1, False)
-            self.Data['S22'][i] = self.VNAC.getSData(2, False)
-            self.Data['S12'][i] = self.VNAC.getSData(3, False)
-            self.PlotColorMap(i)
-            ThD.check_stop()
+        with pipe:
+            for i in range(rows_done):
+                pipe.put(i)
+            for i, h in enumerate(fields[rows_done:], rows_done):
+                self.FC.setField(h)
+                time.sleep(hold_time)
+                self.VNAC.getAllSData(True, out=SData)
+                self.Data['S11'][i] = SData[0]
+                self.Data['S21'][i] = SData[1]
+                self.Data['S22'][i] = SData[2]
+                self.Data['S12'][i] = SData[3]
+                self.Data.flushRow(i)
+                pipe.put(i)
+                ThD.check_stop()
 
         if file_name is not None:
             self.Data.save(file_name)
@@ -224,11 +246,12 @@ class VNA_FMR_2P(object):
             for ci, c in enumerate(cs):
                 self.FC.Kepco.current = c
                 time.sleep(osc_hold_time)
-                self.Data_Osc['S11'][hi,ci] = self.VNAC.getSData(0, True)
-                self.Data_Osc['S21'][hi,ci] = self.VNAC.getSData(1, False)
+                S11, S21, S22, S12 = self.VNAC.getAllSData(True)[:, 0]
+                self.Data_Osc['S11'][hi,ci] = S11
+                self.Data_Osc['S21'][hi,ci] = S21
                 if mode == 'Full':
-                    self.Data_Osc['S22'][hi,ci] = self.VNAC.getSData(2, False)
-                    self.Data_Osc['S12'][hi,ci] = self.VNAC.getSData(3, False)
+                    self.Data_Osc['S22'][hi,ci] = S22
+                    self.Data_Osc['S12'][hi,ci] = S12
                 ThD.check_stop()
             ThD.check_stop()
             self.PlotdPdH(hi)
@@ -6,6 +6,8 @@ import os
 import magdynlab.instruments
 import magdynlab.controllers
 import magdynlab.data_types
+from magdynlab.experiments.pipeline import Pipeline
+from magdynlab.experiments.live_plot import LiveColorMap
 import threading_decorators as ThD
 import matplotlib.pyplot as plt
 
@@ -74,28 +76,14 @@ def Plot_dPdH_frequency(Data):
     f.tight_layout()
     f.canvas.draw()
 
-@ThD.gui_safe
-def Plot_ColorMap(Data):
-    f = plt.figure('VNA-FMR', (5, 4))
-
-    extent = numpy.array([Data['h'].min(),
-                          Data['h'].max(),
-                          Data['f'].min()/1E9,
-                          Data['f'].max()/1E9])
+_ColorMap_Plot = LiveColorMap('VNA-FMR', 'Field (Oe)', 'Freq (GHz)',
+                              y_scale=1E-9)
 
-    if not(f.axes):
-        plt.subplot()
-    ax = f.axes[0]
-    ax.clear()
-    ax.imshow(Data['ColorMap'].T,
-              aspect='auto',
-              origin='lower',
-              extent=extent)
 
-    ax.set_xlabel('Field (Oe)')
-    ax.set_ylabel('Freq (GHz)')
-    f.tight_layout()
-    f.canvas.draw()
+@ThD.gui_safe
+def Plot_ColorMap(Data, i=None, reverse=False, xlim=None):
+    _ColorMap_Plot.update(Data['h'], Data['f'], Data['ColorMap'],
+                          i, reverse, xlim)
 
 class VNA_FMR_1P(object):
     def __init__(self, ResouceNames={}):
@@ -133,7 +121,7 @@ class VNA_FMR_1P(object):
     def SetTraces(self):
         self.VNAC.set_traces_SParameters_1P()
 
-    def PlotColorMap(self, i=None):
+    def ProcessColorMap(self, i=None):
         Pabs_ref = 1 - numpy.abs(self.Data['S11_Ref'])**2
 
         if i is not None:
@@ -147,18 +135,27 @@ class VNA_FMR_1P(object):
             self.ColorMapData['ColorMap'] = Pabs - Pabs_ref[None,:]
             if self.Data['h'][0] > self.Data['h'][-1]:
                 self.ColorMapData['ColorMap'] = Pabs[::-1] - Pabs_ref[None,:]
-        Plot_ColorMap(self.ColorMapData)
+
+    def PlotColorMap(self, i=None):
+        self.ProcessColorMap(i)
+        reverse = self.Data['h'][0] > self.Data['h'][-1]
+        Plot_ColorMap(self.ColorMapData, i, reverse)
 
     def MeasureRef(self):
         self.Data['S11_Ref'] = self.VNAC.getSData(0, True)
 
     @ThD.as_thread
-    def Measure(self, fields, file_name, hold_time=0.0):
-
+    def Measure(self, fields, file_name, hold_time=0.0, resume=False):
+        '''
+        resume : Continue the stopped run saved in file_name
+                 from its last complete field
+        '''
+        # Raw data written to disk field by field
+        rows_done = self.Data.openStorage(file_name, resume)
         self.Data['h'] = fields
         self.Data['f'] = self.VNAC.frequencies
         data_shape = (len(self.Data['h']), len(self.Data['f']))
-        self.Data['S11'] = numpy.zeros(data_shape, dtype=complex)
+        self.Data.allocate('S11', data_shape, complex, numpy.nan)
         self.Data.info = self.Info
         
         self.ColorMapData['h'] = self.Data['h']
@@ -167,14 +164,96 @@ class VNA_FMR_1P(object):
         self.ColorMapData['ColorMap'] += numpy.nan
         self.ColorMapData.info = self.Info
         
+        # ColorMap and plot workers, the loop only talks to the instruments
+        pipe = Pipeline()
+        pipe.addStage(self.ProcessColorMap)
+        reverse = fields[0] > fields[-1]
+        pipe.addStage(lambda i: Plot_ColorMap(self.ColorMapData,
+                                              i, reverse),
+                      conflate=True)
+
         # Loop for each field
-        for i, h in enumerate(fields):
-            self.FC.setField(h)
-            time.sleep(hold_time)
-            self.Data['S11'][i] = self.VNAC.getSData(0, True)
-            self.PlotColorMap(i)
-            ThD.check_stop()
+        with pipe:
+            for i in range(rows_done):
+                pipe.put(i)
+            for i, h in enumerate(fields[rows_done:], rows_done):
+                self.FC.setField(h)
+                time.sleep(hold_time)
+                self.VNAC.getSData(0, True, out=self.Data['S11'][i])
+                self.Data.flushRow(i)
+                pipe.put(i)
+                ThD.check_stop()
+
+        if file_name is not None:
+            self.Data.save(file_name)
+        self.FC.TurnOff()
+        self.FC.Kepco.BEEP()
+
+    def ProcessSweepColorMap(self, i):
+        Pabs_ref = 1 - numpy.abs(self.Data['S11_Ref'])**2
+        Pabs = 1 - numpy.abs(self.Data['S11'][i])**2
+        self.Data['h'].append(self.FieldSampler.fieldAt(self.Data['t'][i]))
+        self._sweep_map.append(Pabs - Pabs_ref)
+
+    def PlotSweepColorMap(self, i=None):
+        n = len(self._sweep_map)
+        hs = numpy.array(self.Data['h'][:n])
+        ColorMap = numpy.array(self._sweep_map[:n])
+        reverse = hs[0] > hs[-1]
+        if reverse:
+            hs = hs[::-1]
+            ColorMap = ColorMap[::-1]
+        self.ColorMapData['h'] = hs
+        self.ColorMapData['ColorMap'] = ColorMap
+        Plot_ColorMap(self.ColorMapData, n - 1, reverse, self._sweep_range)
+
+    @ThD.as_thread
+    def MeasureSweep(self, h_ini, h_fin, file_name, sample_period=0.01):
+        '''
+        Continuous field sweep
+
+        The field ramps from h_ini to h_fin at FC.MaxHRate while the VNA
+        measures as fast as it can. Each spectrum is tagged with the
+        field interpolated at the middle of its acquisition.
+        '''
+        self.FC.setField(h_ini)
 
+        self.Data['f'] = self.VNAC.frequencies
+        self.Data['t'] = []
+        self.Data['h'] = []
+        self.Data['S11'] = []
+        self.Data.info = self.Info
+        self.ColorMapData['f'] = self.Data['f']
+        self.ColorMapData.info = self.Info
+        self._sweep_map = []
+        self._sweep_range = (min(h_ini, h_fin), max(h_ini, h_fin))
+
+        pipe = Pipeline()
+        pipe.addStage(self.ProcessSweepColorMap)
+        pipe.addStage(self.PlotSweepColorMap, conflate=True)
+
+        self.FieldSampler = self.FC.getFieldSampler(sample_period)
+        with self.FieldSampler, pipe:
+            ramp = self.FC.setFieldAsync(h_fin)
+            try:
+                i = 0
+                while not ramp.done():
+                    S11 = numpy.empty(len(self.Data['f']), dtype=complex)
+                    t0 = time.time()
+                    self.VNAC.getSData(0, True, out=S11)
+                    self.Data['t'].append((t0 + time.time()) / 2)
+                    self.Data['S11'].append(S11)
+                    pipe.put(i)
+                    i += 1
+                    ThD.check_stop()
+            finally:
+                if not ramp.done():
+                    ramp.cancel()
+            ramp.wait()
+
+        self.Data['t'] = numpy.array(self.Data['t'])
+        self.Data['h'] = numpy.array(self.Data['h'])
+        self.Data['S11'] = numpy.array(self.Data['S11'])
         if file_name is not None:
             self.Data.save(file_name)
         self.FC.TurnOff()
@@ -254,6 +333,9 @@ class VNA_FMR_1P(object):
         self.Measure.stop()
         if self.Measure.thread is not None:
             self.Measure.thread.join()
+        if self.MeasureSweep.thread is not None:
+            self.MeasureSweep.stop()
+            self.MeasureSweep.thread.join()
         time.sleep(1)
         self.FC.BEEP()
         time.sleep(0.1)
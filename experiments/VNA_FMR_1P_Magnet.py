@@ -145,7 +145,7 @@ class VNA_FMR_1P(object):
             self.FC.setField(h)
             self.Data['h'][i] = self.FC.getField()
             time.sleep(hold_time)
-            self.Data['S11'][i] = self.VNAC.getSData(0, True)
+            self.VNAC.getSData(0, True, out=self.Data['S11'][i])
             self.PlotColorMap(i)
             ThD.check_stop()
 
@@ -71,15 +71,29 @@ class VNA_FMR(object):
         return Ss
 
     def _SaveData(self, file_name):
+        '''
+        Saves the raw wave quantities in
+        file_name.VNA_P_Raw_a1 (b1, b2) .npy + .meta.npz (see Data3D)
+        and the references, fields and frequencies in
+        file_name.VNA_P_Raw.npz (see LoadData)
+        '''
+        for D, name in zip(self.DataCollection, ['a1', 'b1', 'b2']):
+            D.header = self.Info
+            D.save(file_name + '.VNA_P_Raw_' + name)
         numpy.savez_compressed(file_name + '.VNA_P_Raw',
-                               a1=numpy.nan_to_num(self.DataCollection[0].dataArray),
-                               b1=numpy.nan_to_num(self.DataCollection[1].dataArray),
-                               b2=numpy.nan_to_num(self.DataCollection[2].dataArray),
                                Ref=self.Refs,
                                h=self.DataCollection[0].x,
                                f=self.DataCollection[0].y,
                                Info=self.Info)
 
+    def LoadData(self, file_name):
+        '''Loads the data saved by _SaveData, raw maps memory mapped'''
+        for D, name in zip(self.DataCollection, ['a1', 'b1', 'b2']):
+            D.load(file_name + '.VNA_P_Raw_' + name)
+        with numpy.load(file_name + '.VNA_P_Raw.npz') as raw:
+            self.Refs = raw['Ref']
+            self.Info = str(raw['Info'])
+
     def SaveRef(self, file_name):
         self.Refs = numpy.array(self._MeasureSpectra())
         numpy.savez_compressed(file_name + '.VNA_P_Ref',
@@ -120,8 +134,14 @@ class VNA_FMR(object):
         freqs = self.VNAC.frequencies
 
         # Initialize data objects
-        for D in self.DataCollection:
-            D.initialize(fields, freqs, dtype=complex)
+        # The raw wave quantities are written to disk field by field
+        for D, name in zip(self.DataCollection, ['a1', 'b1', 'b2']):
+            D.header = self.Info
+            if file_name is None:
+                D.initialize(fields, freqs, dtype=complex)
+            else:
+                D.initialize(fields, freqs, dtype=complex,
+                             file_name=file_name + '.VNA_P_Raw_' + name)
         self.DataPlot.initialize(fields, freqs)
 
         # Loop for each field
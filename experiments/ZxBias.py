@@ -6,31 +6,18 @@ import os
 import magdynlab.instruments
 import magdynlab.controllers
 import magdynlab.data_types
+from magdynlab.experiments.live_plot import LiveColorMap
 import threading_decorators as ThD
 import matplotlib.pyplot as plt
 
+_ColorMap_Plot = LiveColorMap('ZxBias', 'Bias Voltage (V)', 'Freq (kHz)',
+                             y_scale=1E-3)
+
+
 @ThD.gui_safe
-def Plot_ColorMap(Data):
-    f = plt.figure('ZxBias', (5, 4))
-
-    extent = numpy.array([Data['bias'].min(),
-                          Data['bias'].max(),
-                          Data['f'].min()/1E3,
-                          Data['f'].max()/1E3])
-
-    if not(f.axes):
-        plt.subplot()
-    ax = f.axes[0]
-    ax.clear()
-    ax.imshow(Data['ColorMap'].T,
-              aspect='auto',
-              origin='lower',
-              extent=extent)
-
-    ax.set_xlabel('Bias Voltage (V)')
-    ax.set_ylabel('Freq (kHz)')
-    f.tight_layout()
-    f.canvas.draw()
+def Plot_ColorMap(Data, i=None, reverse=False):
+    _ColorMap_Plot.update(Data['bias'], Data['f'], Data['ColorMap'],
+                          i, reverse)
 
 class ZxBias(object):
     def __init__(self, ResouceNames={}):
@@ -51,38 +38,53 @@ class ZxBias(object):
         self.Data.file_id = '.ZxBias_Raw' #Z vs Bias vs fs
 
         self.ColorMapData = magdynlab.data_types.DataContainer()
-        self.ColorMapData.file_id = '.ZxH_ColorMap' #|Z| vs hs vs fs
+        self.ColorMapData.file_id = '.ZxBias_ColorMap' #|Z| vs bias vs fs
+        self._ColorMap_rows = 0  # ColorMap rows already processed
 
         self.SaveFormat = 'npy'
         self.Info = ''
         self.PlotFunct = numpy.abs
 
-    def PlotColorMap(self, i=None):
+    def ProcessColorMap(self, i):
+        '''Computes the ColorMap rows not processed yet, up to i'''
+        j0 = self._ColorMap_rows
+        if i < j0:
+            return
         Z_ref = self.PlotFunct(self.Data['Ref'])
-        if i is not None:
-            # Update up to i column
-            for j in range(i+1):
-                Z = self.PlotFunct(self.Data['Z'][j])
-                if self.Data['bias'][0] > self.Data['bias'][-1]:
-                    j = -1 - j
-                self.ColorMapData['ColorMap'][j] = Z - Z_ref
+        Z = self.PlotFunct(self.Data['Z'][j0:i+1])
+        rows = numpy.arange(j0, i+1)
+        if self.Data['bias'][0] > self.Data['bias'][-1]:
+            rows = -1 - rows
+        self.ColorMapData['ColorMap'][rows] = Z - Z_ref[None,:]
+        self._ColorMap_rows = i + 1
+
+    def PlotColorMap(self, i=None):
+        if i is None:
+            # Recompute all
+            self.ColorMapData['ColorMap'] = numpy.zeros(
+                self.Data['Z'].shape) + numpy.nan
+            self._ColorMap_rows = 0
+            self.ProcessColorMap(len(self.Data['Z']) - 1)
         else:
-            Z = self.PlotFunct(self.Data['Z'])
-            self.ColorMapData['ColorMap'] = Z - Z_ref[None,:]
-            if self.Data['bias'][0] > self.Data['bias'][-1]:
-                self.ColorMapData['ColorMap'] = Z[::-1]
-        Plot_ColorMap(self.ColorMapData)
+            self.ProcessColorMap(i)
+        reverse = self.Data['bias'][0] > self.Data['bias'][-1]
+        Plot_ColorMap(self.ColorMapData, i, reverse)
 
     def MeasureRef(self):
         self.Data['Ref'] = self.IAC.getRData(True)
 
     @ThD.as_thread
-    def Measure(self, bias_volts, file_name, hold_time=0.01):
-
+    def Measure(self, bias_volts, file_name, hold_time=0.01, resume=False):
+        '''
+        resume : Continue the stopped run saved in file_name
+                 from its last complete bias voltage
+        '''
+        # Raw data written to disk point by point
+        rows_done = self.Data.openStorage(file_name, resume)
         self.Data['bias'] = bias_volts
         self.Data['f'] = self.IAC.frequencies
         data_shape = (len(self.Data['bias']), len(self.Data['f']))
-        self.Data['Z'] = numpy.zeros(data_shape, dtype=complex)
+        self.Data.allocate('Z', data_shape, complex, numpy.nan)
         self.Data.info = self.Info
         
         self.ColorMapData['bias'] = self.Data['bias']
@@ -90,17 +92,20 @@ class ZxBias(object):
         self.ColorMapData['ColorMap'] = numpy.zeros(data_shape, dtype=float)
         self.ColorMapData['ColorMap'] += numpy.nan
         self.ColorMapData.info = self.Info
+        self._ColorMap_rows = 0
         
         # Loop for each field
-        for i, v in enumerate(bias_volts):
+        for i, v in enumerate(bias_volts[rows_done:], rows_done):
             self.IA.Ch1.bias_voltage = v
             time.sleep(hold_time)
             self.Data['Z'][i] = self.IAC.getRData(True)
+            self.Data.flushRow(i)
             self.PlotColorMap(i)
             ThD.check_stop()
 
         if file_name is not None:
             self.Data.save(file_name)
+            self.ColorMapData.save(file_name)
 
     def Stop(self):
         print('Stoping...')
@@ -6,54 +6,27 @@ import os
 import magdynlab.instruments
 import magdynlab.controllers
 import magdynlab.data_types
+from magdynlab.experiments.pipeline import Pipeline
+from magdynlab.experiments.live_plot import LiveColorMap
 import threading_decorators as ThD
 import matplotlib.pyplot as plt
 
-@ThD.gui_safe
-def Plot_ColorMap(Data):
-    f = plt.figure('ZxH', (5, 4))
-
-    extent = numpy.array([Data['h'].min(),
-                          Data['h'].max(),
-                          Data['f'].min()/1E3,
-                          Data['f'].max()/1E3])
+_ColorMap_Plot = LiveColorMap('ZxH', 'Field (Oe)', 'Freq (kHz)',
+                              y_scale=1E-3)
 
-    if not(f.axes):
-        plt.subplot()
-    ax = f.axes[0]
-    ax.clear()
-    ax.imshow(Data['ColorMap'].T,
-              aspect='auto',
-              origin='lower',
-              extent=extent)
-
-    ax.set_xlabel('Field (Oe)')
-    ax.set_ylabel('Freq (kHz)')
-    f.tight_layout()
-    f.canvas.draw()
 
 @ThD.gui_safe
-def Plot_ColorMapTime(Data):
-    f = plt.figure('Zxt', (5, 4))
+def Plot_ColorMap(Data, i=None, reverse=False, xlim=None):
+    _ColorMap_Plot.update(Data['h'], Data['f'], Data['ColorMap'],
+                          i, reverse, xlim)
 
-    extent = numpy.array([Data['t'].min(),
-                          Data['t'].max(),
-                          Data['f'].min()/1E3,
-                          Data['f'].max()/1E3])
+_ColorMapTime_Plot = LiveColorMap('Zxt', 'Time (s)', 'Freq (kHz)',
+                                  y_scale=1E-3)
 
-    if not(f.axes):
-        plt.subplot()
-    ax = f.axes[0]
-    ax.clear()
-    ax.imshow(Data['ColorMap'].T,
-              aspect='auto',
-              origin='lower',
-              extent=extent)
 
-    ax.set_xlabel('Time (s)')
-    ax.set_ylabel('Freq (kHz)')
-    f.tight_layout()
-    f.canvas.draw()
+@ThD.gui_safe
+def Plot_ColorMapTime(Data, i=None):
+    _ColorMapTime_Plot.update(Data['t'], Data['f'], Data['ColorMap'], i)
 
 @ThD.gui_safe
 def Plot_ResFreq(Data):
@@ -117,50 +90,71 @@ class ZxH(object):
 
         self.ColorMapData = magdynlab.data_types.DataContainer()
         self.ColorMapData.file_id = '.ZxH_ColorMap' #|Z| vs hs vs fs
+        self._ColorMap_rows = 0  # ColorMap rows already processed
 
         self.SaveFormat = 'npy'
         self.Info = ''
         self.PlotFunct = numpy.abs
 
-    def PlotColorMap(self, i=None):
+    def ProcessColorMap(self, i):
+        '''Computes the ColorMap rows not processed yet, up to i'''
+        j0 = self._ColorMap_rows
+        if i < j0:
+            return
         Z_ref = self.PlotFunct(self.Data['Ref'])
-        if i is not None:
-            # Update up to i column
-            for j in range(i+1):
-                Z = self.PlotFunct(self.Data['Z'][j])
-                if self.Data['h'][0] > self.Data['h'][-1]:
-                    j = -1 - j
-                self.ColorMapData['ColorMap'][j] = Z - Z_ref
+        Z = self.PlotFunct(self.Data['Z'][j0:i+1])
+        rows = numpy.arange(j0, i+1)
+        if self.Data['h'][0] > self.Data['h'][-1]:
+            rows = -1 - rows
+        self.ColorMapData['ColorMap'][rows] = Z - Z_ref[None,:]
+        self._ColorMap_rows = i + 1
+
+    def PlotColorMap(self, i=None):
+        if i is None:
+            # Recompute all
+            self.ColorMapData['ColorMap'] = numpy.zeros(
+                self.Data['Z'].shape) + numpy.nan
+            self._ColorMap_rows = 0
+            self.ProcessColorMap(len(self.Data['Z']) - 1)
         else:
-            Z = self.PlotFunct(self.Data['Z'])
-            self.ColorMapData['ColorMap'] = Z - Z_ref[None,:]
-            if self.Data['h'][0] > self.Data['h'][-1]:
-                self.ColorMapData['ColorMap'] = Z[::-1]
-        Plot_ColorMap(self.ColorMapData)
+            self.ProcessColorMap(i)
+        reverse = self.Data['h'][0] > self.Data['h'][-1]
+        Plot_ColorMap(self.ColorMapData, i, reverse)
+
+    def ProcessColorMapTime(self, i):
+        '''
+        Computes the ColorMap and ResFreq rows not processed yet, up to i
+        '''
+        j0 = self._ColorMap_rows
+        if i < j0:
+            return
+        Z_ref = self.PlotFunct(self.Data['Ref'])
+        Z = self.PlotFunct(self.DataTime['Z'][j0:i+1])
+        ColorMap = Z - Z_ref[None,:]
+        self.ColorMapData['ColorMap'][j0:i+1] = ColorMap
+        posPeak = ColorMap.argmax(axis=1)
+        self.ColorMapData['ResFreq'][j0:i+1] = self.DataTime['f'][posPeak]
+        self._ColorMap_rows = i + 1
 
     def PlotColorMapTime(self, i=None):
-        Z_ref = self.PlotFunct(self.Data['Ref'])
-        if i is not None:
-            # Update up to i column
-            for j in range(i+1):
-                Z = self.PlotFunct(self.DataTime['Z'][j])
-                self.ColorMapData['ColorMap'][j] = Z - Z_ref
-        else:
-            Z = self.PlotFunct(self.DataTime['Z'])
-            self.ColorMapData['ColorMap'] = Z - Z_ref[None,:]
+        row = i
+        if i is None:
+            # Recompute all
+            n_t = len(self.DataTime['Z'])
+            self.ColorMapData['ColorMap'] = numpy.zeros(
+                self.DataTime['Z'].shape) + numpy.nan
+            self.ColorMapData['ResFreq'] = numpy.zeros(n_t) + numpy.nan
+            self._ColorMap_rows = 0
+            i = n_t - 1
+        self.ProcessColorMapTime(i)
 
         dt = self.DataTime['t'][1] - self.DataTime['t'][0]
         if dt < 0:
             dt = 1
 
         self.ColorMapData['t'] = numpy.arange(0, len(self.DataTime['t'])) * dt
-        Plot_ColorMapTime(self.ColorMapData)
+        Plot_ColorMapTime(self.ColorMapData, row)
 
-        if i is not None:
-            # Update up to i column
-            for j in range(i+1):
-                posPeak = self.ColorMapData['ColorMap'][j].argmax()
-                self.ColorMapData['ResFreq'][j] = self.DataTime['f'][posPeak]
         if i >= 1:
             Plot_ResFreq(self.ColorMapData)
 
@@ -168,12 +162,17 @@ class ZxH(object):
         self.Data['Ref'] = self.IAC.getRData(True)
 
     @ThD.as_thread
-    def Measure(self, fields, file_name, hold_time=0.0):
-
+    def Measure(self, fields, file_name, hold_time=0.0, resume=False):
+        '''
+        resume : Continue the stopped run saved in file_name
+                 from its last complete field
+        '''
+        # Raw data written to disk field by field
+        rows_done = self.Data.openStorage(file_name, resume)
         self.Data['h'] = fields
         self.Data['f'] = self.IAC.frequencies
         data_shape = (len(self.Data['h']), len(self.Data['f']))
-        self.Data['Z'] = numpy.zeros(data_shape, dtype=complex)
+        self.Data.allocate('Z', data_shape, complex, numpy.nan)
         self.Data.info = self.Info
         
         self.ColorMapData['h'] = self.Data['h']
@@ -181,15 +180,94 @@ class ZxH(object):
         self.ColorMapData['ColorMap'] = numpy.zeros(data_shape, dtype=float)
         self.ColorMapData['ColorMap'] += numpy.nan
         self.ColorMapData.info = self.Info
+        self._ColorMap_rows = 0
         
+        # ColorMap and plot worker, the loop only talks to the instruments
+        # PlotColorMap(i) processes the new rows up to i,
+        # only the newest i is needed
+        pipe = Pipeline()
+        pipe.addStage(self.PlotColorMap, conflate=True)
+
         # Loop for each field
-        for i, h in enumerate(fields):
-            self.FC.setField(h)
-            time.sleep(hold_time)
-            self.Data['Z'][i] = self.IAC.getRData(True)
-            self.PlotColorMap(i)
-            ThD.check_stop()
+        with pipe:
+            for i, h in enumerate(fields[rows_done:], rows_done):
+                self.FC.setField(h)
+                time.sleep(hold_time)
+                self.Data['Z'][i] = self.IAC.getRData(True)
+                self.Data.flushRow(i)
+                pipe.put(i)
+                ThD.check_stop()
+
+        if file_name is not None:
+            self.Data.save(file_name)
+            self.ColorMapData.save(file_name)
+        self.FC.TurnOff()
+        self.FC.Kepco.BEEP()
+
+    def ProcessSweep(self, i):
+        Z_ref = self.PlotFunct(self.Data['Ref'])
+        Z = self.PlotFunct(self.Data['Z'][i])
+        self.Data['h'].append(self.FieldSampler.fieldAt(self.Data['t'][i]))
+        self._sweep_map.append(Z - Z_ref)
+
+    def PlotSweepColorMap(self, i=None):
+        n = len(self._sweep_map)
+        hs = numpy.array(self.Data['h'][:n])
+        ColorMap = numpy.array(self._sweep_map[:n])
+        reverse = hs[0] > hs[-1]
+        if reverse:
+            hs = hs[::-1]
+            ColorMap = ColorMap[::-1]
+        self.ColorMapData['h'] = hs
+        self.ColorMapData['ColorMap'] = ColorMap
+        Plot_ColorMap(self.ColorMapData, n - 1, reverse, self._sweep_range)
+
+    @ThD.as_thread
+    def MeasureSweep(self, h_ini, h_fin, file_name, sample_period=0.01):
+        '''
+        Continuous field sweep
 
+        The field ramps from h_ini to h_fin at FC.MaxHRate while the
+        impedance analyzer measures as fast as it can. Each spectrum is
+        tagged with the field interpolated at the middle of its acquisition.
+        '''
+        self.FC.setField(h_ini)
+
+        self.Data['f'] = self.IAC.frequencies
+        self.Data['t'] = []
+        self.Data['h'] = []
+        self.Data['Z'] = []
+        self.Data.info = self.Info
+        self.ColorMapData['f'] = self.Data['f']
+        self.ColorMapData.info = self.Info
+        self._sweep_map = []
+        self._sweep_range = (min(h_ini, h_fin), max(h_ini, h_fin))
+
+        pipe = Pipeline()
+        pipe.addStage(self.ProcessSweep)
+        pipe.addStage(self.PlotSweepColorMap, conflate=True)
+
+        self.FieldSampler = self.FC.getFieldSampler(sample_period)
+        with self.FieldSampler, pipe:
+            ramp = self.FC.setFieldAsync(h_fin)
+            try:
+                i = 0
+                while not ramp.done():
+                    t0 = time.time()
+                    Z = self.IAC.getRData(True)
+                    self.Data['t'].append((t0 + time.time()) / 2)
+                    self.Data['Z'].append(Z)
+                    pipe.put(i)
+                    i += 1
+                    ThD.check_stop()
+            finally:
+                if not ramp.done():
+                    ramp.cancel()
+            ramp.wait()
+
+        self.Data['t'] = numpy.array(self.Data['t'])
+        self.Data['h'] = numpy.array(self.Data['h'])
+        self.Data['Z'] = numpy.array(self.Data['Z'])
         if file_name is not None:
             self.Data.save(file_name)
         self.FC.TurnOff()
@@ -209,20 +287,26 @@ class ZxH(object):
         self.ColorMapData['ColorMap'] = numpy.zeros(data_shape, dtype=float)
         self.ColorMapData['ColorMap'] += numpy.nan
         self.ColorMapData.info = self.Info
+        self._ColorMap_rows = 0
 
         self.FC.setField(field)
 
+        pipe = Pipeline()
+        pipe.addStage(self.PlotColorMapTime, conflate=True)
+
         # Loop for each field
-        for i in range(n_steps):
-            time.sleep(time_step)
-            self.DataTime['t'][i] = time.time()
-            self.DataTime['Z'][i] = self.IAC.getRData(True)
-            self.PlotColorMapTime(i)
-            ThD.check_stop()
+        with pipe:
+            for i in range(n_steps):
+                time.sleep(time_step)
+                self.DataTime['t'][i] = time.time()
+                self.DataTime['Z'][i] = self.IAC.getRData(True)
+                pipe.put(i)
+                ThD.check_stop()
 
         self.DataTime.info = self.Info
         if file_name is not None:
             self.DataTime.save(file_name)
+            self.ColorMapData.save(file_name)
 
     def Stop(self, TurnOff=True):
         print('Stoping...')
@@ -230,6 +314,9 @@ class ZxH(object):
         if self.Measure.thread is not None:
             self.Measure.stop()
             self.Measure.thread.join()
+        if self.MeasureSweep.thread is not None:
+            self.MeasureSweep.stop()
+            self.MeasureSweep.thread.join()
         if self.MeasureVsTime.thread is not None:
             self.MeasureVsTime.stop()
             self.MeasureVsTime.thread.join()
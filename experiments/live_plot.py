@@ -0,0 +1,190 @@
+# coding=utf-8
+
+# Author: Diego Gonzalez Chavez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# magdynlab
+# Live plots updated in place for the experiments
+#
+# TODO:
+# Make documentation
+
+import time
+import numpy
+import matplotlib.pyplot as plt
+
+__all__ = ['LiveColorMap']
+
+
+class LiveColorMap(object):
+    '''
+    Colormap figure updated in place
+
+    Usage :
+        CM_Plot = LiveColorMap('VNA-FMR', 'Field (Oe)', 'Freq (GHz)',
+                               y_scale=1E-9)
+        CM_Plot.update(h, f, ColorMap)  # ColorMap.shape = (len(h), len(f))
+        CM_Plot.update(h, f, ColorMap, i)  # Rows measured up to i
+
+    The image is created once (again if the figure is closed or xlim
+    changes), the updates only set the data and redraw the image
+    over the saved background (blitting).
+    A new extent is set in the image, the axes are redrawn only if
+    their limits change. xlim (e.g. the planned field range of a sweep)
+    fixes the x limits so growing maps are still blitted.
+    The color limits only grow to include the new finite values.
+    With i (rows measured in order, from the last one if reverse) only
+    the rows measured since the previous update are scanned, a smaller
+    i starts a new measurement (new color limits).
+    Updates faster than max_fps are merged in a single delayed redraw.
+    update must be called from the GUI thread (ThD.gui_safe).
+    '''
+
+    def __init__(self, fig_name, xlabel, ylabel,
+                 x_scale=1, y_scale=1, figsize=(5, 4), max_fps=10):
+        self.fig_name = fig_name
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.x_scale = x_scale
+        self.y_scale = y_scale
+        self.figsize = figsize
+        self.max_fps = max_fps
+        self.figure = None
+        self.image = None
+        self._extent = None
+        self._xlim = None
+        self._clim = None
+        self._background = None
+        self._pending = None
+        self._timer = None
+        self._last_draw = 0
+        self._next_row = 0
+
+    def update(self, x, y, ColorMap, i=None, reverse=False, xlim=None):
+        if self._pending is not None and self._pending[3] is None:
+            # Keep the pending full scan
+            i = None
+        if xlim is not None:
+            xlim = tuple(xlim)
+        self._pending = (x, y, ColorMap, i, reverse, xlim)
+        wait = self._last_draw + 1.0 / self.max_fps - time.time()
+        if wait <= 0:
+            self._draw()
+        elif self._timer is None and self.figure is not None:
+            self._timer = self.figure.canvas.new_timer(
+                interval=int(wait * 1000) + 1)
+            self._timer.single_shot = True
+            self._timer.add_callback(self._draw)
+            self._timer.start()
+
+    def _draw(self):
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+        if self._pending is None:
+            return
+        x, y, ColorMap, i, reverse, xlim = self._pending
+        self._pending = None
+        extent = numpy.array([numpy.min(x) * self.x_scale,
+                              numpy.max(x) * self.x_scale,
+                              numpy.min(y) * self.y_scale,
+                              numpy.max(y) * self.y_scale])
+
+        f = plt.figure(self.fig_name, self.figsize)
+        new_clim = self._updateClim(ColorMap, i, reverse)
+        if f is not self.figure or self.image is None or xlim != self._xlim:
+            self._create(f, extent, ColorMap, xlim)
+        else:
+            self.image.set_data(ColorMap.T)
+            if new_clim:
+                self.image.set_clim(*self._clim)
+            ax = self.image.axes
+            limits = (ax.get_xlim(), ax.get_ylim())
+            if not numpy.array_equal(extent, self._extent):
+                self._extent = extent
+                self.image.set_extent(extent)
+            if limits != (ax.get_xlim(), ax.get_ylim()):
+                # New ticks, full redraw (saves a new background)
+                self._background = None
+                f.canvas.draw_idle()
+            else:
+                self._blit()
+        self._last_draw = time.time()
+
+    def _updateClim(self, ColorMap, i=None, reverse=False):
+        if i is None:
+            rows = ColorMap
+            self._next_row = 0
+        else:
+            if i + 1 < self._next_row:
+                # New measurement
+                self._clim = None
+                self._next_row = 0
+            j0 = min(self._next_row, i)
+            n = len(ColorMap)
+            if reverse:
+                rows = ColorMap[n - 1 - i:n - j0]
+            else:
+                rows = ColorMap[j0:i + 1]
+            self._next_row = i + 1
+        finite = rows[numpy.isfinite(rows)]
+        if finite.size == 0:
+            return False
+        vmin, vmax = finite.min(), finite.max()
+        if self._clim is not None:
+            if vmin >= self._clim[0] and vmax <= self._clim[1]:
+                return False
+            vmin = min(vmin, self._clim[0])
+            vmax = max(vmax, self._clim[1])
+        self._clim = (vmin, vmax)
+        return True
+
+    def _create(self, f, extent, ColorMap, xlim=None):
+        if f is not self.figure:
+            self._clim = None
+            self._updateClim(ColorMap)
+            f.canvas.mpl_connect('draw_event', self._onDraw)
+        self.figure = f
+        self._extent = extent
+        self._xlim = xlim
+        self._background = None
+        if not(f.axes):
+            plt.subplot()
+        ax = f.axes[0]
+        ax.clear()
+        self.image = ax.imshow(ColorMap.T,
+                               aspect='auto',
+                               origin='lower',
+                               extent=extent,
+                               animated=True)
+        if self._clim is not None:
+            self.image.set_clim(*self._clim)
+        if xlim is not None:
+            ax.set_xlim(numpy.array(xlim) * self.x_scale)
+        ax.set_xlabel(self.xlabel)
+        ax.set_ylabel(self.ylabel)
+        f.tight_layout()
+        f.canvas.draw()
+
+    def _onDraw(self, event):
+        # Full redraws (resize, zoom, savefig) exclude the animated image,
+        # save the new background (blitting canvases only) and always
+        # draw the image over it with the renderer of the redraw
+        if self.image is None:
+            return
+        canvas = event.canvas
+        if getattr(canvas, 'supports_blit',
+                   hasattr(canvas, 'copy_from_bbox')):
+            self._background = canvas.copy_from_bbox(self.image.axes.bbox)
+        self.image.draw(event.renderer)
+
+    def _blit(self):
+        canvas = self.figure.canvas
+        if self._background is None:
+            canvas.draw_idle()
+            return
+        ax = self.image.axes
+        canvas.restore_region(self._background)
+        ax.draw_artist(self.image)
+        canvas.blit(ax.bbox)
+        canvas.flush_events()
@@ -0,0 +1,143 @@
+# coding=utf-8
+
+# Author: Diego Gonzalez Chavez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# magdynlab
+# Producer/consumer pipeline for the experiments
+#
+# TODO:
+# Make documentation
+
+import queue
+import threading
+
+__all__ = ['Pipeline']
+
+_STOP = object()
+
+
+class _Stage(object):
+    '''
+    Worker thread of a Pipeline
+    '''
+
+    def __init__(self, function, maxsize, conflate, name):
+        self.function = function
+        self.conflate = conflate
+        self.name = name
+        self.next = None
+        self.error = None
+        self._queue = queue.Queue(maxsize)
+        self.thread = threading.Thread(target=self._run,
+                                       name='Pipeline %s' % name,
+                                       daemon=True)
+
+    def put(self, item):
+        if not self.conflate:
+            # Blocks while the queue is full
+            self._queue.put(item)
+            return
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                # Drop the oldest pending item
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            stop = item is _STOP
+            if self.conflate and not stop:
+                # Process only the newest pending item
+                while True:
+                    try:
+                        newer = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if newer is _STOP:
+                        stop = True
+                        break
+                    item = newer
+            if item is not _STOP and self.error is None:
+                try:
+                    self.function(item)
+                except Exception as E:
+                    self.error = E
+            if item is not _STOP and self.next is not None:
+                self.next.put(item)
+        if self.next is not None:
+            self.next.put(_STOP)
+
+
+class Pipeline(object):
+    '''
+    Producer/consumer pipeline
+
+    Usage :
+        pipe = Pipeline()
+        pipe.addStage(self.ProcessColorMap)
+        pipe.addStage(self.PlotColorMap, conflate=True)
+        with pipe:
+            for i, h in enumerate(fields):
+                ... acquisition ...
+                pipe.put(i)
+
+    Each item goes through the stages in order, every stage runs in its
+    own thread and is fed by a bounded queue (put blocks when it is full).
+    Conflating stages only process the newest pending item (plots).
+    Errors raised in a stage are raised again by put and close.
+    '''
+
+    def __init__(self):
+        self.stages = []
+
+    def addStage(self, function, maxsize=8, conflate=False, name=None):
+        if name is None:
+            name = getattr(function, '__name__', '%d' % len(self.stages))
+        stage = _Stage(function, maxsize, conflate, name)
+        if self.stages:
+            self.stages[-1].next = stage
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.thread.start()
+
+    def _checkErrors(self):
+        for stage in self.stages:
+            if stage.error is not None:
+                error, stage.error = stage.error, None
+                raise error
+
+    def put(self, item):
+        self._checkErrors()
+        self.stages[0].put(item)
+
+    def close(self):
+        '''Process all the pending items and stop the workers'''
+        self.stages[0].put(_STOP)
+        for stage in self.stages:
+            stage.thread.join()
+        self._checkErrors()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            try:
+                self.close()
+            except Exception:
+                pass
+        return False
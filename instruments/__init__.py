@@ -9,6 +9,7 @@
 # Make documentation
 
 from .instruments_base import *
+from .simulated_visa import *
 
 from .lakeshore_475 import *
 from .lakeshore_643 import *
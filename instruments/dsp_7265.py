@@ -18,6 +18,13 @@ __all__ = ['DSP_7265']
 
 
 class DSP_7265(_InstrumentBase):
+    # Compound queries (command, position in the response)
+    _snap_queries = {'X': ('XY.', 0), 'Y': ('XY.', 1),
+                     'Magnitude': ('MP.', 0), 'Phase': ('MP.', 1),
+                     'Freq': ('FRQ.', 0),
+                     'AUX_In_1': ('ADC. 1', 0), 'AUX_In_2': ('ADC. 2', 0),
+                     'AUX_In_3': ('ADC. 3', 0), 'AUX_In_4': ('ADC. 4', 0)}
+
     def __init__(self,
                  GPIB_Address=12, GPIB_Device=0,
                  ResourceName=None, logFile=None):
@@ -73,7 +80,7 @@ class DSP_7265(_InstrumentBase):
         # '28' = 50 ks
         # '29' = 100 ks
         # '30' = 200 ks
-        return self.query_float('TC.')
+        return self.cached('TC', lambda: self.query_float('TC.'))
 
     @TC.setter
     def TC(self, tc):
@@ -88,6 +95,7 @@ class DSP_7265(_InstrumentBase):
                 100E3, 200E3]
         tc_i = _np.abs(_np.array(bins) - tc).argmin()
         self.write('TC %d' % tc_i)
+        self.updateCache('TC', bins[tc_i])
 
     @property
     def SEN(self):
@@ -130,7 +138,7 @@ class DSP_7265(_InstrumentBase):
     @SEN.setter
     def SEN(self, vSen):
         vSen = _np.abs(vSen)
-        iMode = self.query('IMODE')
+        iMode = self.cached('IMODE', lambda: self.query('IMODE'))
         if iMode == '0':
             vSen *= 1.0E-6
         bins = [0, 2E-15, 5E-15, 10E-15, 20E-15,
@@ -159,9 +167,15 @@ class DSP_7265(_InstrumentBase):
         '''
         if sl in ['0', '1', '2', '3']:
             self.write('SLOPE %s' % sl)
+            self.updateCache('SLOPE', int(sl))
         else:
             self._log('ERR ', 'Wrong Slope Code')
 
+    def getFilterSlope(self):
+        '''Returns the output filter slope in dB/octave'''
+        sl_i = self.cached('SLOPE', lambda: self.query_int('SLOPE'))
+        return [6, 12, 18, 24][sl_i]
+
     def InputMode(self, imode):
         '''
         Current/Voltage mode Input Selector
@@ -174,6 +188,7 @@ class DSP_7265(_InstrumentBase):
         '''
         if imode in ['0', '1', '2']:
             self.write('IMODE %s' % imode)
+            self.updateCache('IMODE', imode)
         else:
             self._log('ERR ', 'Wrong Input Mode Code')
 
@@ -251,6 +266,34 @@ class DSP_7265(_InstrumentBase):
         '''Get the programed phase reference'''
         return self.query_float('REFP.')
 
+    def snapshot(self, *params):
+        '''
+        Reading of several parameters with the compound queries
+        X and Y (XY.) or Magnitude and Phase (MP.) are simultaneous
+
+        Usage :
+            X, Y, f = snapshot('X', 'Y', 'Freq')
+            X, Y, R, Phase, f = snapshot()
+
+        params : 'X', 'Y', 'Magnitude', 'Phase', 'Freq'
+                 and 'AUX_In_1' to 'AUX_In_4'
+        (default : X, Y, Magnitude, Phase and Freq)
+        '''
+        if not params:
+            params = ('X', 'Y', 'Magnitude', 'Phase', 'Freq')
+        if not set(params) <= set(self._snap_queries):
+            self._log('ERR ', 'Wrong snapshot parameters')
+            raise ValueError('%s : Wrong snapshot parameters %s' %
+                             (self._IDN, params))
+        responses = {}
+        values = []
+        for p in params:
+            command, i = self._snap_queries[p]
+            if command not in responses:
+                responses[command] = self.query(command).split(',')
+            values.append(float(responses[command][i]))
+        return _np.array(values)
+
     @property
     def X(self):
         return self.query_float('X.')
@@ -14,35 +14,284 @@ import datetime
 import os
 import numpy
 import time
+import queue
+import threading
+import atexit
+import contextlib
+import json
+import concurrent.futures as _futures
 
-__all__ = ['InstrumentBase']
+__all__ = ['InstrumentBase', 'setVisaBackend', 'flushLogs',
+           'getResourceManager', 'closeResourceManagers',
+           'clearResourceCache']
 
 Resources_in_use = []
+_visa_backend = None
+_resource_managers = {}
+_rm_lock = threading.Lock()
+
+# findResource answers (query_string -> resource name -> response)
+resource_cache_file = os.path.join(os.path.expanduser('~'),
+                                   '.magdynlab_resources.json')
+_resource_cache_lock = threading.Lock()
+
+
+def setVisaBackend(backend=None):
+    '''
+    Select the VISA backend used to open the instruments
+
+    Usage :
+        setVisaBackend()  # Default pyvisa ResourceManager
+        setVisaBackend(SimulatedResourceManager())  # Offline simulation
+
+    backend must be None or an object with the pyvisa ResourceManager
+    interface (list_resources and open_resource methods)
+    '''
+    global _visa_backend
+    _visa_backend = backend
+
+
+def getResourceManager(visa_library=None):
+    '''
+    Returns the process wide ResourceManager for visa_library
+
+    The ResourceManager is created on first use and shared by all the
+    instruments, so the VISA library is loaded and the bus scanned once.
+    If a backend was set with setVisaBackend, that backend is returned.
+    '''
+    if _visa_backend is not None:
+        return _visa_backend
+    if visa_library is None:
+        visa_library = '' if os.name == 'nt' else '@py'
+    with _rm_lock:
+        rm = _resource_managers.get(visa_library)
+        if rm is None:
+            rm = visa.ResourceManager(visa_library)
+            _resource_managers[visa_library] = rm
+    return rm
+
+
+def closeResourceManagers():
+    '''
+    Close the shared ResourceManagers and all their open sessions
+
+    Instruments created before this call can not be used anymore,
+    new instruments will create a new ResourceManager.
+    '''
+    with _rm_lock:
+        for rm in _resource_managers.values():
+            try:
+                rm.close()
+            except Exception:
+                pass
+        _resource_managers.clear()
+        del Resources_in_use[:]
+
+
+def _loadResourceCache():
+    try:
+        with open(resource_cache_file, 'r') as cache_file:
+            cache = json.load(cache_file)
+        if isinstance(cache, dict):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _saveResourceCache(cache):
+    try:
+        tmp_file = resource_cache_file + '.tmp'
+        with open(tmp_file, 'w') as cache_file:
+            json.dump(cache, cache_file, indent=1, sort_keys=True)
+        os.replace(tmp_file, resource_cache_file)
+    except OSError as E:
+        print('magdynlab resource cache: %s' % E.__repr__())
+
+
+def clearResourceCache():
+    '''
+    Forget all the resources found by findResource
+    '''
+    with _resource_cache_lock:
+        _saveResourceCache({})
+
+
+def _probeResource(rm, resource, query_string, open_delay, kwargs):
+    try:
+        VI = rm.open_resource(resource, **kwargs)
+    except Exception:
+        return None
+    try:
+        time.sleep(open_delay)
+        VI.clear()
+        return VI.query(query_string).strip()
+    except Exception:
+        return None
+    finally:
+        VI.close()
+
+
+def _updateResourceCache(query_string, results):
+    '''Stores the probe results, drops the resources without answer'''
+    with _resource_cache_lock:
+        cache = _loadResourceCache()
+        answers = cache.setdefault(query_string, {})
+        for resource, answer in results.items():
+            if answer is None:
+                answers.pop(resource, None)
+            else:
+                answers[resource] = answer
+        _saveResourceCache(cache)
+
 
 def findResource(search_string,
                  filter_string='',
                  query_string='*IDN?',
                  open_delay=2,
+                 use_cache=True,
+                 revalidate_timeout=500,
                  **kwargs):
-    if os.name == 'nt':
-        rm = visa.ResourceManager()
-    else:
-        rm = visa.ResourceManager('@py')
-    for resource in set(rm.list_resources()).difference(Resources_in_use):
-        if filter_string in resource:
-            VI = rm.open_resource(resource, **kwargs)
-            time.sleep(open_delay)
-            try:
-                VI.clear()
-                if search_string in VI.query(query_string):
-                    VI.close()
-                    return resource
-            except:
-                VI.close()
-                pass
+    '''
+    Returns the name of the first free resource whose response
+    to query_string contains search_string, None if not found
+
+    The answers of the resources are stored in resource_cache_file.
+    A cached resource that is still listed and free is probed alone,
+    without open_delay and with a short timeout (revalidate_timeout,
+    in ms), and used if its answer still matches (ports renumbered
+    after a replug or reboot). Otherwise all the candidates are probed
+    in parallel with open_delay (the cached one again only if it did
+    not answer).
+    '''
+    rm = getResourceManager()
+    candidates = sorted(resource
+                        for resource in set(rm.list_resources()).difference(
+                            Resources_in_use)
+                        if filter_string in resource)
+    with _resource_cache_lock:
+        cache = _loadResourceCache()
+    answers = cache.get(query_string, {})
+    results = {}
+    if use_cache:
+        for resource in candidates:
+            if search_string in answers.get(resource, ''):
+                # Quick revalidation of the cached answer
+                quick_kwargs = dict(kwargs, timeout=revalidate_timeout)
+                answer = _probeResource(rm, resource, query_string,
+                                        0, quick_kwargs)
+                if answer is not None:
+                    results[resource] = answer
+                    if search_string in answer:
+                        _updateResourceCache(query_string, results)
+                        return resource
+                break
+    if not candidates:
+        return None
+
+    to_probe = [resource for resource in candidates
+                if resource not in results]
+    if to_probe:
+        with _futures.ThreadPoolExecutor(len(to_probe)) as executor:
+            probes = {resource: executor.submit(_probeResource, rm,
+                                                resource, query_string,
+                                                open_delay, kwargs)
+                      for resource in to_probe}
+            for resource, probe in probes.items():
+                results[resource] = probe.result()
+
+    _updateResourceCache(query_string, results)
+
+    for resource in candidates:
+        answer = results[resource]
+        if answer is not None and search_string in answer:
+            return resource
     return None
 
 
+class _LogWriter(object):
+    '''
+    Background writer for the instruments log files
+
+    The log entries are queued by the instruments and written to disk
+    in batches by a daemon thread, outside of the acquisition loops.
+    '''
+
+    def __init__(self, max_entries=100000, flush_interval=0.5):
+        # put() blocks if max_entries are waiting (bounded memory)
+        self._queue = queue.Queue(max_entries)
+        self.flush_interval = flush_interval  # Max time (s) between writes
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run,
+                                                name='MagDynLab log writer',
+                                                daemon=True)
+                self._thread.start()
+
+    def put(self, logFile, entry):
+        if self._closed:
+            # After close (at exit) the entries are written directly
+            self._write([(logFile, entry)])
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._start()
+        self._queue.put((logFile, entry))
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(items)
+            for item in items:
+                self._queue.task_done()
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+
+    def _write(self, items):
+        lines = {}
+        for logFile, (timestamp, IDN, action, value) in items:
+            lines.setdefault(logFile, []).append(
+                '%s %s %s : %s \n' % (timestamp, IDN, action, repr(value)))
+        for logFile, fileLines in lines.items():
+            try:
+                with open(logFile, 'a') as log:
+                    log.writelines(fileLines)
+            except OSError as E:
+                print('magdynlab log writer: %s' % E.__repr__())
+
+    def flush(self):
+        '''Wait until all the queued entries are written'''
+        if self._thread is not None and self._thread.is_alive():
+            self._wake.set()
+            self._queue.join()
+
+    def close(self):
+        '''Flush the queued entries and stop using the background thread'''
+        self.flush()
+        self._closed = True
+
+
+_log_writer = _LogWriter()
+atexit.register(_log_writer.close)
+
+
+def flushLogs():
+    '''
+    Write to disk all the pending instrument log entries
+    '''
+    _log_writer.flush()
+
+
 class ValuesFormat(object):
     def __init__(self):
         # Info: 
@@ -70,13 +319,32 @@ class InstrumentBase(object):
     Base class for all instrument classes in magdynlab
     '''
 
+    # Command batching (see batch)
+    # Max characters per batch message, None for no limit,
+    # 0 if the instrument can not handle ';' separated commands
+    max_batch_length = 1024
+    batch_separator = ';'
+    # Prepended to the non common commands, ':' restores the SCPI root
+    batch_root_prefix = ':'
+
+    # waitOPC uses service requests if the resource supports them
+    use_srq = True
+
+    # Time (s) to live of the cached settings (see cached)
+    # None : valid until invalidated
+    state_ttl = None
+
     def __init__(self, ResourceName, logFile=None, **kargs):
-        if os.name == 'nt':
-            rm = visa.ResourceManager()
-        else:
-            rm = visa.ResourceManager('@py')
-        self.VI = rm.open_resource(ResourceName, **kargs)
+        self._batch_level = 0
+        self._batch_commands = []
+        self.last_wait_time = None
+        self._state = {}
+        # Serializes the bus transactions of different threads
+        self.lock = threading.RLock()
+        self.resource_manager = getResourceManager()
+        self.VI = self.resource_manager.open_resource(ResourceName, **kargs)
         Resources_in_use.append(ResourceName)
+        self._ResourceName = ResourceName
         self._IDN = self.VI.resource_name
         if logFile is None:
             self._logFile = None
@@ -91,37 +359,204 @@ class InstrumentBase(object):
     def __del__(self):
         self._logWrite('CLOSE')
         self.VI.close()
+        if self._ResourceName in Resources_in_use:
+            Resources_in_use.remove(self._ResourceName)
 
     def __str__(self):
         return "%s : %s" % ('magdynlab.instrument', self._IDN)
 
     def _logWrite(self, action, value=''):
         if self._logFile is not None:
-            with open(self._logFile, 'a') as log:
-                timestamp = datetime.datetime.utcnow()
-                log.write('%s %s %s : %s \n' %
-                          (timestamp, self._IDN, action, repr(value)))
+            timestamp = datetime.datetime.utcnow()
+            _log_writer.put(self._logFile,
+                            (timestamp, self._IDN, action, value))
     _log = _logWrite
 
     def write(self, command):
-        self._logWrite('write', command)
-        self.VI.write(command)
+        with self.lock:
+            self._logWrite('write', command)
+            if command.startswith('*RST'):
+                self.invalidateCache()
+            if self._batch_level > 0:
+                self._batch_commands.append(command)
+            else:
+                self.VI.write(command)
+
+    def cached(self, key, getter, ttl=None):
+        '''
+        Returns the cached value of an instrument setting
+
+        Usage :
+            mode = self.cached('ISRC', lambda: self.query('ISRC?'))
+
+        getter() is called only if the value is missing or older than
+        ttl (default : state_ttl).
+        For settings that only change through the driver setters, which
+        must call updateCache (or invalidateCache) after the write.
+        '''
+        if ttl is None:
+            ttl = self.state_ttl
+        with self.lock:
+            if key in self._state:
+                value, t = self._state[key]
+                if ttl is None or time.time() - t < ttl:
+                    return value
+            value = getter()
+            self._state[key] = (value, time.time())
+            return value
+
+    def updateCache(self, key, value):
+        '''Stores the value of a setting written to the instrument'''
+        with self.lock:
+            self._state[key] = (value, time.time())
+
+    def invalidateCache(self, *keys):
+        '''
+        Removes the given settings from the cache (all if no keys)
+        Use it after changing the instrument from the front panel
+        '''
+        with self.lock:
+            if not keys:
+                self._state.clear()
+            for key in keys:
+                self._state.pop(key, None)
+
+    @contextlib.contextmanager
+    def batch(self):
+        '''
+        Send the commands written inside the block as batch messages
+
+        Usage :
+            with instrument.batch():
+                instrument.write('SENS1:FREQ:STAR 1E9')
+                instrument.write('SENS1:FREQ:STOP 2E9')
+
+        The commands are joined with batch_separator in messages of up to
+        max_batch_length characters. The pending commands are sent at
+        the end of the block and before any read or query.
+        The instrument lock is held for the whole block, the commands of
+        other threads (or instrument children) are not mixed in the batch.
+        '''
+        with self.lock:
+            self._batch_level += 1
+            try:
+                yield self
+            finally:
+                self._batch_level -= 1
+                if self._batch_level == 0:
+                    self.flushBatch()
+
+    def flushBatch(self):
+        '''Send the pending batch commands'''
+        with self.lock:
+            if not self._batch_commands:
+                return
+            commands = self._batch_commands
+            self._batch_commands = []
+            if self.max_batch_length == 0:
+                for command in commands:
+                    self.VI.write(command)
+                return
+            message = ''
+            for command in commands:
+                if not command.startswith(('*', self.batch_root_prefix)):
+                    command = self.batch_root_prefix + command
+                if message == '':
+                    message = command
+                elif (self.max_batch_length is not None and
+                      len(message) + len(command) >= self.max_batch_length):
+                    self.VI.write(message)
+                    message = command
+                else:
+                    message += self.batch_separator + command
+            self.VI.write(message)
+
+    def waitEvent(self, test, timeout=None, poll_ini=0.001, poll_max=0.05):
+        '''
+        Wait until test() returns True
+
+        The polling interval starts at poll_ini and grows with the
+        elapsed time (5%) up to poll_max seconds.
+        The default intervals are for cheap tests (serial poll), use
+        longer ones (e.g. 0.05 to 0.5 s) if test() queries the instrument.
+        timeout in seconds, None to wait forever.
+        Returns the waited time, also stored in last_wait_time
+        '''
+        t0 = time.time()
+        while not test():
+            elapsed = time.time() - t0
+            if timeout is not None and elapsed > timeout:
+                self._logWrite('ERROR', 'Timeout waiting event')
+                raise TimeoutError('%s : Timeout waiting event' % self._IDN)
+            time.sleep(min(poll_max, max(poll_ini, 0.05*elapsed)))
+        self.last_wait_time = time.time() - t0
+        self._logWrite('wait ', '%0.4f s' % self.last_wait_time)
+        return self.last_wait_time
+
+    def waitOPC(self, timeout=None):
+        '''
+        Wait for the completion of the pending operations (*OPC)
+
+        Usage :
+            instrument.write('INIT:IMM')
+            instrument.waitOPC()
+
+        The Operation Complete event is signaled with a service request
+        if the resource supports it, otherwise the status byte is polled
+        (serial poll, no messages are exchanged).
+        timeout in seconds, None (default) to wait forever.
+        Returns the waited time, also stored in last_wait_time
+        '''
+        srq = self.use_srq and hasattr(self.VI, 'wait_for_srq')
+        with self.batch():
+            self.write('*ESE 1')  # OPC -> Event summary bit (ESB)
+            self.write('*SRE %d' % (32 if srq else 0))
+        self.query('*ESR?')  # Clear the Event Status Register
+        self.write('*OPC')
+        t0 = time.time()
+        try:
+            if srq:
+                try:
+                    if timeout is None:
+                        self.VI.wait_for_srq(None)
+                    else:
+                        self.VI.wait_for_srq(int(timeout*1000))
+                    self.last_wait_time = time.time() - t0
+                    self._logWrite('wait ',
+                                   '%0.4f s (SRQ)' % self.last_wait_time)
+                except Exception as E:
+                    self._logWrite('ERROR', E.__repr__())
+                    srq = False
+                finally:
+                    self.write('*SRE 0')
+            if not srq:
+                # After a SRQ timeout the status byte is still tested once
+                if timeout is not None:
+                    timeout = max(0, timeout - (time.time() - t0))
+                self.waitEvent(lambda: self.VI.stb & 0b100000, timeout)
+        finally:
+            self.query('*ESR?')
+        return self.last_wait_time
 
     def read(self):
-        self._logWrite('read ')
-        returnR = self.VI.read()
-        self._logWrite('resp ', returnR)
-        return returnR
+        with self.lock:
+            self.flushBatch()
+            self._logWrite('read ')
+            returnR = self.VI.read()
+            self._logWrite('resp ', returnR)
+            return returnR
 
     def query(self, command):
-        self._logWrite('query', command)
-        returnQ = self.VI.query(command)
-        returnQL = returnQ
-        if len(returnQ) > 100:
-            self._logWrite('resp ', returnQ[:100] + '...')
-        else:
-            self._logWrite('resp ', returnQ)
-        return returnQ
+        with self.lock:
+            self.flushBatch()
+            self._logWrite('query', command)
+            returnQ = self.VI.query(command)
+            returnQL = returnQ
+            if len(returnQ) > 100:
+                self._logWrite('resp ', returnQ[:100] + '...')
+            else:
+                self._logWrite('resp ', returnQ)
+            return returnQ
 
     def query_type(self, command, type_caster):
         try:
@@ -139,27 +574,85 @@ class InstrumentBase(object):
         return self.query_type(command, float)
 
     def query_values(self, command):
-        # NOTE: self.values_format should be set to the adequate format
-        if self.values_format.is_binary:
+        with self.lock:
+            # NOTE: self.values_format should be set to the adequate format
+            self.flushBatch()
+            if self.values_format.is_binary:
+                read_term = self.VI.read_termination
+                self.VI.read_termination = None
+                self._logWrite('query_binary_values', command)
+                options = {'datatype': self.values_format.datatype,
+                           'is_big_endian': self.values_format.is_big_endian,
+                           'header_fmt': self.values_format.header_fmt,
+                           'delay': self.values_format.delay,
+                           'container': self.values_format.container}
+                data = self.VI.query_binary_values(command, **options)
+                self.VI.read_termination = read_term
+            else:
+                self._logWrite('query_ascii_values', command)
+                options = {'converter': self.values_format.converter,
+                           'separator': self.values_format.separator,
+                           'delay': self.values_format.delay,
+                           'container': self.values_format.container}
+                data = self.VI.query_ascii_values(command, **options)
+            self._logWrite('len return data:', str(len(data)))
+            return data
+
+    def query_values_into(self, command, out):
+        '''
+        Query values and decode them directly into the array out
+
+        Usage :
+            S = numpy.empty(n_points, dtype=complex)
+            instrument.query_values_into('CALC1:DATA? SDAT', S)
+
+        out must be contiguous, complex arrays are filled with the
+        interleaved real and imaginary values.
+        The binary block is decoded without intermediate arrays.
+        Returns out
+        '''
+        with self.lock:
+            if out.dtype.kind == 'c':
+                out_r = out.view(out.real.dtype)
+            else:
+                out_r = out
+            if not self.values_format.is_binary:
+                out_r[...] = self.query_values(command)
+                return out
+            self.flushBatch()
             read_term = self.VI.read_termination
             self.VI.read_termination = None
-            self._logWrite('query_binary_values', command)
-            options = {'datatype': self.values_format.datatype,
-                       'is_big_endian': self.values_format.is_big_endian,
-                       'header_fmt': self.values_format.header_fmt,
-                       'delay': self.values_format.delay,
-                       'container': self.values_format.container}
-            data = self.VI.query_binary_values(command, **options)
-            self.VI.read_termination = read_term
-        else:
-            self._logWrite('query_ascii_values', command)
-            options = {'converter': self.values_format.converter,
-                       'separator': self.values_format.separator,
-                       'delay': self.values_format.delay,
-                       'container': self.values_format.container}
-            data = self.VI.query_ascii_values(command, **options)
-        self._logWrite('len return data:', str(len(data)))
-        return data
+            self._logWrite('query_binary_values_into', command)
+            try:
+                self.VI.write(command)
+                if self.values_format.delay:
+                    time.sleep(self.values_format.delay)
+                raw = self.VI.read_raw()
+            finally:
+                self.VI.read_termination = read_term
+            # IEEE 488.2 block header : #<n><length> or #0
+            start = raw.index(b'#')
+            n_digits = int(raw[start+1:start+2])
+            if n_digits == 0:
+                offset = start + 2
+                length = len(raw) - offset
+            else:
+                offset = start + 2 + n_digits
+                length = int(raw[start+2:offset])
+            dtype = numpy.dtype(self.values_format.datatype)
+            dtype = dtype.newbyteorder('>' if self.values_format.is_big_endian
+                                       else '<')
+            count = length // dtype.itemsize
+            if count != out_r.size:
+                self._logWrite('ERROR', 'Expected %d values, received %d' %
+                               (out_r.size, count))
+                raise ValueError('%s : Expected %d values, received %d' %
+                                 (self._IDN, out_r.size, count))
+            data = numpy.frombuffer(raw, dtype=dtype,
+                                    count=count, offset=offset)
+            out_r[...] = data.reshape(out_r.shape)
+            self._logWrite('len return data:', str(count))
+            return out
 
 
 class InstrumentChild(object):
@@ -169,14 +662,23 @@ class InstrumentChild(object):
 
     def __init__(self, parent):
         self.parent = parent
+        self.resource_manager = parent.resource_manager
         self._logWrite = parent._logWrite
         self._log = parent._log
         self.write = parent.write
+        self.batch = parent.batch
         self.query = parent.query
         self.query_type = parent.query_type
         self.query_int = parent.query_int
         self.query_float = parent.query_float
         self.query_values = parent.query_values
+        self.query_values_into = parent.query_values_into
+        self.cached = parent.cached
+        self.updateCache = parent.updateCache
+        self.invalidateCache = parent.invalidateCache
+        self.lock = parent.lock
+        self.waitEvent = parent.waitEvent
+        self.waitOPC = parent.waitOPC
         self._IDN = parent._IDN + ' %s' % self.__class__.__name__
 
     def __del__(self):
@@ -184,11 +686,19 @@ class InstrumentChild(object):
         del self._logWrite
         del self._log
         del self.write
+        del self.batch
         del self.query
         del self.query_type
         del self.query_int
         del self.query_float
         del self.query_values
+        del self.query_values_into
+        del self.cached
+        del self.updateCache
+        del self.invalidateCache
+        del self.lock
+        del self.waitEvent
+        del self.waitOPC
 
     def __str__(self):
         return "%s : %s" % ('magdynlab.instrument', self._IDN)
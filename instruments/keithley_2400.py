@@ -86,7 +86,7 @@ class KEITHLEY_2400(_InstrumentBase):
 
     @property
     def source_function(self):
-        val = self.query('SOUR:FUNC?')
+        val = self._source_function_str()
         return {'VOLT': 'Voltage', 'CURR': 'Current'}[val]
 
     @source_function.setter
@@ -96,10 +96,14 @@ class KEITHLEY_2400(_InstrumentBase):
                       'Current': 'CURR',
                       'I':       'CURR'}.get(val, 'VOLT')
         self.write('SOUR:FUNC %s' % source_str)
+        self.updateCache('SOUR:FUNC', source_str)
+
+    def _source_function_str(self):
+        return self.cached('SOUR:FUNC', lambda: self.query('SOUR:FUNC?'))
 
     @property
     def source_value(self):
-        funct_str = self.query('SOUR:FUNC?')
+        funct_str = self._source_function_str()
         return self.query_float('SOUR:%s:LEV:IMM:AMPL?' % funct_str)
 
     @source_value.setter
@@ -13,12 +13,17 @@
 # TODO:
 # Make documentation
 
+import numpy as _np
 from .instruments_base import InstrumentBase as _InstrumentBase
 
 __all__ = ['KEPCO_BOP']
 
 
 class KEPCO_BOP(_InstrumentBase):
+    max_batch_length = 250  # Input buffer of 253 characters
+    list_max_points = 1002  # LIST memory
+    list_min_dwell = 0.0005  # s
+
     def __init__(self,
                  GPIB_Address=6, GPIB_Device=0,
                  ResourceName=None, logFile=None):
@@ -123,6 +128,48 @@ class KEPCO_BOP(_InstrumentBase):
     def current(self, cOut):
         self.CurrentOut(cOut)
 
+    def SetCurrentList(self, currents, dwell, count=1):
+        '''
+        Loads a current sequence in the LIST memory
+
+        Usage :
+            SetCurrentList(currents, dwell)
+            RunList()
+
+        currents : Current values (up to list_max_points)
+        dwell : Time (s) of each point
+        count : Repetitions of the sequence (0 for infinite)
+        '''
+        currents = _np.atleast_1d(currents)
+        if len(currents) > self.list_max_points:
+            self._log('ERR ', 'List too long')
+            raise ValueError('KEPCO BOP : Max %d list points' %
+                             self.list_max_points)
+        dwell = max(dwell, self.list_min_dwell)
+        with self.batch():
+            self.write('LIST:CLE')
+            for i in range(0, len(currents), 16):
+                self.write('LIST:CURR ' +
+                           ','.join('%0.4f' % c for c in currents[i:i+16]))
+            self.write('LIST:DWEL %0.4f' % dwell)
+            self.write('LIST:COUN %d' % count)
+
+    def RunList(self):
+        '''Starts the execution of the LIST sequence (Current mode)'''
+        self.write('CURR:MODE LIST')
+
+    def StopList(self, cOut):
+        '''
+        Returns to fixed current operation (after RunList)
+
+        Usage :
+            StopList(current)
+        cOut : Fixed output current, usually the last point of the list
+        '''
+        with self.batch():
+            self.write('CURR %0.4f' % cOut)
+            self.write('CURR:MODE FIX')
+
     def BEEP(self):
         '''BEEP'''
         self.write('SYST:BEEP')
@@ -46,12 +46,9 @@ class KEYSIGHT_B1500A(_InstrumentBase):
         while 'No error' not in self.query('SYST:ERR?'):
             time.sleep(0.1)
         self.write('RUN')
-        done = False
-        while not(done):
-            if self.query('*OPC?') == '1':
-                done = True
-            else:
-                time.sleep(0.1)
+        # Query test, poll slowly to keep the bus free
+        self.waitEvent(lambda: self.query('*OPC?') == '1',
+                       poll_ini=0.05, poll_max=0.5)
 
     def _getResult(self, delete=False):
         rawData = self.query('RES:FETCH?')
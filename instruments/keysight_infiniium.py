@@ -12,7 +12,6 @@
 # Make documentation
 
 import numpy as _np
-import time
 from .instruments_base import InstrumentBase as _InstrumentBase
 
 __all__ = ['KEYSIGHT_Infiniium']
@@ -41,8 +40,9 @@ class KEYSIGHT_Infiniium(_InstrumentBase):
         self.write('STOP')
         if new == True:
             self.write('SING')
-        while self.query('RSTATE?') != 'STOP':
-            time.sleep(0.1)
+        # Query test, poll slowly to keep the bus free
+        self.waitEvent(lambda: self.query('RSTATE?') == 'STOP',
+                       poll_ini=0.05, poll_max=0.5)
         self.write('WAV:SOUR %s' % source)
         x_ori = self.query_float('WAV:XOR?')
         x_inc = self.query_float('WAV:XINC?')
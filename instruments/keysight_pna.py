@@ -11,6 +11,7 @@
 # Clean code
 # Make documentation
 
+import re as _re
 import numpy as _np
 import time as _time
 from .instruments_base import InstrumentBase as _InstrumentBase
@@ -20,6 +21,8 @@ __all__ = ['KEYSIGHT_PNA']
 
 
 class KEYSIGHT_PNA(_InstrumentBase):
+    max_batch_length = None  # Segment tables are sent in one message
+
     def __init__(self,
                  GPIB_Address=16, GPIB_Device=0,
                  ResourceName=None, logFile=None):
@@ -65,6 +68,8 @@ class Channel(_InstrumentChild):
     def __init__(self, parent, ChanNum=1, ID='Auto'):
         super().__init__(parent)
         self._number = ChanNum
+        self._traces = None
+        self._snp_format = None
         if ID == 'Auto':
             self.ID = 'Ch%d' % self.number
         else:
@@ -77,13 +82,26 @@ class Channel(_InstrumentChild):
 
     @property
     def traces(self):
-        TrcNames = self.query('CALC:PAR:CAT:EXT?').strip('\"').split(',')[0::2]
-        vTraces = []
-        for trN in TrcNames:
-            tr = Trace(self, trN)
-            if tr.channel_number == self.number:
-                vTraces.append(tr)
-        return vTraces
+        '''
+        Traces of the channel
+        The traces are cached until resetTraces is called
+        '''
+        if self._traces is None:
+            TrcCat = self.query('CALC:PAR:CAT:EXT?').strip('\"').split(',')
+            vTraces = []
+            for trN, par in zip(TrcCat[0::2], TrcCat[1::2]):
+                tr = Trace(self, trN, par)
+                if tr.channel_number == self.number:
+                    vTraces.append(tr)
+            self._traces = vTraces
+        return list(self._traces)
+
+    def resetTraces(self):
+        '''
+        Forget the cached traces,
+        must be called after changing the traces configuration
+        '''
+        self._traces = None
 
     @property
     def bandwidth(self):
@@ -95,46 +113,89 @@ class Channel(_InstrumentChild):
                    {'Ch': self.Number, 'BW': newBW})
 
     def SetSweep(self, start, stop, np, na=None):
-        self.write('SENS%(Ch)d:SWE:TYPE LIN' %
-                   {'Ch':self.number})
-
-        self.write('SENS%(Ch)d:SWE:POIN %(n)d' %
-                   {'Ch':self.number, 'n':np})
-        self.write('SENS%(Ch)d:FREQ:STAR %(f)0.9E' %
-                   {'Ch':self.number, 'f':start})
-        self.write('SENS%(Ch)d:FREQ:STOP %(f)0.9E' %
-                   {'Ch':self.number, 'f':stop})
-
-        if na is not None:
-            self.write('SENS%(Ch)d:AVER:COUN %(n)d' %
-               {'Ch':self.number, 'n':na})
-            if na > 1:
-                self.write('SENS%(Ch)d:AVER:STAT ON' % {'Ch':self.number})
-            else:
-                self.write('SENS%(Ch)d:AVER:STAT OFF' % {'Ch':self.number})
+        with self.batch():
+            self.write('SENS%(Ch)d:SWE:TYPE LIN' %
+                       {'Ch':self.number})
+
+            self.write('SENS%(Ch)d:SWE:POIN %(n)d' %
+                       {'Ch':self.number, 'n':np})
+            self.write('SENS%(Ch)d:FREQ:STAR %(f)0.9E' %
+                       {'Ch':self.number, 'f':start})
+            self.write('SENS%(Ch)d:FREQ:STOP %(f)0.9E' %
+                       {'Ch':self.number, 'f':stop})
+
+            if na is not None:
+                self.write('SENS%(Ch)d:AVER:COUN %(n)d' %
+                   {'Ch':self.number, 'n':na})
+                if na > 1:
+                    self.write('SENS%(Ch)d:AVER:STAT ON' % {'Ch':self.number})
+                else:
+                    self.write('SENS%(Ch)d:AVER:STAT OFF' % {'Ch':self.number})
 
     def SetFrequencies(self, fs):
-        self.write('SENS%(Ch)d:SEGM1:CLE' %
-                   {'Ch': self.number})
-
-        fs = _np.atleast_1d(fs).copy()
-        fs.sort()
-        if len(fs)%2 != 0:
-            fs = _np.r_[fs, [fs[-1]]]
-        for sgn in range(len(fs)//2):
-            self.write('SENS%(Ch)d:SEGM%(sg)d:ADD' %
-                       {'Ch': self.number, 'sg': sgn+1})
-            self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:START %(f)0.9E' %
-                       {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn]})
-            self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:STOP %(f)0.9E' %
-                       {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn+1]})
-            npts = 2
-            if fs[2*sgn+1] == fs[2*sgn]:
-                npts = 1
-            self.write('SENS%(Ch)d:SEGM%(sg)d:SWE:POIN %(npts)d' %
-                       {'Ch':self.number, 'sg':sgn+1, 'npts':npts})
-        self.write('SENS%(Ch)d:SWE:TYPE SEGM' %
-                   {'Ch':self.number})
+        with self.batch():
+            self.write('SENS%(Ch)d:SEGM1:CLE' %
+                       {'Ch': self.number})
+
+            fs = _np.atleast_1d(fs).copy()
+            fs.sort()
+            if len(fs)%2 != 0:
+                fs = _np.r_[fs, [fs[-1]]]
+            for sgn in range(len(fs)//2):
+                self.write('SENS%(Ch)d:SEGM%(sg)d:ADD' %
+                           {'Ch': self.number, 'sg': sgn+1})
+                self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:START %(f)0.9E' %
+                           {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn]})
+                self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:STOP %(f)0.9E' %
+                           {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn+1]})
+                npts = 2
+                if fs[2*sgn+1] == fs[2*sgn]:
+                    npts = 1
+                self.write('SENS%(Ch)d:SEGM%(sg)d:SWE:POIN %(npts)d' %
+                           {'Ch':self.number, 'sg':sgn+1, 'npts':npts})
+            self.write('SENS%(Ch)d:SWE:TYPE SEGM' %
+                       {'Ch':self.number})
+
+    def getAllSDAT(self, New=False, out=None):
+        '''
+        Returns unformatted data of all the traces of the channel
+        in a single transfer, as a (traces, points) complex array.
+        If out is given the data is written into it.
+        '''
+        traces = self.traces
+        if New:
+            traces[0].getNewData()
+        pars = [_re.fullmatch(r'S(\d)_?(\d)', tr.parameter.upper())
+                for tr in traces]
+        if None in pars:
+            # Not only S-parameters, one transfer per trace
+            SDAT = _np.array([tr.getSDAT(False) for tr in traces])
+            if out is None:
+                return SDAT
+            out[:] = SDAT
+            return out
+        pars = [(int(m.group(1)), int(m.group(2))) for m in pars]
+        ports = sorted(set(p for par in pars for p in par))
+        # SnP columns order
+        if len(ports) == 2:
+            snp_pars = [(i, j) for j in ports for i in ports]
+        else:
+            snp_pars = [(i, j) for i in ports for j in ports]
+        if self._snp_format != 'RI':
+            self.write('MMEM:STOR:TRAC:FORM:SNP RI')
+            self._snp_format = 'RI'
+        SNP = self.query_values('CALC%(Ch)d:DATA:SNP:PORTS? \'%(P)s\'' %
+                                {'Ch': self.number,
+                                 'P': ','.join('%d' % p for p in ports)})
+        # Frequency, then real and imaginary part of each parameter
+        SNP = SNP.reshape(1 + 2*len(snp_pars), -1)
+        if out is None:
+            out = _np.empty((len(traces), SNP.shape[1]), dtype=complex)
+        for i, par in enumerate(pars):
+            j = 1 + 2*snp_pars.index(par)
+            out[i].real = SNP[j]
+            out[i].imag = SNP[j+1]
+        return out
 
     def getSTIM(self):
         return self.query_values('CALC:MEAS:X?')
@@ -152,10 +213,12 @@ class Channel(_InstrumentChild):
 
 
 class Trace(_InstrumentChild):
-    def __init__(self, parent, Name='Auto'):
+    def __init__(self, parent, Name='Auto', Parameter=''):
         super().__init__(parent)
         self.name = Name
+        self.parameter = Parameter
         self._ChNumber = 1
+        self._MeasN = None
         # self.query_int('CONF:TRAC:CHAN:NAME:ID? \'%s\'' % Name)
 
     @property
@@ -163,6 +226,17 @@ class Trace(_InstrumentChild):
         '''Channel Number'''
         return self._ChNumber
 
+    @property
+    def measurement_number(self):
+        '''Measurement Number (cached)'''
+        if self._MeasN is None:
+            ChN = self.channel_number
+            self.write('CALC%(Ch)d:PAR:SEL \'%(N)s\'' %
+                       {'Ch': ChN, 'N': self.name})
+            self._MeasN = self.query_int('CALC%(Ch)d:PAR:MNUM?' %
+                                         {'Ch': ChN})
+        return self._MeasN
+
     def getNewData(self):
         ChN = self.channel_number
         self.write('INIT:CONT OFF')
@@ -182,37 +256,40 @@ class Trace(_InstrumentChild):
         accordingly to the selected trace format
         '''
         ChN = self.channel_number
-        self.write('CALC%(Ch)d:PAR:SEL \'%(N)s\'' %
-                   {'Ch': ChN, 'N': self.name})
-        MeasN = self.query_int('CALC%(Ch)d:PAR:MNUM?' %
-                               {'Ch': ChN})
+        MeasN = self.measurement_number
         if New:
             self.getNewData()
         return self.query_values('CALC%(Ch)d:MEAS%(MeasN)d:DATA:FDAT?' 
                                  % {'Ch': ChN, 'MeasN': MeasN})
 
-    def getSDAT(self, New=False):
+    def getSDAT(self, New=False, out=None):
         '''
         Returns unformatted trace data :
         Real and imaginary part of each measurement point
         For wave quantities the unit is Volts
+        If out (complex array) is given the data is written into it
         '''
         ChN = self.channel_number
-        self.write('CALC%(Ch)d:PAR:SEL \'%(N)s\'' %
-                   {'Ch': ChN, 'N': self.name})
-        MeasN = self.query_int('CALC%(Ch)d:PAR:MNUM?' %
-                               {'Ch': ChN})
+        MeasN = self.measurement_number
         if New:
             self.getNewData()
+        command = ('CALC%(Ch)d:MEAS%(MeasN)d:DATA:SDATA?'
+                   % {'Ch': ChN, 'MeasN': MeasN})
+        if out is not None:
+            try:
+                _time.sleep(0.05)
+                return self.query_values_into(command, out)
+            except:
+                self.query('*OPC?')
+                _time.sleep(0.05)
+                return self.query_values_into(command, out)
         try:
             _time.sleep(0.05)
-            SDAT = self.query_values('CALC%(Ch)d:MEAS%(MeasN)d:DATA:SDATA?' 
-                                     % {'Ch': ChN, 'MeasN': MeasN})
+            SDAT = self.query_values(command)
         except:
             self.query('*OPC?')
             _time.sleep(0.05)
-            SDAT = self.query_values('CALC%(Ch)d:MEAS%(MeasN)d:DATA:SDATA?' 
-                                     % {'Ch': ChN, 'MeasN': MeasN})
+            SDAT = self.query_values(command)
         return SDAT[::2] + 1.0j*SDAT[1::2]
 
     def SaveSData(self, fileName, New=False):
@@ -11,7 +11,6 @@
 # Clean code
 # Make documentation
 
-import time as _time
 import numpy as _np
 from .instruments_base import InstrumentBase as _InstrumentBase
 from .instruments_base import InstrumentChild as _InstrumentChild
@@ -88,9 +87,7 @@ class Trace(_InstrumentChild):
     def getNewData(self):
         self.write('INIT:CONT OFF')
         self.parent.INIT()
-        #TODO Fix this
-        while (self.parent.stb & 0b10000): # message available bit
-            _time.sleep(0.01)
+        self.waitOPC()
 
     def getFDAT(self, new=True):
         '''
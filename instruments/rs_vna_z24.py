@@ -11,7 +11,6 @@
 # Clean code
 # Make documentation
 
-import time as _time
 import numpy as _np
 from .instruments_base import InstrumentBase as _InstrumentBase
 from .instruments_base import InstrumentChild as _InstrumentChild
@@ -20,6 +19,8 @@ __all__ = ['RS_VNA_Z']
 
 
 class RS_VNA_Z(_InstrumentBase):
+    max_batch_length = None  # Segment tables are sent in one message
+
     def __init__(self,
                  GPIB_Address=20, GPIB_Device=0,
                  ResourceName=None, logFile=None):
@@ -48,6 +49,8 @@ class Channel(_InstrumentChild):
     def __init__(self, parent, ChanNum=1, ID='Auto'):
         super().__init__(parent)
         self._number = ChanNum
+        self._traces = None
+        self._call_catalog = None
         if ID == 'Auto':
             self.ID = 'Ch%d' % self.number
         else:
@@ -60,13 +63,28 @@ class Channel(_InstrumentChild):
 
     @property
     def traces(self):
-        TrcNames = self.query('CONF:TRAC:CAT?').strip('\'').split(',')[1::2]
-        vTraces = []
-        for trN in TrcNames:
-            tr = Trace(self, trN)
-            if tr.channel_number == self.number:
-                vTraces.append(tr)
-        return vTraces
+        '''
+        Traces of the channel
+        The traces are cached until resetTraces is called
+        '''
+        if self._traces is None:
+            TrcNames = self.query('CONF:TRAC:CAT?')
+            TrcNames = TrcNames.strip('\'').split(',')[1::2]
+            vTraces = []
+            for trN in TrcNames:
+                tr = Trace(self, trN)
+                if tr.channel_number == self.number:
+                    vTraces.append(tr)
+            self._traces = vTraces
+        return list(self._traces)
+
+    def resetTraces(self):
+        '''
+        Forget the cached traces,
+        must be called after changing the traces configuration
+        '''
+        self._traces = None
+        self._call_catalog = None
 
     @property
     def bandwidth(self):
@@ -78,47 +96,78 @@ class Channel(_InstrumentChild):
                    {'Ch':self.Number, 'BW':newBW})
 
     def SetSweep(self, start, stop, np, na=None):
-        self.write('SENS%(Ch)d:SWE:TYPE LIN' %
-                   {'Ch':self.number})
-
-        self.write('SENS%(Ch)d:SWE:POIN %(n)d' %
-                   {'Ch':self.number, 'n':np})
-        self.write('SENS%(Ch)d:FREQ:STAR %(f)0.9E' %
-                   {'Ch':self.number, 'f':start})
-        self.write('SENS%(Ch)d:FREQ:STOP %(f)0.9E' %
-                   {'Ch':self.number, 'f':stop})
-
-        if na is not None:
-            self.write('SENS%(Ch)d:AVER:COUN %(n)d' %
-               {'Ch':self.number, 'n':na})
-            if na > 1:
-                self.write('SENS%(Ch)d:AVER:STAT ON' % {'Ch':self.number})
-            else:
-                self.write('SENS%(Ch)d:AVER:STAT OFF' % {'Ch':self.number})
+        with self.batch():
+            self.write('SENS%(Ch)d:SWE:TYPE LIN' %
+                       {'Ch':self.number})
+
+            self.write('SENS%(Ch)d:SWE:POIN %(n)d' %
+                       {'Ch':self.number, 'n':np})
+            self.write('SENS%(Ch)d:FREQ:STAR %(f)0.9E' %
+                       {'Ch':self.number, 'f':start})
+            self.write('SENS%(Ch)d:FREQ:STOP %(f)0.9E' %
+                       {'Ch':self.number, 'f':stop})
+
+            if na is not None:
+                self.write('SENS%(Ch)d:AVER:COUN %(n)d' %
+                   {'Ch':self.number, 'n':na})
+                if na > 1:
+                    self.write('SENS%(Ch)d:AVER:STAT ON' % {'Ch':self.number})
+                else:
+                    self.write('SENS%(Ch)d:AVER:STAT OFF' % {'Ch':self.number})
 
     def SetFrequencies(self, fs):
-        self.write('SENS%(Ch)d:SEGM1:CLE' %
-                   {'Ch': self.number})
-
-        fs = _np.atleast_1d(fs).copy()
-        fs.sort()
-        if len(fs)%2 != 0:
-            fs = _np.r_[fs, [fs[-1]]]
-        for sgn in range(len(fs)//2):
-            self.write('SENS%(Ch)d:SEGM%(sg)d:ADD' %
-                       {'Ch': self.number, 'sg': sgn+1})
-            self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:START %(f)0.9E' %
-                       {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn]})
-            self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:STOP %(f)0.9E' %
-                       {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn+1]})
-            npts = 2
-            if fs[2*sgn+1] == fs[2*sgn]:
-                npts = 1
-            self.write('SENS%(Ch)d:SEGM%(sg)d:SWE:POIN %(npts)d' %
-                       {'Ch':self.number, 'sg':sgn+1, 'npts':npts})
-        self.write('SENS%(Ch)d:SWE:TYPE SEGM' %
-                   {'Ch':self.number})
-
+        with self.batch():
+            self.write('SENS%(Ch)d:SEGM1:CLE' %
+                       {'Ch': self.number})
+
+            fs = _np.atleast_1d(fs).copy()
+            fs.sort()
+            if len(fs)%2 != 0:
+                fs = _np.r_[fs, [fs[-1]]]
+            for sgn in range(len(fs)//2):
+                self.write('SENS%(Ch)d:SEGM%(sg)d:ADD' %
+                           {'Ch': self.number, 'sg': sgn+1})
+                self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:START %(f)0.9E' %
+                           {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn]})
+                self.write('SENS%(Ch)d:SEGM%(sg)d:FREQ:STOP %(f)0.9E' %
+                           {'Ch': self.number, 'sg': sgn+1, 'f':fs[2*sgn+1]})
+                npts = 2
+                if fs[2*sgn+1] == fs[2*sgn]:
+                    npts = 1
+                self.write('SENS%(Ch)d:SEGM%(sg)d:SWE:POIN %(npts)d' %
+                           {'Ch':self.number, 'sg':sgn+1, 'npts':npts})
+            self.write('SENS%(Ch)d:SWE:TYPE SEGM' %
+                       {'Ch':self.number})
+
+    def getAllSDAT(self, New=False, out=None):
+        '''
+        Returns unformatted data of all the traces of the channel
+        in a single transfer, as a (traces, points) complex array.
+        If out is given the data is written into it.
+        '''
+        traces = self.traces
+        if New:
+            traces[0].getNewData()
+        if self._call_catalog is None:
+            cat = self.query('CALC%(Ch)d:DATA:CALL:CAT?' % {'Ch': self.number})
+            self._call_catalog = cat.strip('\'').upper().split(',')
+        if not all(tr.parameter in self._call_catalog for tr in traces):
+            # Not only S-parameters, one transfer per trace
+            SDAT = _np.array([tr.getSDAT(False) for tr in traces])
+            if out is None:
+                return SDAT
+            out[:] = SDAT
+            return out
+        SDAT = self.query_values('CALC%(Ch)d:DATA:CALL? SDAT' %
+                                 {'Ch': self.number})
+        SDAT = SDAT.reshape(len(self._call_catalog), -1)
+        if out is None:
+            out = _np.empty((len(traces), SDAT.shape[1]//2), dtype=complex)
+        for i, tr in enumerate(traces):
+            j = self._call_catalog.index(tr.parameter)
+            out[i].real = SDAT[j, ::2]
+            out[i].imag = SDAT[j, 1::2]
+        return out
 
     def getSTIM(self):
         return self.query_values('CALC%(Ch)d:DATA:STIM?' % {'Ch': self.number})
@@ -136,12 +185,22 @@ class Trace(_InstrumentChild):
         self.name = Name
         self._ChNumber = self.query_int('CONF:TRAC:CHAN:NAME:ID? \'%s\''
                                         % Name)
+        self._parameter = None
 
     @property
     def channel_number(self):
         '''Channel Number'''
         return self._ChNumber
 
+    @property
+    def parameter(self):
+        '''Measured parameter (S11, S21, ...)'''
+        if self._parameter is None:
+            par = self.query('CALC%(Ch)d:PAR:MEAS? \'%(N)s\'' %
+                             {'Ch': self.channel_number, 'N': self.name})
+            self._parameter = par.strip('\'').upper()
+        return self._parameter
+
     def getNewData(self):
         ChN = self.channel_number
         self.write('INIT:CONT OFF')
@@ -153,8 +212,7 @@ class Trace(_InstrumentChild):
             averCount = 1
         for i in range(averCount):
             self.parent.INIT()
-            while self.query('CALC%(Ch)d:DATA:NSW:COUN?' % {'Ch': ChN}) == '0':
-                _time.sleep(0.01)
+            self.waitOPC()
 
     def getFDAT(self, New=False):
         '''
@@ -168,17 +226,21 @@ class Trace(_InstrumentChild):
             self.getNewData()
         return self.query_values('CALC%(Ch)d:DATA? FDAT' % {'Ch': ChN})
 
-    def getSDAT(self, New=False):
+    def getSDAT(self, New=False, out=None):
         '''
         Returns unformatted trace data :
         Real and imaginary part of each measurement point
         For wave quantities the unit is Volts
+        If out (complex array) is given the data is written into it
         '''
         ChN = self.channel_number
         self.write('CALC%(Ch)d:PAR:SEL \'%(N)s\'' %
                    {'Ch': ChN, 'N': self.name})
         if New:
             self.getNewData()
+        if out is not None:
+            return self.query_values_into('CALC%(Ch)d:DATA? SDAT' %
+                                          {'Ch': ChN}, out)
         SDAT = self.query_values('CALC%(Ch)d:DATA? SDAT' % {'Ch': ChN})
         return SDAT[::2] + 1.0j*SDAT[1::2]
 
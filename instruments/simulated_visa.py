@@ -0,0 +1,1056 @@
+# coding=utf-8
+
+# Author: Diego González Chávez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# magdynlab
+# Simulated VISA backend
+#
+# Offline replacement of the pyvisa ResourceManager with simple
+# behavioral models of some instruments.
+# Used to run, test and benchmark the drivers without the lab hardware.
+#
+# Usage:
+#   import magdynlab.instruments as inst
+#   sim = inst.SimulatedResourceManager(latency=0.005)
+#   sim.addInstrument('GPIB0::6::INSTR', 'KEPCO_BOP')
+#   sim.addInstrument('TCPIP::192.168.13.2::INSTR', 'RS_VNA_Z')
+#   inst.setVisaBackend(sim)
+#   PowerSource = inst.KEPCO_BOP(GPIB_Address=6)
+#
+# TODO:
+# Make documentation
+
+import re as _re
+import time as _time
+import threading as _threading
+import numpy as _np
+
+__all__ = ['SimulatedResourceManager', 'SimulatedLab']
+
+
+def _ieee_block(data, datatype, is_big_endian):
+    '''Encode data as an IEEE 488.2 definite length binary block'''
+    dtype = _np.dtype(datatype).newbyteorder('>' if is_big_endian else '<')
+    payload = _np.asarray(data).astype(dtype).tobytes()
+    length = '%d' % len(payload)
+    header = '#%d%s' % (len(length), length)
+    return header.encode('ascii') + payload + b'\n'
+
+
+def _ieee_payload(raw):
+    '''Returns the data bytes of an IEEE 488.2 binary block'''
+    start = raw.index(b'#')
+    n_digits = int(raw[start+1:start+2])
+    if n_digits == 0:
+        return raw[start+2:].rstrip(b'\n')
+    length = int(raw[start+2:start+2+n_digits])
+    offset = start + 2 + n_digits
+    return raw[offset:offset+length]
+
+
+class SimulatedLab(object):
+    '''
+    Shared physical state of the simulated instruments
+
+    The power source models set the coil current,
+    the measurement models use the resulting field.
+    '''
+
+    def __init__(self):
+        self.current = 0.0  # Coil current (A)
+        self.HperA = 16.952  # Coil calibration (Oe/A)
+        self.noise = 1E-4  # Relative noise of the measurements
+
+        # FMR sample (Kittel formula, in plane)
+        self.gamma = 2.8E6  # Hz/Oe
+        self.Meff = 10000.0  # 4 pi Meff (Oe)
+        self.fmr_linewidth = 0.1E9  # Hz
+        self.fmr_amplitude = 0.05
+
+        # VSM / MI sample
+        self.Ms = 1.0E-3  # Saturation signal (V)
+        self.Hk = 50.0  # Anisotropy field (Oe)
+        self.signal_phase = 30.0  # deg
+
+    @property
+    def field(self):
+        return self.current * self.HperA
+
+    def fmr_frequency(self):
+        H = _np.abs(self.field)
+        return self.gamma * _np.sqrt(H * (H + self.Meff))
+
+    def fmr_absorption(self, fs):
+        f0 = self.fmr_frequency()
+        df = self.fmr_linewidth
+        return self.fmr_amplitude * df**2 / ((fs - f0)**2 + df**2)
+
+    def magnetization(self):
+        return self.Ms * _np.tanh(self.field / self.Hk)
+
+    def add_noise(self, value, scale=1.0):
+        value = _np.asarray(value)
+        noise = _np.random.normal(0, self.noise * scale, value.shape)
+        if _np.iscomplexobj(value):
+            noise = noise + 1.0j*_np.random.normal(0, self.noise * scale,
+                                                   value.shape)
+        return value + noise
+
+
+class SimulatedModel(object):
+    '''
+    Base class for the behavioral models of the simulated instruments
+
+    Subclasses define `commands`, a list of (regex, method name) pairs.
+    The methods receive the regex match and return None (no response),
+    a string, or a numpy array (sent as an IEEE 488.2 binary block).
+    '''
+
+    idn = 'MagDynLab,Simulated Instrument,0,0'
+    commands = []
+    _common_commands = [(r'\*IDN\?', '_idn'),
+                        (r'\*(CLS|RST|WAI)', '_none'),
+                        (r'\*OPC\?', '_opc'),
+                        (r'\*OPC', '_set_opc'),
+                        (r'\*(ESE|SRE) (\d+)', '_set_enable'),
+                        (r'\*ESR\?', '_esr')]
+
+    def __init__(self, lab=None, latency=0.0, bandwidth=None):
+        self.lab = SimulatedLab() if lab is None else lab
+        self.latency = latency  # Time (s) per bus transaction
+        self.bandwidth = bandwidth  # Bytes per second (None = Infinite)
+        self.datatype = 'd'
+        self.is_big_endian = False
+        self.lock = _threading.RLock()
+        self.unknown_commands = []
+        self.enable = {'ESE': 0, 'SRE': 0}
+        self.esr_register = 0
+        self._opc_pending = False
+        self.stats = {}
+        self.resetStats()
+        self._rules = []
+        for pattern, method in self.commands + self._common_commands:
+            self._rules.append((_re.compile(pattern, _re.IGNORECASE),
+                                getattr(self, method)))
+
+    def resetStats(self):
+        self.stats = {'writes': 0, 'reads': 0,
+                      'bytes_in': 0, 'bytes_out': 0}
+
+    def handle(self, command):
+        '''Process one command and return the response (or None)'''
+        command = command.strip().lstrip(':')  # Root prefix of batches
+        for rule, funct in self._rules:
+            match = rule.fullmatch(command)
+            if match is not None:
+                return funct(match)
+        self.unknown_commands.append(command)
+        return None
+
+    def encode(self, response):
+        if isinstance(response, bytes):
+            return response
+        if isinstance(response, _np.ndarray):
+            return _ieee_block(response, self.datatype, self.is_big_endian)
+        return ('%s\n' % response).encode('ascii')
+
+    def _none(self, match):
+        return None
+
+    def _idn(self, match):
+        return self.idn
+
+    def _opc(self, match):
+        return '1'
+
+    def busy(self):
+        '''True while an overlapped operation is running'''
+        return False
+
+    def _set_opc(self, match):
+        self._opc_pending = True
+
+    def _set_enable(self, match):
+        self.enable[match.group(1).upper()] = int(match.group(2))
+
+    def event_status(self):
+        if self._opc_pending and not self.busy():
+            self._opc_pending = False
+            self.esr_register |= 1  # Operation complete
+        return self.esr_register
+
+    def _esr(self, match):
+        esr = self.event_status()
+        self.esr_register = 0
+        return '%d' % esr
+
+    def status_byte(self):
+        stb = 0
+        if self.event_status() & self.enable['ESE']:
+            stb |= 32  # bit 5 (ESB) : Event summary
+        if stb & self.enable['SRE']:
+            stb |= 64  # bit 6 (RQS) : Service request
+        return stb
+
+
+class SimulatedResource(object):
+    '''
+    Simulated pyvisa resource connected to a SimulatedModel
+    '''
+
+    LF = '\n'
+    CR = '\r'
+
+    def __init__(self, resource_name, model, **kwargs):
+        self.resource_name = resource_name
+        self.model = model
+        self.timeout = 2000
+        self.chunk_size = 20 * 1024
+        self.read_termination = None
+        self.write_termination = None
+        self._output = []
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+    def _transfer(self, n_bytes):
+        t = self.model.latency
+        if self.model.bandwidth is not None:
+            t += n_bytes / self.model.bandwidth
+        if t > 0:
+            _time.sleep(t)
+
+    def write(self, message):
+        with self.model.lock:
+            self.model.stats['writes'] += 1
+            self.model.stats['bytes_in'] += len(message)
+            self._transfer(len(message))
+            responses = []
+            for command in message.split(';'):
+                if command.strip() == '':
+                    continue
+                response = self.model.handle(command)
+                if response is not None:
+                    responses.append(response)
+            if len(responses) == 1:
+                self._output.append(self.model.encode(responses[0]))
+            elif len(responses) > 1:
+                joined = ';'.join('%s' % r for r in responses)
+                self._output.append(self.model.encode(joined))
+        return len(message)
+
+    def read_raw(self, size=None):
+        with self.model.lock:
+            if not self._output:
+                raise IOError('%s : Simulated read timeout' %
+                              self.resource_name)
+            data = self._output.pop(0)
+            self.model.stats['reads'] += 1
+            self.model.stats['bytes_out'] += len(data)
+            self._transfer(len(data))
+        return data
+
+    def read(self):
+        return self.read_raw().decode('ascii').rstrip('\r\n')
+
+    def read_bytes(self, count):
+        data = self.read_raw()
+        if len(data) != count:
+            raise IOError('%s : Expected %d bytes, received %d' %
+                          (self.resource_name, count, len(data)))
+        return data
+
+    def query(self, message, delay=None):
+        self.write(message)
+        if delay:
+            _time.sleep(delay)
+        return self.read()
+
+    def query_binary_values(self, message, datatype='f',
+                            is_big_endian=False, container=list,
+                            delay=None, header_fmt='ieee', **kwargs):
+        self.write(message)
+        if delay:
+            _time.sleep(delay)
+        payload = _ieee_payload(self.read_raw())
+        dtype = _np.dtype(datatype)
+        dtype = dtype.newbyteorder('>' if is_big_endian else '<')
+        data = _np.frombuffer(payload, dtype=dtype).astype(dtype.newbyteorder('='))
+        return container(data)
+
+    def query_ascii_values(self, message, converter='f', separator=',',
+                           container=list, delay=None, **kwargs):
+        response = self.query(message, delay)
+        data = [float(v) for v in response.split(separator) if v.strip()]
+        return container(data)
+
+    def clear(self):
+        self._output = []
+
+    def close(self):
+        pass
+
+    @property
+    def stb(self):
+        with self.model.lock:
+            stb = self.model.status_byte()
+            if self._output:
+                stb |= 16  # bit 4 (MAV) : Message available
+        return stb
+
+    def wait_for_srq(self, timeout=25000):
+        t0 = _time.time()
+        while not self.stb & 64:
+            if timeout is not None and _time.time() - t0 > timeout/1000:
+                raise IOError('%s : Simulated SRQ timeout' %
+                              self.resource_name)
+            _time.sleep(0.001)
+
+
+class SimulatedResourceManager(object):
+    '''
+    Simulated replacement of the pyvisa ResourceManager
+
+    Usage :
+        sim = SimulatedResourceManager(latency=0.005)
+        sim.addInstrument('GPIB0::6::INSTR', 'KEPCO_BOP')
+        setVisaBackend(sim)
+    '''
+
+    def __init__(self, latency=0.0, bandwidth=None, lab=None):
+        self.lab = SimulatedLab() if lab is None else lab
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.models = {}
+
+    def addInstrument(self, resource_name, model,
+                      latency=None, bandwidth=None):
+        '''
+        Register a simulated instrument at the resource_name address
+
+        model can be a model name (see SimulatedModels)
+        or a SimulatedModel instance
+        '''
+        if latency is None:
+            latency = self.latency
+        if bandwidth is None:
+            bandwidth = self.bandwidth
+        if isinstance(model, str):
+            model = SimulatedModels[model](self.lab, latency, bandwidth)
+        self.models[resource_name] = model
+        return model
+
+    def list_resources(self, query='?*::INSTR'):
+        return tuple(self.models.keys())
+
+    def open_resource(self, resource_name, **kwargs):
+        if resource_name not in self.models:
+            raise ValueError('%s : No simulated instrument at this address'
+                             % resource_name)
+        return SimulatedResource(resource_name,
+                                 self.models[resource_name],
+                                 **kwargs)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        '''Returns the bus statistics of each simulated instrument'''
+        return {name: dict(model.stats)
+                for name, model in self.models.items()}
+
+    def resetStats(self):
+        for model in self.models.values():
+            model.resetStats()
+
+
+class SimKEPCO_BOP(SimulatedModel):
+    idn = 'KEPCO,BOP 20-20M,SIMULATED,0'
+    commands = [(r'OUTPUT (ON|OFF)', '_output'),
+                (r'FUNC:MODE (CURR|VOLT)', '_set_mode'),
+                (r'FUNC:MODE\?', '_get_mode'),
+                (r'(VOLT|CURR) ([-+0-9.eE]+)', '_set_level'),
+                (r'(VOLT|CURR)\?', '_get_level'),
+                (r'MEAS:(VOLT|CURR)\?', '_measure'),
+                (r'(VOLT|CURR):RANG:\w+', '_none'),
+                (r'SYST:BEEP', '_none'),
+                (r'LIST:CLE', '_list_clear'),
+                (r'LIST:CURR ([-+0-9.eE,]+)', '_list_curr'),
+                (r'LIST:DWEL ([-+0-9.eE]+)', '_list_dwell'),
+                (r'LIST:COUN (\d+)', '_list_count'),
+                (r'CURR:MODE (LIST|FIX)', '_curr_mode')]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.output = True
+        self.mode = 'VOLT'
+        self.levels = {'VOLT': 0.0, 'CURR': 0.0}
+        self.list_values = []
+        self.list_dwell = 0.01
+        self.list_count = 1
+        self._list_start = None
+
+    def handle(self, command):
+        self.update_list()
+        return super().handle(command)
+
+    def _list_clear(self, match):
+        self.list_values = []
+
+    def _list_curr(self, match):
+        self.list_values += [float(v) for v in match.group(1).split(',')]
+
+    def _list_dwell(self, match):
+        self.list_dwell = float(match.group(1))
+
+    def _list_count(self, match):
+        self.list_count = int(match.group(1))
+
+    def _curr_mode(self, match):
+        if match.group(1).upper() == 'LIST' and self.list_values:
+            self._list_start = _time.time()
+        else:
+            self._list_start = None
+            if self.mode == 'CURR':
+                self.lab.current = self.levels['CURR']
+
+    def update_list(self):
+        '''Output current while the LIST sequence runs'''
+        if self._list_start is None or self.mode != 'CURR':
+            return
+        n = int((_time.time() - self._list_start) / self.list_dwell)
+        total = len(self.list_values) * self.list_count
+        if self.list_count != 0 and n >= total:
+            n = total - 1
+        self.lab.current = self.list_values[n % len(self.list_values)]
+
+    def busy(self):
+        if self._list_start is None or self.list_count == 0:
+            return False
+        self.update_list()
+        t_list = len(self.list_values) * self.list_count * self.list_dwell
+        return _time.time() - self._list_start < t_list
+
+    def _output(self, match):
+        self.output = match.group(1).upper() == 'ON'
+
+    def _set_mode(self, match):
+        self.mode = match.group(1).upper()
+
+    def _get_mode(self, match):
+        return '%d' % (self.mode == 'CURR')
+
+    def _set_level(self, match):
+        self.levels[match.group(1).upper()] = float(match.group(2))
+        if self.mode == 'CURR' and self._list_start is None:
+            self.lab.current = self.levels['CURR']
+
+    def _get_level(self, match):
+        return '%0.4E' % self.levels[match.group(1).upper()]
+
+    def _measure(self, match):
+        value = self.levels[match.group(1).upper()]
+        if match.group(1).upper() == 'CURR' and self._list_start is not None:
+            # Actual output of the running LIST sequence
+            value = self.lab.current
+        return '%0.4E' % self.lab.add_noise(value, 10)
+
+
+class _SimVNA(SimulatedModel):
+    '''Common sweep and data generation of the VNA models'''
+
+    point_time = 20E-6  # Measurement time per point (s)
+    _sweep_commands = [
+        (r'SENS(\d*):BWID ([-+0-9.eE]+)', '_set_bw'),
+        (r'SENS(\d*):BWID\?', '_get_bw'),
+        (r'SENS(\d*):SWE:TYPE (\w+)', '_set_sweep_type'),
+        (r'SENS(\d*):SWE:POIN (\d+)', '_set_points'),
+        (r'SENS(\d*):SWE:POIN\?', '_get_points'),
+        (r'SENS(\d*):FREQ:(STAR|STOP) ([-+0-9.eE]+)', '_set_freq'),
+        (r'SENS(\d*):FREQ:(STAR|STOP)\?', '_get_freq'),
+        (r'SENS(\d*):AVER:COUN (\d+)', '_set_aver_count'),
+        (r'SENS(\d*):AVER:COUN\?', '_get_aver_count'),
+        (r'SENS(\d*):AVER:STAT (ON|OFF)', '_set_aver_stat'),
+        (r'SENS(\d*):AVER:STAT\?', '_get_aver_stat'),
+        (r'SENS(\d*):AVER:CLE', '_none'),
+        (r'SENS(\d*):SEGM\d*:CLE', '_segm_clear'),
+        (r'SENS(\d*):SEGM(\d+):ADD', '_segm_add'),
+        (r'SENS(\d*):SEGM(\d+):FREQ:(START|STOP) ([-+0-9.eE]+)',
+         '_segm_freq'),
+        (r'SENS(\d*):SEGM(\d+):SWE:POIN (\d+)', '_segm_points'),
+        (r'INIT(\d*):CONT (ON|OFF)', '_none'),
+        (r'INIT(\d*)(:IMM)?', '_init'),
+        (r'CALC(\d*):PAR:DEF(:EXT)? \'(\w+)\', ?\'?(\w+)\'?', '_par_def'),
+        (r'CALC(\d*):PAR:DEL:ALL', '_par_del_all'),
+        (r'CALC(\d*):PAR:SEL \'(\w+)\'', '_par_sel'),
+        (r'CALC(\d*):FORM \w+', '_none'),
+        (r'FORM:DATA REAL, ?(32|64)', '_format'),
+        (r'SYST:DISP:UPDATE (ON|OFF)', '_none'),
+        (r'DISP:CAT\?', '_disp_cat'),
+        (r'DISP:WIND\d+:TRAC\d+:Y:RPOS\?', '_rpos'),
+        (r'DISP:.*', '_none')]
+
+    def __init__(self, *args, **kwargs):
+        self.commands = self.commands + self._sweep_commands
+        super().__init__(*args, **kwargs)
+        self.sweep_type = 'LIN'
+        self.points = 201
+        self.freq = {'STAR': 1.0E9, 'STOP': 10.0E9}
+        self.segments = []
+        self.bandwidth_if = 1.0E3
+        self.aver_count = 1
+        self.aver_stat = False
+        self.traces = [('Trc1', 'S11')]
+        self.selected = 'Trc1'
+        self.sweep_count = 0
+        self._sweep_end = 0.0
+        self._data = {}
+
+    # Sweep configuration
+    def _set_bw(self, match):
+        self.bandwidth_if = float(match.group(2))
+
+    def _get_bw(self, match):
+        return '%0.9E' % self.bandwidth_if
+
+    def _set_sweep_type(self, match):
+        self.sweep_type = match.group(2).upper()
+
+    def _set_points(self, match):
+        self.points = int(match.group(2))
+
+    def _get_points(self, match):
+        return '%d' % self.points
+
+    def _set_freq(self, match):
+        self.freq[match.group(2).upper()] = float(match.group(3))
+
+    def _get_freq(self, match):
+        return '%0.9E' % self.freq[match.group(2).upper()]
+
+    def _set_aver_count(self, match):
+        self.aver_count = int(match.group(2))
+
+    def _get_aver_count(self, match):
+        return '%d' % self.aver_count
+
+    def _set_aver_stat(self, match):
+        self.aver_stat = match.group(2).upper() == 'ON'
+
+    def _get_aver_stat(self, match):
+        return '%d' % self.aver_stat
+
+    def _segm_clear(self, match):
+        self.segments = []
+
+    def _segm_add(self, match):
+        self.segments.append([0.0, 0.0, 2])
+
+    def _segm_freq(self, match):
+        i = 1 if match.group(3).upper() == 'STOP' else 0
+        self.segments[int(match.group(2)) - 1][i] = float(match.group(4))
+
+    def _segm_points(self, match):
+        self.segments[int(match.group(2)) - 1][2] = int(match.group(3))
+
+    def _format(self, match):
+        self.datatype = {'32': 'f', '64': 'd'}[match.group(1)]
+
+    def frequencies(self):
+        if self.sweep_type.startswith('SEGM') and self.segments:
+            return _np.concatenate([_np.linspace(f1, f2, n)
+                                    for f1, f2, n in self.segments])
+        return _np.linspace(self.freq['STAR'], self.freq['STOP'],
+                            self.points)
+
+    # Traces
+    def _par_def(self, match):
+        self.traces.append((match.group(3), match.group(4).upper()))
+        self.selected = match.group(3)
+
+    def _par_del_all(self, match):
+        self.traces = []
+
+    def _par_sel(self, match):
+        self.selected = match.group(2)
+
+    def _disp_cat(self, match):
+        return '\'1,1\''
+
+    def _rpos(self, match):
+        return '50'
+
+    def trace_names(self):
+        return [name for name, param in self.traces]
+
+    def trace_parameter(self, name):
+        return dict(self.traces).get(name, 'S11')
+
+    # Measurements
+    def _init(self, match):
+        fs = self.frequencies()
+        n_aver = self.aver_count if self.aver_stat else 1
+        now = _time.time()
+        self._sweep_end = max(now, self._sweep_end)
+        self._sweep_end += len(fs) * self.point_time * n_aver
+        self.sweep_count += 1
+        self._data = {}
+        for name, param in self.traces:
+            self._data[name] = self.sparameter(param, fs)
+
+    def sweep_done(self):
+        return _time.time() >= self._sweep_end
+
+    def busy(self):
+        return not self.sweep_done()
+
+    def wait_sweep(self):
+        dt = self._sweep_end - _time.time()
+        if dt > 0:
+            _time.sleep(dt)
+
+    def sparameter(self, param, fs):
+        absorption = self.lab.fmr_absorption(fs)
+        if param in ['S11', 'S22']:
+            S = 0.5 * (1 - absorption) * _np.exp(-2.0j*_np.pi*fs*1E-10)
+        elif param in ['S21', 'S12']:
+            S = 0.8 * (1 - absorption) * _np.exp(-2.0j*_np.pi*fs*2E-10)
+        else:
+            S = 0.01 * _np.exp(-2.0j*_np.pi*fs*1E-10) + 0*fs
+        return self.lab.add_noise(S)
+
+    def parameter_data(self, param):
+        '''Complex data of the first trace measuring param'''
+        for name, trace_param in self.traces:
+            if trace_param == param:
+                self.trace_data(name)
+                return self._data[name]
+        return self.sparameter(param, self.frequencies())
+
+    def trace_data(self, name, fmt='SDAT'):
+        if name not in self._data:
+            fs = self.frequencies()
+            self._data[name] = self.sparameter(self.trace_parameter(name),
+                                               fs)
+        S = self._data[name]
+        if fmt.upper().startswith('FDAT'):
+            return _np.abs(S)
+        data = _np.empty(2*len(S))
+        data[::2] = S.real
+        data[1::2] = S.imag
+        return data
+
+
+class SimRS_VNA_Z(_SimVNA):
+    idn = 'Rohde-Schwarz,ZVA24-4Port,SIMULATED,0'
+    commands = [
+        (r'SYST:COMM:GPIB:RTER \w+', '_none'),
+        (r'CONF:CHAN(\d+):STAT (ON|OFF)', '_none'),
+        (r'CONF:TRAC:CAT\?', '_trace_cat'),
+        (r'CONF:TRAC:CHAN:NAME:ID\? \'(\w+)\'', '_trace_channel'),
+        (r'SYST:ERR:ALL\?', '_no_error'),
+        (r'CALC(\d*):DATA:NSW:COUN\?', '_sweep_count'),
+        (r'CALC(\d*):DATA:STIM\?', '_stim'),
+        (r'CALC(\d*):DATA\? (SDAT|FDAT)', '_data'),
+        (r'CALC(\d*):PAR:MEAS\? \'(\w+)\'', '_par_meas'),
+        (r'CALC(\d*):DATA:CALL:CAT\?', '_call_cat'),
+        (r'CALC(\d*):DATA:CALL\? SDAT', '_call_data')]
+
+    def _trace_cat(self, match):
+        items = ['%d,%s' % (i+1, name)
+                 for i, name in enumerate(self.trace_names())]
+        return '\'%s\'' % ','.join(items)
+
+    def _trace_channel(self, match):
+        return '1'
+
+    def _no_error(self, match):
+        return '0,"No error"'
+
+    def _sweep_count(self, match):
+        return '%d' % self.sweep_count if self.sweep_done() else '0'
+
+    def _stim(self, match):
+        return self.frequencies()
+
+    def _data(self, match):
+        return self.trace_data(self.selected, match.group(2))
+
+    def _par_meas(self, match):
+        return '\'%s\'' % self.trace_parameter(match.group(2))
+
+    def call_parameters(self):
+        ports = sorted(set(p for name, param in self.traces
+                           if param.startswith('S') for p in param[1:]))
+        return ['S%s%s' % (i, j) for i in ports for j in ports]
+
+    def _call_cat(self, match):
+        return '\'%s\'' % ','.join(self.call_parameters())
+
+    def _call_data(self, match):
+        data = []
+        for param in self.call_parameters():
+            S = self.parameter_data(param)
+            SDAT = _np.empty(2*len(S))
+            SDAT[::2] = S.real
+            SDAT[1::2] = S.imag
+            data.append(SDAT)
+        return _np.concatenate(data)
+
+
+class SimKEYSIGHT_PNA(_SimVNA):
+    idn = 'Keysight Technologies,N5222B,SIMULATED,0'
+    commands = [
+        (r'CALC:PAR:CAT:EXT\?', '_trace_cat'),
+        (r'CALC(\d*):PAR:MNUM\?', '_mnum'),
+        (r'CALC(\d*):MEAS(\d+):DATA:(SDATA|FDAT)\?', '_data'),
+        (r'CALC:MEAS:X\?', '_stim'),
+        (r'MMEM:STOR:TRAC:FORM:SNP (RI|MA|DB)', '_none'),
+        (r'CALC(\d*):DATA:SNP:PORTS\? [\'"]([\d,]+)[\'"]', '_snp'),
+        (r'SYST:ERR\?', '_no_error'),
+        (r'CONT:AUX:OUTP(\d):VOLT ([-+0-9.eE]+)', '_set_aux'),
+        (r'CONT:AUX:OUTP(\d):VOLT\?', '_get_aux')]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_big_endian = True
+        self.aux = {'1': 0.0, '2': 0.0}
+
+    def _trace_cat(self, match):
+        items = ['%s,%s' % trace for trace in self.traces]
+        return '"%s"' % ','.join(items)
+
+    def _mnum(self, match):
+        return '%d' % (self.trace_names().index(self.selected) + 1)
+
+    def _data(self, match):
+        name = self.trace_names()[int(match.group(2)) - 1]
+        return self.trace_data(name, match.group(3))
+
+    def _stim(self, match):
+        return self.frequencies()
+
+    def _snp(self, match):
+        self.wait_sweep()
+        ports = match.group(2).split(',')
+        if len(ports) == 2:
+            params = ['S%s%s' % (i, j) for j in ports for i in ports]
+        else:
+            params = ['S%s%s' % (i, j) for i in ports for j in ports]
+        data = [self.frequencies()]
+        for param in params:
+            S = self.parameter_data(param)
+            data += [S.real, S.imag]
+        return _np.concatenate(data)
+
+    def _no_error(self, match):
+        return '+0,"No error"'
+
+    def _opc(self, match):
+        self.wait_sweep()
+        return '1'
+
+    def _set_aux(self, match):
+        self.aux[match.group(1)] = float(match.group(2))
+
+    def _get_aux(self, match):
+        return '%0.3f' % self.aux[match.group(1)]
+
+
+class SimKEYSIGHT_E4990A(SimulatedModel):
+    idn = 'Keysight Technologies,E4990A,SIMULATED,0'
+    point_time = 100E-6  # Measurement time per point (s)
+    commands = [
+        (r'FORM(AT)?:DATA \w+', '_none'),
+        (r'FORM(AT)?:BORD(ER)? NORM', '_none'),
+        (r'INIT(\d*):CONT (ON|OFF)', '_none'),
+        (r'SENS(\d*):FREQ:(STAR|STOP) ([-+0-9.eE]+)', '_set_freq'),
+        (r'SENS(\d*):SWE:POIN (\d+)', '_set_points'),
+        (r'SENS(\d*):FREQ:DATA\?', '_stim'),
+        (r'SENS(\d*):AVER:STAT\?', '_get_aver_stat'),
+        (r'SENS(\d*):AVER:COUN\?', '_get_aver_count'),
+        (r'CALC(\d*):AVER:CLE', '_none'),
+        (r'SOUR(\d*):((BIAS:)?MODE) (\w+)', '_set_source'),
+        (r'SOUR(\d*):((BIAS:)?MODE)\?', '_get_source'),
+        (r'SOUR(\d*):((BIAS:)?VOLT) ([-+0-9.eE]+)', '_set_source'),
+        (r'SOUR(\d*):((BIAS:)?VOLT)\?', '_get_source'),
+        (r'CALC(\d*):PAR:COUN\?', '_par_count'),
+        (r'CALC(\d*):PAR(\d*):SEL', '_none'),
+        (r'TRIG:SOUR \w+', '_none'),
+        (r'TRIG(:IMM)?', '_trigger'),
+        (r'STAT:OPER:COND\?', '_oper_cond'),
+        (r'SYST:ERR\?', '_no_error'),
+        (r'CALC(\d*):DATA:(RDAT|FDAT)\?', '_data')]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_big_endian = True
+        self.freq = {'STAR': 1.0E3, 'STOP': 1.0E6}
+        self.points = 201
+        self.source = {'MODE': 'VOLT', 'BIAS:MODE': 'VOLT',
+                       'VOLT': 0.5, 'BIAS:VOLT': 0.0}
+        self._sweep_end = 0.0
+
+    def _set_freq(self, match):
+        self.freq[match.group(2).upper()] = float(match.group(3))
+
+    def _set_points(self, match):
+        self.points = int(match.group(2))
+
+    def frequencies(self):
+        return _np.linspace(self.freq['STAR'], self.freq['STOP'],
+                            self.points)
+
+    def _stim(self, match):
+        return self.frequencies()
+
+    def _get_aver_stat(self, match):
+        return '0'
+
+    def _get_aver_count(self, match):
+        return '1'
+
+    def _set_source(self, match):
+        value = match.group(4)
+        if 'VOLT' in match.group(2).upper():
+            value = float(value)
+        self.source[match.group(2).upper()] = value
+
+    def _get_source(self, match):
+        return '%s' % self.source[match.group(2).upper()]
+
+    def _par_count(self, match):
+        return '1'
+
+    def _trigger(self, match):
+        now = _time.time()
+        self._sweep_end = now + self.points * self.point_time
+
+    def _oper_cond(self, match):
+        # bit 4 : Measuring
+        return '16' if _time.time() < self._sweep_end else '0'
+
+    def _no_error(self, match):
+        return '+0,"No error"'
+
+    def _data(self, match):
+        fs = self.frequencies()
+        mu = 1 + 1 / (1 + (self.lab.field / self.lab.Hk)**2)
+        Z = 1.0 + 2.0j*_np.pi*fs*1E-6*mu
+        Z = Z + self.lab.Ms*self.source['BIAS:VOLT']
+        Z = self.lab.add_noise(Z)
+        data = _np.empty(2*len(Z))
+        data[::2] = Z.real
+        data[1::2] = Z.imag
+        return data
+
+
+class _SimLockIn(SimulatedModel):
+    '''Common signal generation of the lock-in models'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ref_phase = 0.0
+        self.osc_freq = 1000.0
+        self.osc_amp = 0.1
+
+    def signal(self):
+        '''Returns X, Y, R, Theta'''
+        R = self.lab.magnetization() * self.osc_amp / 0.1
+        theta = self.lab.signal_phase - self.ref_phase
+        X = R * _np.cos(_np.deg2rad(theta))
+        Y = R * _np.sin(_np.deg2rad(theta))
+        X, Y = self.lab.add_noise([X, Y], self.lab.Ms)
+        R = _np.hypot(X, Y)
+        theta = _np.rad2deg(_np.arctan2(Y, X))
+        return X, Y, R, theta
+
+
+class SimSRS_SR830(_SimLockIn):
+    idn = 'Stanford_Research_Systems,SR830,SIMULATED,0'
+    commands = [
+        (r'(OUTX|OVRM|OFLT|SENS|ISRC|OFSL|SYNC) (\d+)', '_set_code'),
+        (r'(OUTX|OVRM|OFLT|SENS|ISRC|OFSL|SYNC)\?', '_get_code'),
+        (r'FREQ ([-+0-9.eE]+)', '_set_freq'),
+        (r'FREQ\?', '_get_freq'),
+        (r'SLVL ([-+0-9.eE]+)', '_set_amp'),
+        (r'SLVL\?', '_get_amp'),
+        (r'PHAS ([-+0-9.eE]+)', '_set_phase'),
+        (r'PHAS\?', '_get_phase'),
+        (r'OUTP\? ?(\d)', '_output'),
+        (r'OAUX\? ?(\d)', '_aux'),
+        (r'DDEF 1, ?(\d)(, ?\d)?', '_display'),
+        (r'DDEF\? ?1', '_get_display'),
+        (r'(SRAT|SEND) (\d+)', '_set_code'),
+        (r'REST', '_buffer_reset'),
+        (r'STRT', '_buffer_start'),
+        (r'PAUS', '_buffer_pause'),
+        (r'SPTS\?', '_buffer_points'),
+        (r'TRCB\? ?1, ?(\d+), ?(\d+)', '_buffer_read'),
+        (r'SNAP\? ?([\d, ]+)', '_snap')]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes = {'OUTX': 1, 'OVRM': 1, 'OFLT': 8, 'SENS': 22,
+                      'ISRC': 0, 'OFSL': 1, 'SYNC': 0,
+                      'SRAT': 10, 'SEND': 0}
+        self.display = 0  # Channel 1 : X (0) or R (1)
+        self.buffer = []
+        self._buffer_t0 = None
+
+    def _display(self, match):
+        self.display = int(match.group(1))
+
+    def _get_display(self, match):
+        return '%d,0' % self.display
+
+    def _buffer_update(self):
+        '''Stores the samples taken since the last update'''
+        if self._buffer_t0 is None:
+            return
+        rate = 62.5E-3 * 2**self.codes['SRAT']
+        n = int((_time.time() - self._buffer_t0) * rate)
+        while len(self.buffer) < min(n, 16383):
+            self.buffer.append(self.signal()[[0, 2][self.display]])
+
+    def _buffer_reset(self, match):
+        self.buffer = []
+        self._buffer_t0 = None
+
+    def _buffer_start(self, match):
+        if self._buffer_t0 is None:
+            rate = 62.5E-3 * 2**self.codes['SRAT']
+            self._buffer_t0 = _time.time() - len(self.buffer) / rate
+
+    def _buffer_pause(self, match):
+        self._buffer_update()
+        self._buffer_t0 = None
+
+    def _buffer_points(self, match):
+        self._buffer_update()
+        return '%d' % len(self.buffer)
+
+    def _buffer_read(self, match):
+        self._buffer_update()
+        start, n = int(match.group(1)), int(match.group(2))
+        data = _np.array(self.buffer[start:start + n], dtype='<f4')
+        return data.tobytes()
+
+    def _set_code(self, match):
+        self.codes[match.group(1).upper()] = int(match.group(2))
+
+    def _get_code(self, match):
+        return '%d' % self.codes[match.group(1).upper()]
+
+    def _set_freq(self, match):
+        self.osc_freq = float(match.group(1))
+
+    def _get_freq(self, match):
+        return '%0.6f' % self.osc_freq
+
+    def _set_amp(self, match):
+        self.osc_amp = float(match.group(1))
+
+    def _get_amp(self, match):
+        return '%0.6f' % self.osc_amp
+
+    def _set_phase(self, match):
+        self.ref_phase = float(match.group(1))
+
+    def _get_phase(self, match):
+        return '%0.6f' % self.ref_phase
+
+    def _output(self, match):
+        return '%0.6E' % self.signal()[int(match.group(1)) - 1]
+
+    def _aux(self, match):
+        return '%0.4f' % self.lab.add_noise(0.0)
+
+    def _snap(self, match):
+        X, Y, R, theta = self.signal()
+        values = {1: X, 2: Y, 3: R, 4: theta, 9: self.osc_freq}
+        codes = [int(c) for c in match.group(1).split(',')]
+        return ','.join('%0.6E' % values.get(c, self.lab.add_noise(0.0))
+                        for c in codes)
+
+
+class SimDSP_7265(_SimLockIn):
+    idn = 'DSP 7265 SIMULATED'
+    _tc_bins = [10E-6, 20E-6, 40E-6, 80E-6,
+                160E-6, 320E-6, 640E-6,
+                5E-3, 10E-3, 20E-3, 50E-3,
+                100E-3, 200E-3, 500E-3,
+                1, 2, 5, 10, 20, 50,
+                100, 200, 500,
+                1E3, 2E3, 5E3, 10E3, 20E3, 50E3,
+                100E3, 200E3]
+    _sen_bins = [0, 2E-9, 5E-9, 10E-9, 20E-9,
+                 50E-9, 100E-9, 200E-9, 500E-9,
+                 1E-6, 2E-6, 5E-6, 10E-6, 20E-6,
+                 50E-6, 100E-6, 200E-6, 500E-6,
+                 1E-3, 2E-3, 5E-3, 10E-3, 20E-3,
+                 50E-3, 100E-3, 200E-3, 500E-3,
+                 1]
+    commands = [
+        (r'(REMOTE|TC|SEN|IMODE|SLOPE|VMODE|SYNC|FET|CP|FLOAT|'
+         r'AUTOMATIC|ACGAIN) (\d+)', '_set_code'),
+        (r'(IMODE|SLOPE|VMODE)', '_get_code'),
+        (r'TC\.', '_get_tc'),
+        (r'SEN\.', '_get_sen'),
+        (r'OF (\d+)', '_set_freq'),
+        (r'OA (\d+)', '_set_amp'),
+        (r'REFP (-?\d+)', '_set_phase'),
+        (r'REFP\.', '_get_phase'),
+        (r'(X|Y|MAG|PHA)\.', '_output'),
+        (r'(XY|MP)\.', '_compound'),
+        (r'FRQ\.', '_get_freq')]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.codes = {'REMOTE': 0, 'TC': 11, 'SEN': 24, 'IMODE': 0,
+                      'SLOPE': 1, 'VMODE': 1}
+
+    def _set_code(self, match):
+        self.codes[match.group(1).upper()] = int(match.group(2))
+
+    def _get_code(self, match):
+        return '%d' % self.codes[match.group(1).upper()]
+
+    def _get_tc(self, match):
+        return '%0.2E' % self._tc_bins[self.codes['TC']]
+
+    def _get_sen(self, match):
+        return '%0.2E' % self._sen_bins[self.codes['SEN']]
+
+    def _set_freq(self, match):
+        self.osc_freq = int(match.group(1)) / 1000.0
+
+    def _set_amp(self, match):
+        self.osc_amp = int(match.group(1)) / 1E6
+
+    def _set_phase(self, match):
+        self.ref_phase = int(match.group(1)) / 1E3
+
+    def _get_phase(self, match):
+        return '%0.3f' % self.ref_phase
+
+    def _output(self, match):
+        i = ['X', 'Y', 'MAG', 'PHA'].index(match.group(1).upper())
+        return '%0.4E' % self.signal()[i]
+
+    def _compound(self, match):
+        X, Y, R, theta = self.signal()
+        if match.group(1).upper() == 'XY':
+            return '%0.4E,%0.4E' % (X, Y)
+        return '%0.4E,%0.4E' % (R, theta)
+
+    def _get_freq(self, match):
+        return '%0.4E' % self.osc_freq
+
+
+SimulatedModels = {'KEPCO_BOP': SimKEPCO_BOP,
+                   'RS_VNA_Z': SimRS_VNA_Z,
+                   'KEYSIGHT_PNA': SimKEYSIGHT_PNA,
+                   'KEYSIGHT_E4990A': SimKEYSIGHT_E4990A,
+                   'SRS_SR830': SimSRS_SR830,
+                   'DSP_7265': SimDSP_7265}
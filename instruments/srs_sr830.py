@@ -11,12 +11,23 @@
 # Make documentation
 
 import numpy as _np
+import time as _time
 from .instruments_base import InstrumentBase as _InstrumentBase
 
 __all__ = ['SRS_SR830']
 
 
 class SRS_SR830(_InstrumentBase):
+    batch_root_prefix = ''
+    max_batch_length = 250  # Input buffer of 256 characters
+    _buffer_channels = {'X': '0,0', 'Magnitude': '1,0'}  # DDEF codes
+    _snap_codes = {'X': 1, 'Y': 2, 'Magnitude': 3, 'Phase': 4,
+                   'AUX_In_1': 5, 'AUX_In_2': 6, 'AUX_In_3': 7,
+                   'AUX_In_4': 8, 'Freq': 9}
+    # Buffer sample rates : 62.5 mHz * 2**code (code 0 to 13)
+    buffer_rates = 62.5E-3 * 2**_np.arange(14)
+    buffer_max_points = 16383
+
     def __init__(self,
                  GPIB_Address=8, GPIB_Device=0, RemoteOnly=False,
                  ResourceName=None, logFile=None):
@@ -63,7 +74,7 @@ class SRS_SR830(_InstrumentBase):
         # '17' = 3 ks
         # '18' = 10 ks
         # '19' = 30 ks
-        tc_i = self.query_int('OFLT?')
+        tc_i = self.cached('OFLT', lambda: self.query_int('OFLT?'))
         bins = [10E-6, 30E-6, 100E-6, 300E-6,
                 1E-3, 3E-3, 10E-3, 30E-3, 100E-3, 300E-3,
                 1, 3, 10, 30, 100, 300,
@@ -79,6 +90,7 @@ class SRS_SR830(_InstrumentBase):
                 1E3, 3E3, 10E3, 30E3]
         tc_i = _np.abs(_np.array(bins) - tc).argmin()
         self.write('OFLT %d' % tc_i)
+        self.updateCache('OFLT', int(tc_i))
 
     @property
     def SEN(self):
@@ -116,7 +128,7 @@ class SRS_SR830(_InstrumentBase):
         #  '24' = 200 mV   200 nA
         #  '25' = 500 mV   500 nA
         #  '26' = 1 V      1 uA
-        sen_i = self.query_int('SENS?')
+        sen_i = self.cached('SENS', lambda: self.query_int('SENS?'))
         vSen = [2E-15, 5E-15, 10E-15, 20E-15,
                 50E-15, 100E-15, 200E-15, 500E-15,
                 1E-12, 2E-12, 5E-12, 10E-12, 20E-12,
@@ -124,8 +136,7 @@ class SRS_SR830(_InstrumentBase):
                 1E-9, 2E-9, 5E-9, 10E-9, 20E-9,
                 50E-9, 100E-9, 200E-9, 500E-9,
                 1E-6][sen_i]
-        inputMode = self.query('ISRC?')
-        if inputMode in ['0', '1']:
+        if self._inputMode() in ['0', '1']:
             # Voltage mode
             vSen *= 1.0E6
         return vSen
@@ -133,7 +144,7 @@ class SRS_SR830(_InstrumentBase):
     @SEN.setter
     def SEN(self, vSen):
         vSen = _np.abs(vSen)
-        if self.query('ISRC?') in ['0', '1']:
+        if self._inputMode() in ['0', '1']:
             # Voltage mode
             vSen *= 1.0E-6
         bins = [2E-15, 5E-15, 10E-15, 20E-15,
@@ -145,6 +156,7 @@ class SRS_SR830(_InstrumentBase):
                 1E-6]
         sen_i = _np.abs(_np.array(bins) - vSen).argmin()
         self.write('SENS %d' % sen_i)
+        self.updateCache('SENS', int(sen_i))
 
     def FilterSlope(self, sl):
         '''
@@ -159,9 +171,15 @@ class SRS_SR830(_InstrumentBase):
         '''
         if sl in ['0', '1', '2', '3']:
             self.write('OFSL %s' % sl)
+            self.updateCache('OFSL', int(sl))
         else:
             self._log('ERR ', 'Wrong Slope Code')
 
+    def getFilterSlope(self):
+        '''Returns the output filter slope in dB/octave'''
+        sl_i = self.cached('OFSL', lambda: self.query_int('OFSL?'))
+        return [6, 12, 18, 24][sl_i]
+
     def InputMode(self, imode):
         '''
         Current/Voltage mode Input Selector
@@ -175,9 +193,13 @@ class SRS_SR830(_InstrumentBase):
         '''
         if imode in ['0', '1', '2', '3']:
             self.write('ISRC %s' % imode)
+            self.updateCache('ISRC', imode)
         else:
             self._log('ERR ', 'Wrong Input Mode Code')
 
+    def _inputMode(self):
+        return self.cached('ISRC', lambda: self.query('ISRC?'))
+
     def Sync(self, Sy=True):
         '''Enable or disable Synchonous time constant'''
         if Sy:
@@ -207,6 +229,114 @@ class SRS_SR830(_InstrumentBase):
         # TODO Implement
         pass
 
+    def SetBuffer(self, rate, channel='X', loop=False):
+        '''
+        Configures and resets the data storage buffer
+
+        Usage :
+            SetBuffer(rate, channel)
+            StartBuffer()
+            data = getBuffer(n)
+
+        rate : Sample rate (Hz), rounded down to an available rate
+        channel : 'X' or 'Magnitude' (stored from the channel 1 display)
+        loop : False (stops when full) or True (overwrites older data)
+        Returns the used sample rate
+        The channel 1 display is changed to channel
+        (AcquireBuffer restores it at the end)
+        '''
+        if channel not in self._buffer_channels:
+            self._log('ERR ', 'Wrong buffer channel')
+            raise ValueError('%s : Buffer channel must be X or Magnitude' %
+                             self._IDN)
+        rate_i = (self.buffer_rates <= rate * (1 + 1E-9)).sum() - 1
+        rate_i = _np.clip(rate_i, 0, len(self.buffer_rates) - 1)
+        with self.batch():
+            self.write('DDEF 1,%s' % self._buffer_channels[channel])
+            self.write('SRAT %d' % rate_i)
+            self.write('SEND %d' % loop)
+            self.write('REST')
+        return self.buffer_rates[rate_i]
+
+    def StartBuffer(self):
+        '''Starts or resumes the data storage'''
+        self.write('STRT')
+
+    def PauseBuffer(self):
+        self.write('PAUS')
+
+    def ResetBuffer(self):
+        '''Clears the buffer (also pauses the data storage)'''
+        self.write('REST')
+
+    @property
+    def BufferPoints(self):
+        '''Number of points stored in the buffer'''
+        return self.query_int('SPTS?')
+
+    def getBuffer(self, n=None, start=0):
+        '''
+        Returns n points (default all) of the channel 1 buffer
+        starting at start, read in one binary transfer
+        '''
+        if n is None:
+            n = self.BufferPoints - start
+        if n <= 0:
+            return _np.zeros(0)
+        with self.lock:
+            self.write('TRCB? 1,%d,%d' % (start, n))
+            self.flushBatch()
+            self._log('read_bytes', str(4 * n))
+            raw = self.VI.read_bytes(4 * n)
+        # Little endian IEEE floats without header
+        return _np.frombuffer(raw, dtype='<f4').astype(float)
+
+    def AcquireBuffer(self, n, rate=512, channel='X'):
+        '''
+        Stores n samples at rate (Hz) in the buffer and returns them
+
+        About 4 bus transactions (display query, configure and start,
+        number of points, binary transfer) instead of one query per
+        sample. The channel 1 display is restored after the transfer.
+        '''
+        n = int(min(n, self.buffer_max_points))
+        # Read each time, it can be changed from the front panel
+        display = self.query('DDEF? 1')
+        with self.batch():
+            rate = self.SetBuffer(rate, channel)
+            self.StartBuffer()
+        _time.sleep(n / rate)
+        self.waitEvent(lambda: self.BufferPoints >= n,
+                       timeout=n / rate + 10, poll_ini=1.0 / rate)
+        data = self.getBuffer(n)
+        if display != self._buffer_channels[channel]:
+            self.write('DDEF 1,%s' % display)
+        return data
+
+    def snapshot(self, *params):
+        '''
+        Simultaneous reading of several parameters in one query (SNAP?)
+
+        Usage :
+            X, Y, f = snapshot('X', 'Y', 'Freq')
+            X, Y, R, Phase, f = snapshot()
+
+        params : Up to 6 of 'X', 'Y', 'Magnitude', 'Phase', 'Freq'
+                 and 'AUX_In_1' to 'AUX_In_4'
+        (default : X, Y, Magnitude, Phase and Freq)
+        '''
+        if not params:
+            params = ('X', 'Y', 'Magnitude', 'Phase', 'Freq')
+        if len(params) > 6 or not set(params) <= set(self._snap_codes):
+            self._log('ERR ', 'Wrong snapshot parameters')
+            raise ValueError('%s : Wrong snapshot parameters %s' %
+                             (self._IDN, params))
+        if len(params) == 1:
+            return _np.array([getattr(self, params[0])])
+        codes = ','.join('%d' % self._snap_codes[p] for p in params)
+        values = self.query('SNAP? ' + codes).split(',')
+        return _np.array([float(v) for v in values])
+
     @property
     def X(self):
         return self.query_float('OUTP? 1')
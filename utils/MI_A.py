@@ -13,26 +13,14 @@
 import numpy
 import matplotlib
 import matplotlib.pyplot as plt
+from .raw_data import RawColorMap
 
-class _MI(object):
+
+class _MI(RawColorMap):
     '''
     Broadband MI measurement
     '''
 
-    def getHi(self, h):
-        return numpy.argmin(numpy.abs(self.h - h))
-
-    def getFi(self, f):
-        return numpy.argmin(numpy.abs(self.f - f))
-
-    def getOutH(self, h):
-        hi = numpy.argmin(numpy.abs(self.h - h))
-        return self.ColorMapData[hi]
-
-    def getOutF(self, f):
-        fi = numpy.argmin(numpy.abs(self.f - f))
-        return self.ColorMapData[:,fi]
-
     def Calc(self,  Sfunct, *args, **kargs):
         Sfunct(self, *args,  **kargs)
 
@@ -120,20 +108,20 @@ class MI(_MI):
     Broadband MI measurement port
     '''
 
+    _raw_keys = ['Z', 'Ref']
+
     def __init__(self, file_name):
-        npz_file = numpy.load(file_name+'.ZxH_Raw.npz')
-        self.Info = str(npz_file['Info'])
-        self.f = npz_file['f']
-        self.h = npz_file['h']
-        self.Z = npz_file['Z']
-        self.Ref = npz_file['Ref']
+        self._openRaw(file_name + '.ZxH_Raw')
+        self.f = numpy.asarray(self._raw['f'])
+        self.h = numpy.asarray(self._raw['h'])
         self.file = file_name
 
         self.sweepDir = '+1'
         if self.h[0]>self.h[-1]:
             self.sweepDir = '-1'
 
-        self.ColorMapData = numpy.abs(self.Z)[:,:] - numpy.abs(self.Ref)[None,:]
+    def _colorMap(self, hi=slice(None), fi=slice(None)):
+        return numpy.abs(self.Z[hi, fi]) - numpy.abs(self.Ref[fi])
 
 
 class MI_t(_MI):
@@ -141,24 +129,27 @@ class MI_t(_MI):
     Broadband FMR measurement 1 port
     '''
 
+    _raw_keys = ['Z']
+
     def __init__(self, file_name):
-        npz_file = numpy.load(file_name+'.Zxt_Raw.npz')
-        self.Info = str(npz_file['Info'])
-        self.f = npz_file['f']
-        self.t = npz_file['t']
+        self._openRaw(file_name + '.Zxt_Raw')
+        self.f = numpy.asarray(self._raw['f'])
+        self.t = numpy.array(self._raw['t'])
         self.t -= self.t[0]
         self.t[self.t>1E6] = numpy.nan
         self.t[self.t<-1E6] = numpy.nan
-        self.Z = npz_file['Z']
         self.file = file_name
 
-        self.ColorMapData = self.Z
+    def _colorMap(self, ti=slice(None), fi=slice(None)):
+        return self.Z[ti, fi]
 
     def get_ti(self, t):
         return numpy.argmin(numpy.abs(self.t - t))
 
     def getOut_t(self, t):
-        ti = numpy.argmin(numpy.abs(self.t - t))
+        ti = self.get_ti(t)
+        if self._ColorMapData is None:
+            return self._colorMap(ti)
         return self.ColorMapData[ti]
 
     @property
@@ -14,25 +14,23 @@
 import numpy
 import matplotlib
 import matplotlib.pyplot as plt
+from .raw_data import RawColorMap
 
-class _FMR_P(object):
+
+class _FMR_P(RawColorMap):
     '''
     Broadband FMR measurement common functions
     '''
 
-    def getHi(self, h):
-        return numpy.argmin(numpy.abs(self.h - h))
-
-    def getFi(self, f):
-        return numpy.argmin(numpy.abs(self.f - f))
-
-    def getOutH(self, h):
-        hi = numpy.argmin(numpy.abs(self.h - h))
-        return self.ColorMapData[hi]
+    def _load(self, file_name, file_id):
+        self._openRaw(file_name + file_id)
+        self.f = numpy.asarray(self._raw['f'])
+        self.h = numpy.asarray(self._raw['h'])
+        self.file = file_name
 
-    def getOutF(self, f):
-        fi = numpy.argmin(numpy.abs(self.f - f))
-        return self.ColorMapData[:,fi]
+        self.sweepDir = '+1'
+        if self.h[0]>self.h[-1]:
+            self.sweepDir = '-1'
 
     def Calc(self,  Sfunct, *args, **kargs):
         Sfunct(self, *args,  **kargs)
@@ -121,24 +119,16 @@ class FMR_1P(_FMR_P):
     Broadband FMR measurement 1 port
     '''
 
-    def __init__(self, file_name):
-        npz_file = numpy.load(file_name+'.VNA_1P_Raw.npz')
-        self.Info = str(npz_file['Info'])
-        self.DateTime = str(npz_file['DateTime'])
-        self.f = npz_file['f']
-        self.h = npz_file['h']
-        self.S11 = npz_file['S11']
-        self.S11_Ref = npz_file['S11_Ref']
-        self.file = file_name
+    _raw_keys = ['S11', 'S11_Ref']
 
-        self.sweepDir = '+1'
-        if self.h[0]>self.h[-1]:
-            self.sweepDir = '-1'
+    def __init__(self, file_name):
+        self._load(file_name, '.VNA_1P_Raw')
 
+    def _colorMap(self, hi=slice(None), fi=slice(None)):
         #Pabs = 1 - |S11|²
         #Pref = 1 -|S11_ref|²
         #CM = Pabs - Pref = |S11_ref|² - |S11|²
-        self.ColorMapData = numpy.abs(self.S11_Ref)**2 - numpy.abs(self.S11)**2
+        return numpy.abs(self.S11_Ref[fi])**2 - numpy.abs(self.S11[hi, fi])**2
 
 
 class FMR_2P(_FMR_P):
@@ -146,36 +136,20 @@ class FMR_2P(_FMR_P):
     Broadband FMR measurement 2 ports
     '''
 
-    def __init__(self, file_name):
-        npz_file = numpy.load(file_name+'.VNA_2P_Raw.npz')
-        self.Info = str(npz_file['Info'])
-        self.DateTime = str(npz_file['DateTime'])
-        self.f = npz_file['f']
-        self.h = npz_file['h']
-        
-        self.S11 = npz_file['S11']
-        self.S21 = npz_file['S21']
-        self.S22 = npz_file['S22']
-        self.S12 = npz_file['S12']
-        
-        self.S11_Ref = npz_file['S11_Ref']
-        self.S21_Ref = npz_file['S21_Ref']
-        self.S22_Ref = npz_file['S22_Ref']
-        self.S12_Ref = npz_file['S12_Ref']
-        
-        self.file = file_name
+    _raw_keys = ['S11', 'S21', 'S22', 'S12',
+                 'S11_Ref', 'S21_Ref', 'S22_Ref', 'S12_Ref']
 
-        self.sweepDir = '+1'
-        if self.h[0]>self.h[-1]:
-            self.sweepDir = '-1'
+    def __init__(self, file_name):
+        self._load(file_name, '.VNA_2P_Raw')
 
+    def _colorMap(self, hi=slice(None), fi=slice(None)):
         #Pabs = 1 - |S11|² - |S21|²
         #Pref = 1 -|S11_ref|² - |S21_ref|²
         #CM = Pabs - Pref = |S11_ref|² + |S21_ref|² - |S11|² - |S21|²
-        self.ColorMapData = + numpy.abs(self.S11_Ref)**2 \
-                            + numpy.abs(self.S21_Ref)**2 \
-                            - numpy.abs(self.S11)**2 \
-                            - numpy.abs(self.S21)**2
+        return + numpy.abs(self.S11_Ref[fi])**2 \
+               + numpy.abs(self.S21_Ref[fi])**2 \
+               - numpy.abs(self.S11[hi, fi])**2 \
+               - numpy.abs(self.S21[hi, fi])**2
 
 
 class FMR_dP_dH():
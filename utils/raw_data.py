@@ -0,0 +1,68 @@
+# coding=utf-8
+
+# Author: Diego Gonzalez Chavez
+# email : diegogch@cbpf.br / diego.gonzalez.chavez@gmail.com
+#
+# magdynlab
+# Lazy access to the raw data of the colormap measurements
+#
+# TODO:
+# Make documentation
+
+import numpy
+from ..data_types import DataContainer
+
+
+class RawColorMap(object):
+    '''
+    Raw data read on first use and ColorMap computed on demand
+
+    The raw data is opened with DataContainer.open, the .d storage
+    (see DataContainer.saveStorage) is memory mapped.
+    Subclasses list the raw arrays in _raw_keys and implement
+    _colorMap(hi, fi) for the rows hi and columns fi.
+    '''
+
+    # Raw arrays, read on first use
+    _raw_keys = []
+
+    def _openRaw(self, file_name):
+        self._raw, self.Info, self.DateTime = DataContainer.open(file_name)
+        self._ColorMapData = None
+
+    def __getattr__(self, name):
+        if name in self._raw_keys:
+            value = self._raw[name]
+            setattr(self, name, value)
+            return value
+        raise AttributeError(name)
+
+    @property
+    def ColorMapData(self):
+        # Computed on first use, getOutH / getOutF only read the
+        # needed row / column until then
+        if self._ColorMapData is None:
+            self._ColorMapData = self._colorMap()
+        return self._ColorMapData
+
+    @ColorMapData.setter
+    def ColorMapData(self, value):
+        self._ColorMapData = value
+
+    def getHi(self, h):
+        return numpy.argmin(numpy.abs(self.h - h))
+
+    def getFi(self, f):
+        return numpy.argmin(numpy.abs(self.f - f))
+
+    def getOutH(self, h):
+        hi = self.getHi(h)
+        if self._ColorMapData is None:
+            return self._colorMap(hi)
+        return self.ColorMapData[hi]
+
+    def getOutF(self, f):
+        fi = self.getFi(f)
+        if self._ColorMapData is None:
+            return self._colorMap(slice(None), fi)
+        return self.ColorMapData[:,fi]